@@ -0,0 +1,77 @@
+"""HTTP API администратора для изменения конфигурации без перезапуска.
+
+GET /subscriptions — подписки процесса (без токенов);
+POST /subscriptions {"token": ..., "chat_id": ...} — добавить подписку;
+DELETE /subscriptions/<id подписки> — удалить подписку;
+PUT /statuses {"approved": "...", ...} — заменить тексты статусов;
+POST /reload — перечитать файл конфигурации.
+Каждый запрос должен содержать секрет в заголовке X-Admin-Secret.
+"""
+
+
+import json
+import logging
+import re
+from http import HTTPStatus
+
+from json_server import JsonServer
+from storage import subscription_id
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Admin-Secret'
+SUBSCRIPTION_PATH = re.compile(r'^/subscriptions/(?P<subscription>[^/?]+)$')
+BAD_REQUEST_ERRORS = (ValueError, KeyError, TypeError, OSError)
+
+
+class AdminServer(JsonServer):
+    """HTTP-сервер, изменяющий конфигурацию через ConfigManager."""
+
+    secret_header = SECRET_HEADER
+    methods = ('GET', 'POST', 'PUT', 'DELETE')
+    name = 'admin'
+    title = 'API администратора'
+
+    def __init__(self, manager, secret, address='127.0.0.1', port=0):
+        self.manager = manager
+        super().__init__(secret, address, port)
+
+    def subscriptions(self):
+        """Подписки процесса без токенов."""
+        return [
+            {'id': subscription_id(subscription),
+             'chat_id': subscription.chat_id}
+            for subscription in self.manager.registry
+        ]
+
+    def route(self, method, path, payload):
+        """Выполняет запрос. Возвращает код ответа и тело ответа."""
+        match = SUBSCRIPTION_PATH.match(path)
+        if method == 'DELETE' and match:
+            report = self.manager.remove(match.group('subscription'))
+            if report is None:
+                return HTTPStatus.NOT_FOUND, {'error': 'Подписка не найдена'}
+            return HTTPStatus.OK, report
+        if path == '/subscriptions' and method == 'GET':
+            return HTTPStatus.OK, {'subscriptions': self.subscriptions()}
+        if path == '/subscriptions' and method == 'POST':
+            report = self.manager.add(payload['token'], payload['chat_id'])
+            if report['rejected']:
+                return HTTPStatus.UNPROCESSABLE_ENTITY, {
+                    'error': 'Токен отклонён API Практикума'}
+            return HTTPStatus.CREATED, report
+        if path == '/statuses' and method == 'PUT':
+            return HTTPStatus.OK, self.manager.update_statuses(payload)
+        if path == '/reload' and method == 'POST':
+            return HTTPStatus.OK, self.manager.reload()
+        return HTTPStatus.NOT_FOUND, {'error': 'Неизвестный адрес'}
+
+    def receive(self, method, path, headers, body):
+        """Проверяет секрет и выполняет запрос."""
+        if not self.authorized(headers):
+            return HTTPStatus.UNAUTHORIZED, {'error': 'Неверный секрет'}
+        try:
+            return self.route(method, path, json.loads(body or 'null'))
+        except BAD_REQUEST_ERRORS as error:
+            logger.warning('Отклонён запрос администратора: %s', error)
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {'error': str(error)}
@@ -0,0 +1,359 @@
+"""Асинхронный режим бота: шаги 2-5 в виде корутин на одном event loop.
+
+Запуск: python async_bot.py. Синхронные функции homework.py остаются
+рабочими, отсюда переиспользуются проверка ответа и разбор статуса.
+"""
+
+
+import asyncio
+import json
+import logging
+import signal
+import time
+from http import HTTPStatus
+
+import aiohttp
+
+import homework
+import logs
+import metrics
+from delivery import (
+    CHAT_RATE, CHAT_READY_LIMIT, GLOBAL_RATE, MAX_ATTEMPTS, TokenBucket)
+from exceptions import CircuitOpenError
+from http_session import ConnectionStats
+from lazy_imports import lazy_import
+from records import status_name
+from scheduler import FixedInterval, token_fraction
+from single_flight import AsyncSingleFlight
+from storage import open_store
+
+telegram = lazy_import('telegram')
+
+TELEGRAM_API = 'https://api.telegram.org/bot{token}/sendMessage'
+CONCURRENCY = 1000
+LIMIT_PER_HOST = 100
+KEEPALIVE_TIMEOUT = 60
+REGISTRY_SYNC_TIME = 5
+
+logger = logging.getLogger(__name__)
+
+
+async def get_api_answer(session, token, current_timestamp, cache=None,
+                         cache_key=None):
+    """Step 2: Асинхронно получает данные о статусе домашних работ.
+
+    Как и homework.fetch_api_answer, с кэшем ответов возвращает None,
+    если данные не изменились.
+    """
+    timestamp = current_timestamp or int(time.time())
+    params = {'from_date': timestamp}
+    headers = homework.make_headers(token)
+    if cache_key is None:
+        cache_key = token
+    if cache is not None:
+        headers.update(cache.conditional_headers(cache_key))
+    async with session.get(
+            homework.ENDPOINT, headers=headers, params=params) as response:
+        status_code = response.status
+        logger.info(
+            'step 2 - status code: %s', status_code, extra={'step': 2})
+        if cache is not None and status_code == HTTPStatus.NOT_MODIFIED:
+            cache.not_modified(cache_key)
+            return None
+        if status_code != HTTPStatus.OK:
+            raise homework.api_response_error(status_code, response)
+        body = await response.read()
+        if cache is not None and cache.update(
+                cache_key, response.headers, body):
+            return None
+    return json.loads(body)
+
+
+async def send_message(session, telegram_token, chat_id, message):
+    """Step 5: Асинхронно отправляет сообщение через Bot API Telegram."""
+    url = TELEGRAM_API.format(token=telegram_token)
+    payload = {'chat_id': chat_id, 'text': message}
+    parse_mode = homework.MESSAGES.parse_mode(chat_id)
+    if parse_mode:
+        payload['parse_mode'] = parse_mode
+    with metrics.STEP_SECONDS.time('send_message'):
+        async with session.post(url, json=payload) as response:
+            answer = await response.json(content_type=None)
+    if not answer.get('ok'):
+        parameters = answer.get('parameters') or {}
+        if 'retry_after' in parameters:
+            raise telegram.error.RetryAfter(parameters['retry_after'])
+        raise telegram.TelegramError(
+            answer.get('description', 'Unknown Telegram error'))
+    logger.info('Сообщение: %s - успешно отправлено', message)
+
+
+class AsyncSender:
+    """Асинхронный аналог delivery.DeliveryQueue: отправка с лимитами.
+
+    Сообщения уходят не чаще global_rate в секунду на весь бот и не чаще
+    chat_rate в секунду в один чат. При RetryAfter чат откладывается на
+    указанное Telegram время, отправка повторяется до MAX_ATTEMPTS раз.
+    """
+
+    def __init__(self, telegram_token, global_rate=GLOBAL_RATE,
+                 chat_rate=CHAT_RATE, clock=time.monotonic):
+        self.telegram_token = telegram_token
+        self.chat_interval = 1 / chat_rate
+        self.clock = clock
+        self._bucket = TokenBucket(global_rate, clock=clock)
+        self._chat_ready_at = {}
+
+    async def send(self, session, chat_id, message):
+        """Отправляет сообщение, дождавшись своей очереди."""
+        attempts = 1
+        while True:
+            await self._wait_turn(chat_id)
+            try:
+                await send_message(
+                    session, self.telegram_token, chat_id, message)
+                return
+            except telegram.error.RetryAfter as error:
+                if attempts >= MAX_ATTEMPTS:
+                    raise
+                attempts += 1
+                metrics.count_error(error)
+                logger.warning(
+                    'Telegram просит подождать %s с перед отправкой в чат %s',
+                    error.retry_after, chat_id)
+                self._chat_ready_at[chat_id] = max(
+                    self._chat_ready_at.get(chat_id, 0),
+                    self.clock() + error.retry_after)
+
+    async def _wait_turn(self, chat_id):
+        now = self.clock()
+        ready_at = max(now, self._chat_ready_at.get(chat_id, 0))
+        self._chat_ready_at[chat_id] = ready_at + self.chat_interval
+        if len(self._chat_ready_at) > CHAT_READY_LIMIT:
+            self._chat_ready_at = {
+                chat: ready for chat, ready in self._chat_ready_at.items()
+                if ready > now
+            }
+        if ready_at > now:
+            await asyncio.sleep(ready_at - now)
+        delay = self._bucket.reserve()
+        if delay:
+            await asyncio.sleep(delay)
+
+
+def connection_trace(stats):
+    """Создаёт TraceConfig aiohttp, ведущий счётчики ConnectionStats."""
+    async def on_request_start(session, context, params):
+        stats.add_request()
+
+    async def on_connection_create_end(session, context, params):
+        stats.add_connection()
+
+    trace_config = aiohttp.TraceConfig()
+    trace_config.on_request_start.append(on_request_start)
+    trace_config.on_connection_create_end.append(on_connection_create_end)
+    return trace_config
+
+
+class AsyncPoller:
+    """Опрашивает подписки реестра конкурентно на одном event loop.
+
+    Каждая подписка — отдельная задача, которая спит до своего срока.
+    Число одновременных запросов ограничено семафором, соединения
+    переиспользуются общим пулом ClientSession. stop() прерывает
+    ожидание всех задач, run() дожидается начатых опросов и завершается.
+    Сообщения отправляются через AsyncSender с лимитами DELIVERY_RATE
+    и CHAT_RATE.
+    """
+
+    def __init__(self, registry, telegram_token, interval,
+                 concurrency=CONCURRENCY, store=None, policy=None):
+        self.registry = registry
+        self.store = store
+        self.sender = AsyncSender(
+            telegram_token, homework.DELIVERY_RATE, homework.CHAT_RATE)
+        self.interval = interval
+        self.policy = policy or FixedInterval(interval)
+        self.concurrency = concurrency
+        self.stats = ConnectionStats()
+        self._tasks = {}
+        self._stopping = asyncio.Event()
+        self._flights = AsyncSingleFlight(homework.COALESCE_TIME)
+
+    async def notify_changes(self, session, subscription, homework_list):
+        """Асинхронный аналог homework.notify_changes."""
+        changes = homework.pending_changes(subscription, homework_list)
+        if not changes:
+            logger.debug('Статус работы не изменился.')
+        for record in changes:
+            try:
+                message = homework.render_status(
+                    record, subscription.chat_id)
+            except Exception:
+                subscription.index.mark(record)
+                raise
+            await self.sender.send(session, subscription.chat_id, message)
+            subscription.index.mark(record)
+            metrics.STATUS_CHANGES.inc(status_name(record.status))
+        return len(changes)
+
+    async def guarded_fetch(self, session, subscription, from_date):
+        """Асинхронный аналог homework.guarded_fetch."""
+        cache = homework.RESPONSE_CACHE
+        key = subscription.key
+        response, source = await self._flights.do(
+            (subscription.token, from_date, cache.state(key)),
+            self.shared_request, session, subscription, from_date)
+        if source != key:
+            cache.copy(source, key)
+        return response
+
+    async def shared_request(self, session, subscription, from_date):
+        """Асинхронный аналог homework.shared_request."""
+        response = await self.guarded_request(
+            session, subscription, from_date)
+        return response, subscription.key
+
+    async def guarded_request(self, session, subscription, from_date):
+        """Асинхронный аналог homework.guarded_request."""
+        guard = homework.API_GUARD
+        guard.before_request(subscription)
+        try:
+            with metrics.STEP_SECONDS.time('get_api_answer'):
+                response = await get_api_answer(
+                    session, subscription.token, from_date,
+                    homework.RESPONSE_CACHE, subscription.key)
+        except Exception as error:
+            guard.record_failure(subscription, error)
+            raise
+        guard.record_success(subscription)
+        return response
+
+    async def poll_subscription(self, session, subscription):
+        """Асинхронный аналог homework.poll_subscription."""
+        with logs.context(subscription.chat_id):
+            try:
+                from_date = homework.CURSOR.from_date(subscription)
+                response = await self.guarded_fetch(
+                    session, subscription, from_date)
+                changes = 0
+                if response is None:
+                    logger.debug('Ответ API не изменился.')
+                else:
+                    homework_list = homework.check_response(response)
+                    changes = await self.notify_changes(
+                        session, subscription, homework_list)
+                    homework.CURSOR.advance(subscription, response, from_date)
+                message = homework.recovery_message(subscription)
+                if message:
+                    await self.sender.send(
+                        session, subscription.chat_id, message)
+                return changes
+            except CircuitOpenError as error:
+                metrics.count_error(error)
+                logger.debug(error)
+                return 0
+            except Exception as error:
+                metrics.count_error(error)
+                homework.RESPONSE_CACHE.forget(subscription.key)
+                message = homework.error_message(subscription, error)
+                if message:
+                    await self.sender.send(
+                        session, subscription.chat_id, message)
+                return 0
+
+    def stop(self):
+        """Просит run() завершиться после текущих опросов."""
+        self._stopping.set()
+
+    async def _sleep(self, seconds):
+        try:
+            await asyncio.wait_for(self._stopping.wait(), seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _subscription_loop(self, session, semaphore, subscription):
+        await self._sleep(token_fraction(subscription) * self.interval)
+        while (subscription in self.registry
+               and not self._stopping.is_set()):
+            changes = 0
+            async with semaphore:
+                try:
+                    changes = await self.poll_subscription(
+                        session, subscription)
+                    if self.store is not None:
+                        self.store.save(subscription)
+                except Exception as error:
+                    logger.exception(error)
+            self.policy.observe(subscription, changes)
+            await self._sleep(self.policy.next_interval(subscription))
+        self._tasks.pop(subscription.key, None)
+
+    def _spawn_new(self, session, semaphore):
+        for subscription in self.registry:
+            if subscription.key not in self._tasks:
+                self._tasks[subscription.key] = asyncio.ensure_future(
+                    self._subscription_loop(
+                        session, semaphore, subscription))
+
+    async def run(self, shutdown_timeout=None):
+        """Опрашивает все подписки и подхватывает новые до вызова stop().
+
+        После stop() ждёт начатые опросы не дольше shutdown_timeout
+        секунд, оставшиеся задачи отменяются.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        connector = aiohttp.TCPConnector(
+            limit=self.concurrency, limit_per_host=LIMIT_PER_HOST,
+            keepalive_timeout=KEEPALIVE_TIMEOUT)
+        timeout = aiohttp.ClientTimeout(
+            total=None, sock_connect=homework.API_CONNECT_TIMEOUT,
+            sock_read=homework.API_READ_TIMEOUT)
+        async with aiohttp.ClientSession(
+                connector=connector, timeout=timeout,
+                trace_configs=[connection_trace(self.stats)]) as session:
+            while not self._stopping.is_set():
+                self._spawn_new(session, semaphore)
+                await self._sleep(REGISTRY_SYNC_TIME)
+            tasks = list(self._tasks.values())
+            if tasks:
+                _, pending = await asyncio.wait(
+                    tasks, timeout=shutdown_timeout)
+                for task in pending:
+                    task.cancel()
+                if pending:
+                    logger.warning(
+                        'Не дождались завершения опросов: %s', len(pending))
+
+
+async def serve(poller):
+    """Запускает poller и останавливает его по SIGTERM и SIGINT."""
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, poller.stop)
+    await poller.run(homework.SHUTDOWN_TIMEOUT)
+
+
+def main():
+    """Асинхронная версия homework.main."""
+    log_listener = homework.init()
+    if not homework.check_tokens():
+        log_listener.stop()
+        return
+    store = open_store(homework.STATE_BACKEND, homework.STATE_PATH)
+    metrics_server = homework.start_metrics()
+    poller = AsyncPoller(
+        homework.build_registry(store), homework.TELEGRAM_TOKEN,
+        homework.RETRY_TIME, store=store, policy=homework.make_poll_policy())
+    store.start_autoflush()
+    try:
+        asyncio.run(serve(poller))
+    finally:
+        store.close()
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        log_listener.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,240 @@
+"""Пакетная загрузка истории статусов работ в хранилище состояния.
+
+Запуск: python backfill.py subscriptions.json --since 2024-09-01
+Файл подписок — в формате SUBSCRIPTIONS_FILE, отдельные токены можно
+передать через --token (чат берётся из TELEGRAM_CHAT_ID). История
+каждой подписки запрашивается за период [--since, --until] пулом
+из --workers потоков, и ответы по мере получения записываются
+в хранилище STATE_BACKEND. Уведомления не отправляются: известные
+статусы только запоминаются, чтобы бот не присылал их после запуска.
+С --replay пропущенные уведомления отправляются через очередь доставки,
+повторы отсекаются индексом статусов подписки, как и при обычном опросе.
+Без --until курсор from_date подписки сдвигается на время ответа API.
+Ход загрузки и итоговая пропускная способность печатаются в stdout.
+Запускать при остановленном боте: иначе он может затереть состояние.
+"""
+
+
+import argparse
+import logging
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime, timezone
+
+import homework
+import http_session
+import logs
+import metrics
+from delivery import DeliveryQueue
+from lazy_imports import LazyObject
+from storage import open_store
+from subscriptions import SubscriptionRegistry, load_subscriptions
+
+PROGRESS_TIME = 5
+
+logger = logging.getLogger(__name__)
+
+
+def parse_date(value):
+    """Unix-время из даты ISO 8601 (по умолчанию UTC) или числа секунд.
+
+    Суффикс Z, как в date_updated API Практикума, заменяется на +00:00:
+    datetime.fromisoformat() до Python 3.11 его не понимает.
+    """
+    if value.isdigit():
+        return int(value)
+    if value.endswith('Z'):
+        value = value[:-1] + '+00:00'
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return int(moment.timestamp())
+
+
+def updated_at(homework_record):
+    """Unix-время date_updated работы или None, если его нет в записи."""
+    value = homework_record.get('date_updated')
+    if not value:
+        return None
+    return parse_date(value)
+
+
+class Progress:
+    """Счётчики загрузки и периодический отчёт о её ходе."""
+
+    def __init__(self, total, interval=PROGRESS_TIME, stream=None,
+                 clock=time.monotonic):
+        self.total = total
+        self.interval = interval
+        self.stream = stream or sys.stdout
+        self.clock = clock
+        self.done = 0
+        self.errors = 0
+        self.homeworks = 0
+        self.notifications = 0
+        self._started = clock()
+        self._reported = self._started
+        self._lock = threading.Lock()
+
+    def record(self, homeworks=0, notifications=0, error=False):
+        """Учитывает обработанную подписку."""
+        with self._lock:
+            self.done += 1
+            self.errors += error
+            self.homeworks += homeworks
+            self.notifications += notifications
+            now = self.clock()
+            if now - self._reported < self.interval:
+                return
+            self._reported = now
+        print(self.format(), file=self.stream, flush=True)
+
+    def report(self):
+        """Итоги загрузки в виде словаря."""
+        elapsed = self.clock() - self._started
+        return {
+            'subscriptions': self.done,
+            'total': self.total,
+            'errors': self.errors,
+            'homeworks': self.homeworks,
+            'notifications': self.notifications,
+            'elapsed': round(elapsed, 3),
+            'throughput': round(self.done / elapsed, 1) if elapsed else 0.0,
+        }
+
+    def format(self):
+        """Строка отчёта о ходе загрузки."""
+        report = self.report()
+        return (
+            f'Подписок: {report["subscriptions"]}/{report["total"]}, '
+            f'ошибок: {report["errors"]}, работ: {report["homeworks"]}, '
+            f'уведомлений: {report["notifications"]}, '
+            f'{report["throughput"]} подписок/с')
+
+
+def backfill_subscription(subscription, since, until=None, bot=None):
+    """Загружает историю одной подписки за период [since, until].
+
+    Без bot изменившиеся статусы только запоминаются в индексе,
+    с bot — отправляются в чат подписки. Возвращает пару
+    (число работ в периоде, число отправленных уведомлений).
+    """
+    response = homework.fetch_api_answer(subscription.token, since)
+    homework_list = homework.check_response(response)
+    if until is not None:
+        homework_list = [
+            record for record in homework_list
+            if (updated_at(record) or since) <= until
+        ]
+    if bot is None:
+        notifications = 0
+        with homework.notify_lock(subscription):
+            for record in subscription.index.diff(
+                    homework.parse_homeworks(homework_list)):
+                subscription.index.mark(record)
+    else:
+        notifications = homework.notify_changes(
+            bot, subscription, homework_list)
+    if until is None:
+        homework.CURSOR.advance(subscription, response, since)
+    return len(homework_list), notifications
+
+
+def run_backfill(registry, store, since, until=None, workers=8, bot=None,
+                 progress=None):
+    """Загружает историю всех подписок registry пулом из workers потоков.
+
+    Состояние каждой подписки отдаётся хранилищу сразу после её
+    обработки. Возвращает Progress с итогами загрузки.
+    """
+    progress = progress or Progress(len(registry))
+
+    def load(subscription):
+        with logs.context(subscription.chat_id):
+            result = backfill_subscription(subscription, since, until, bot)
+        store.save(subscription)
+        return result
+
+    with ThreadPoolExecutor(workers) as pool:
+        futures = [
+            pool.submit(load, subscription) for subscription in registry]
+        for future in as_completed(futures):
+            try:
+                homeworks, notifications = future.result()
+            except Exception as error:
+                metrics.count_error(error)
+                logger.error('Не удалось загрузить историю: %s', error)
+                progress.record(error=True)
+            else:
+                progress.record(homeworks, notifications)
+    store.flush()
+    return progress
+
+
+def build_registry(options):
+    """Реестр подписок из файла и токенов командной строки."""
+    registry = SubscriptionRegistry()
+    if options.subscriptions:
+        load_subscriptions(options.subscriptions, registry)
+    for token in options.token:
+        registry.add(token, homework.TELEGRAM_CHAT_ID)
+    return registry
+
+
+def parse_args(argv=None):
+    """Разбирает параметры командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('subscriptions', nargs='?')
+    parser.add_argument('--token', action='append', default=[])
+    parser.add_argument('--since', type=parse_date, required=True)
+    parser.add_argument('--until', type=parse_date)
+    parser.add_argument('--workers', type=int, default=8)
+    parser.add_argument('--replay', action='store_true')
+    parser.add_argument('--progress-time', type=float, default=PROGRESS_TIME)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Загружает историю и возвращает код завершения."""
+    options = parse_args(argv)
+    log_listener = homework.init()
+    try:
+        registry = build_registry(options)
+        if options.replay and not homework.TELEGRAM_TOKEN:
+            logger.critical('Для --replay нужен TELEGRAM_TOKEN')
+            return 1
+        return backfill(options, registry)
+    finally:
+        log_listener.stop()
+
+
+def backfill(options, registry):
+    """Загружает историю подписок registry с параметрами options."""
+    store = open_store(homework.STATE_BACKEND, homework.STATE_PATH)
+    for subscription in registry:
+        homework.restore_subscription(store, subscription)
+    http_session.configure(pool_maxsize=options.workers)
+    outbox = None
+    if options.replay:
+        outbox = DeliveryQueue(
+            LazyObject(homework.make_bot), homework.DELIVERY_RATE,
+            homework.CHAT_RATE, senders=homework.DELIVERY_SENDERS,
+            max_pending=homework.DELIVERY_QUEUE_LIMIT).start()
+    store.start_autoflush()
+    progress = Progress(len(registry), options.progress_time)
+    try:
+        run_backfill(
+            registry, store, options.since, options.until, options.workers,
+            outbox, progress)
+    finally:
+        if outbox is not None:
+            outbox.close(homework.SHUTDOWN_TIMEOUT)
+        store.close()
+    print(progress.format())
+    return 1 if progress.errors else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,426 @@
+"""Бенчмарк цикла опроса на локальных заглушках API Практикума и Telegram.
+
+Запуск: python benchmark.py --subscriptions 200 --api-latency 0.02
+Отчёт содержит пропускную способность и задержки p50/p99 для каждого
+шага (get_api_answer, check_response, parse_status, send_message) и для
+полного цикла опроса N подписок, время запуска бота (импорт модуля
+и init() в отдельном процессе), а также пиковый RSS процесса.
+Результат сравнивается с сохранённым базовым замером (--save-baseline
+записывает новый), при регрессии скрипт завершается с кодом 1.
+"""
+
+
+import abc
+import argparse
+import contextlib
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import telegram
+from telegram.utils.request import Request
+
+import homework
+import http_session
+import logs
+from circuit_breaker import ApiGuard
+from error_dedup import ErrorDeduplicator
+from response_cache import ResponseCache
+from subscriptions import SubscriptionRegistry
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+BASELINE_FILE = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'benchmark_baseline.json')
+TELEGRAM_TOKEN = '123456:benchmark'
+TOLERANCE = 0.3
+LATENCY_SLACK_MS = 5
+STATUSES = ('approved', 'reviewing', 'rejected')
+STARTUP_CODE = 'import homework; homework.init().stop()'
+
+
+class FakeServer(abc.ABC):
+    """Локальный HTTP-сервер с настраиваемыми задержкой и долей ошибок."""
+
+    def __init__(self, latency=0, error_rate=0, seed=0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.requests = 0
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def url(self):
+        """Адрес сервера."""
+        return f'http://127.0.0.1:{self._server.server_port}/'
+
+    def start(self):
+        """Запускает сервер в фоновом потоке."""
+        threading.Thread(
+            target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def close(self):
+        """Останавливает сервер."""
+        self._server.shutdown()
+        self._server.server_close()
+
+    @abc.abstractmethod
+    def body(self, request, number):
+        """Тело успешного ответа на запрос с порядковым номером number."""
+
+    def error_body(self):
+        """Тело ответа с ошибкой."""
+        return b'{}'
+
+    def _handler_class(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                server._serve(self)
+
+            def do_POST(self):
+                server._serve(self)
+
+            def log_message(self, *args):
+                pass
+
+        return Handler
+
+    def _serve(self, request):
+        length = int(request.headers.get('Content-Length') or 0)
+        payload = request.rfile.read(length) if length else b''
+        with self._lock:
+            self.requests += 1
+            number = self.requests
+            failed = self._random.random() < self.error_rate
+        if self.latency:
+            time.sleep(self.latency)
+        if failed:
+            status, body = 500, self.error_body()
+        else:
+            status, body = 200, self.body(payload, number)
+        request.send_response(status)
+        request.send_header('Content-Type', 'application/json')
+        request.send_header('Content-Length', str(len(body)))
+        request.end_headers()
+        request.wfile.write(body)
+
+
+class FakePracticum(FakeServer):
+    """Заглушка API Практикума.
+
+    В каждом ответе homeworks работ, у первых changes из них при каждом
+    запросе меняются статус и date_updated.
+    """
+
+    def __init__(self, homeworks=20, changes=1, **kwargs):
+        super().__init__(**kwargs)
+        self.changes = min(changes, homeworks)
+        self._static = ''.join(
+            ',' + json.dumps(self.record(number, 0))
+            for number in range(self.changes, homeworks))
+
+    def record(self, number, request_number):
+        """Запись домашней работы."""
+        return {
+            'id': number,
+            'homework_name': f'student__hw{number:05}.zip',
+            'status': STATUSES[(number + request_number) % len(STATUSES)],
+            'date_updated': f'2022-01-01T00:00:{request_number % 60:02}Z',
+            'reviewer_comment': 'Комментарий ревьюера.',
+        }
+
+    def body(self, request, number):
+        """Ответ API: изменившиеся работы и неизменная часть истории."""
+        changed = ','.join(
+            json.dumps(self.record(homework_id, number))
+            for homework_id in range(self.changes))
+        homeworks = (changed + self._static).lstrip(',')
+        return (
+            f'{{"homeworks": [{homeworks}], '
+            f'"current_date": {int(time.time())}}}').encode()
+
+
+class FakeTelegram(FakeServer):
+    """Заглушка Bot API Telegram, отвечающая на sendMessage."""
+
+    def body(self, request, number):
+        """Ответ sendMessage с отправленным сообщением."""
+        chat_id = json.loads(request or b'{}').get('chat_id', 0)
+        return json.dumps({'ok': True, 'result': {
+            'message_id': number, 'date': int(time.time()),
+            'chat': {'id': chat_id, 'type': 'private'},
+        }}).encode()
+
+    def error_body(self):
+        """Ответ Bot API с ошибкой."""
+        return b'{"ok": false, "error_code": 500, "description": "Fail"}'
+
+    def bot(self, pool_size=1):
+        """telegram.Bot, отправляющий запросы в заглушку."""
+        return telegram.Bot(
+            TELEGRAM_TOKEN, base_url=f'{self.url}bot',
+            request=Request(con_pool_size=pool_size))
+
+
+def percentile(samples, fraction):
+    """Перцентиль выборки по ближайшему рангу."""
+    if not samples:
+        return 0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples, elapsed, errors=0):
+    """Пропускная способность и задержки p50/p99 в миллисекундах."""
+    return {
+        'ops': len(samples),
+        'errors': errors,
+        'throughput': round(len(samples) / elapsed, 1) if elapsed else 0,
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 3),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 3),
+    }
+
+
+def measure(call, arguments):
+    """Вызывает call для каждого аргумента и замеряет время вызовов."""
+    samples = []
+    errors = 0
+    started = time.perf_counter()
+    for argument in arguments:
+        begin = time.perf_counter()
+        try:
+            call(argument)
+        except Exception:
+            errors += 1
+        samples.append(time.perf_counter() - begin)
+    return summarize(samples, time.perf_counter() - started, errors)
+
+
+def peak_rss_mb():
+    """Пиковый RSS процесса в мегабайтах или None."""
+    if resource is None:
+        return None
+    return round(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1)
+
+
+@contextlib.contextmanager
+def patched(scope, **values):
+    """Временно подменяет атрибуты модуля."""
+    previous = {name: getattr(scope, name) for name in values}
+    for name, value in values.items():
+        setattr(scope, name, value)
+    try:
+        yield
+    finally:
+        for name, value in previous.items():
+            setattr(scope, name, value)
+
+
+def bench_loop(bot, subscriptions, rounds, workers):
+    """Полный цикл: rounds опросов каждой из subscriptions подписок."""
+    registry = SubscriptionRegistry()
+    for number in range(subscriptions):
+        registry.add(f'token-{number}', number, 0)
+    samples = []
+    errors = []
+
+    def poll(subscription):
+        begin = time.perf_counter()
+        try:
+            homework.poll_subscription(bot, subscription)
+        except Exception as error:
+            errors.append(error)
+        samples.append(time.perf_counter() - begin)
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(workers) as pool:
+        for _ in range(rounds):
+            list(pool.map(poll, registry))
+    return summarize(samples, time.perf_counter() - started, len(errors))
+
+
+def bench_startup(runs):
+    """Время запуска нового процесса до готовности бота к работе."""
+    environment = dict(os.environ, LOG_LEVEL='CRITICAL')
+    command = [sys.executable, '-c', STARTUP_CODE]
+    return measure(
+        lambda _: subprocess.run(
+            command, env=environment, check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL),
+        range(runs))
+
+
+def run_benchmark(options):
+    """Выполняет все замеры и возвращает отчёт."""
+    api = FakePracticum(
+        options.homeworks, options.changes, latency=options.api_latency,
+        error_rate=options.api_error_rate, seed=options.seed).start()
+    chat = FakeTelegram(
+        latency=options.telegram_latency,
+        error_rate=options.telegram_error_rate, seed=options.seed).start()
+    http_session.configure(pool_maxsize=options.workers)
+    bot = chat.bot(options.workers)
+    iterations = range(options.iterations)
+    stages = {}
+    if options.startup_runs:
+        stages['startup'] = bench_startup(options.startup_runs)
+    try:
+        with patched(
+                homework, ENDPOINT=api.url, PRACTICUM_TOKEN='token',
+                TELEGRAM_CHAT_ID=1, API_GUARD=ApiGuard(),
+                ERRORS=ErrorDeduplicator(),
+                RESPONSE_CACHE=ResponseCache()):
+            stages['get_api_answer'] = measure(
+                homework.get_api_answer, iterations)
+            response = homework.get_api_answer(0)
+            stages['check_response'] = measure(
+                homework.check_response, [response] * options.iterations)
+            homeworks = response['homeworks']
+            stages['parse_status'] = measure(homework.parse_status, [
+                homeworks[number % len(homeworks)] for number in iterations])
+            messages = [homework.parse_status(homeworks[0])] * len(iterations)
+            stages['send_message'] = measure(
+                lambda message: homework.send_message(bot, message),
+                messages)
+            stages['loop'] = bench_loop(
+                bot, options.subscriptions, options.rounds, options.workers)
+    finally:
+        api.close()
+        chat.close()
+    return {
+        'config': config_of(options),
+        'stages': stages,
+        'connections': http_session.stats().as_dict(),
+        'rss_mb': peak_rss_mb(),
+    }
+
+
+CONFIG_FIELDS = (
+    'subscriptions', 'rounds', 'iterations', 'workers', 'homeworks',
+    'changes', 'api_latency', 'api_error_rate', 'telegram_latency',
+    'telegram_error_rate')
+
+
+def config_of(options):
+    """Параметры замера, от которых зависят результаты."""
+    return {field: getattr(options, field) for field in CONFIG_FIELDS}
+
+
+def compare(report, baseline, tolerance=TOLERANCE):
+    """Список регрессий отчёта относительно базового замера."""
+    regressions = []
+    for stage, base in baseline['stages'].items():
+        current = report['stages'].get(stage)
+        if current is None:
+            continue
+        if current['throughput'] < base['throughput'] * (1 - tolerance):
+            regressions.append(
+                f'{stage}: пропускная способность {current["throughput"]} '
+                f'оп/с, базовая {base["throughput"]} оп/с')
+        limit = max(
+            base['p99_ms'] * (1 + tolerance),
+            base['p99_ms'] + LATENCY_SLACK_MS)
+        if current['p99_ms'] > limit:
+            regressions.append(
+                f'{stage}: p99 {current["p99_ms"]} мс, '
+                f'базовая {base["p99_ms"]} мс')
+    base_rss = baseline.get('rss_mb')
+    rss = report.get('rss_mb')
+    if base_rss and rss and rss > base_rss * (1 + tolerance):
+        regressions.append(f'RSS {rss} МБ, базовый {base_rss} МБ')
+    return regressions
+
+
+def format_report(report):
+    """Отчёт в виде текстовой таблицы."""
+    lines = [
+        f'{"шаг":<16}{"оп":>8}{"ошибок":>8}{"оп/с":>12}'
+        f'{"p50, мс":>10}{"p99, мс":>10}'
+    ]
+    for stage, result in report['stages'].items():
+        lines.append(
+            f'{stage:<16}{result["ops"]:>8}{result["errors"]:>8}'
+            f'{result["throughput"]:>12}{result["p50_ms"]:>10}'
+            f'{result["p99_ms"]:>10}')
+    lines.append(f'Пиковый RSS: {report["rss_mb"]} МБ')
+    lines.append(f'Соединения с API: {report["connections"]}')
+    return '\n'.join(lines)
+
+
+def parse_args(argv=None):
+    """Разбирает параметры командной строки."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--subscriptions', type=int, default=100)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=homework.POLL_WORKERS)
+    parser.add_argument('--homeworks', type=int, default=20)
+    parser.add_argument('--changes', type=int, default=1)
+    parser.add_argument('--api-latency', type=float, default=0.005)
+    parser.add_argument('--api-error-rate', type=float, default=0)
+    parser.add_argument('--telegram-latency', type=float, default=0.005)
+    parser.add_argument('--telegram-error-rate', type=float, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--startup-runs', type=int, default=10)
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    parser.add_argument(
+        '--log', action='store_true',
+        help='выводить журнал бота (по умолчанию он форматируется, '
+             'но не выводится)')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """Запускает бенчмарк и сравнивает результат с базовым замером."""
+    options = parse_args(argv)
+    stream = None if options.log else open(os.devnull, 'w')
+    log_listener = logs.configure(homework.logger, stream=stream)
+    logging.getLogger('telegram').setLevel(logging.WARNING)
+    try:
+        report = run_benchmark(options)
+    finally:
+        log_listener.stop()
+    print(format_report(report))
+    if options.save_baseline:
+        with open(options.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+        print(f'Базовый замер сохранён в {options.baseline}')
+        return 0
+    if not os.path.exists(options.baseline):
+        print('Базовый замер не найден, сравнение пропущено')
+        return 0
+    with open(options.baseline, encoding='utf-8') as file:
+        baseline = json.load(file)
+    if baseline['config'] != report['config']:
+        print('Параметры базового замера отличаются, сравнение пропущено')
+        return 0
+    regressions = compare(report, baseline, options.tolerance)
+    for regression in regressions:
+        print(f'Регрессия: {regression}')
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
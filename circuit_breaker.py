@@ -0,0 +1,185 @@
+"""Защита API Практикума от лавины запросов во время сбоя."""
+
+
+import threading
+import time
+from email.utils import parsedate_to_datetime
+from http import HTTPStatus
+
+from exceptions import CircuitOpenError
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+FAILURE = 'failure'
+THROTTLE = 'throttle'
+IGNORE = 'ignore'
+
+STATUS_POLICIES = {
+    HTTPStatus.TOO_MANY_REQUESTS: THROTTLE,
+    HTTPStatus.SERVICE_UNAVAILABLE: THROTTLE,
+    HTTPStatus.INTERNAL_SERVER_ERROR: FAILURE,
+    HTTPStatus.BAD_GATEWAY: FAILURE,
+    HTTPStatus.GATEWAY_TIMEOUT: FAILURE,
+    HTTPStatus.REQUEST_TIMEOUT: FAILURE,
+}
+RETRY_AFTER_CODES = (
+    HTTPStatus.TOO_MANY_REQUESTS, HTTPStatus.SERVICE_UNAVAILABLE)
+
+
+def parse_retry_after(value):
+    """Секунды из заголовка Retry-After (число или HTTP-дата) или None."""
+    if not value:
+        return None
+    try:
+        return max(float(value), 0)
+    except ValueError:
+        pass
+    try:
+        moment = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    return max(moment.timestamp() - time.time(), 0)
+
+
+class CircuitBreaker:
+    """Общий для всех подписок автомат closed → open → half-open.
+
+    После failure_threshold сбоев подряд цепь размыкается на
+    reset_timeout секунд, и запросы к API не отправляются. Затем
+    пропускается не более half_open_probes пробных запросов: успех
+    замыкает цепь, сбой снова размыкает её на вдвое больший срок,
+    но не больше max_timeout. Ответы 429 и 503 размыкают цепь сразу
+    на время из Retry-After. Коды, отсутствующие в policies (например,
+    401 для неверного токена), относятся к одной подписке: API при этом
+    отвечает, поэтому они учитываются как успех.
+    """
+
+    def __init__(self, failure_threshold=5, reset_timeout=30,
+                 max_timeout=600, half_open_probes=1,
+                 policies=STATUS_POLICIES, clock=time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.max_timeout = max_timeout
+        self.half_open_probes = half_open_probes
+        self.policies = policies
+        self.clock = clock
+        self.state = CLOSED
+        self._failures = 0
+        self._timeout = reset_timeout
+        self._opened_until = 0
+        self._probes = 0
+        self._lock = threading.Lock()
+
+    def before_request(self):
+        """Разрешает запрос или выбрасывает CircuitOpenError."""
+        with self._lock:
+            if self.state == OPEN:
+                if self.clock() < self._opened_until:
+                    raise CircuitOpenError(
+                        'API Практикума недоступно, запрос отложен')
+                self.state = HALF_OPEN
+                self._probes = 0
+            if self.state == HALF_OPEN:
+                if self._probes >= self.half_open_probes:
+                    raise CircuitOpenError(
+                        'Идёт пробный запрос к API Практикума')
+                self._probes += 1
+
+    def record_success(self):
+        """Учитывает успешный ответ API."""
+        with self._lock:
+            self.state = CLOSED
+            self._failures = 0
+            self._timeout = self.reset_timeout
+
+    def record_failure(self, status_code=None, retry_after=None):
+        """Учитывает сбой. status_code=None означает сетевую ошибку."""
+        policy = FAILURE
+        if status_code is not None:
+            policy = self.policies.get(status_code, IGNORE)
+        if policy == IGNORE:
+            self.record_success()
+            return
+        with self._lock:
+            self._failures += 1
+            if policy == THROTTLE:
+                self._open(retry_after or self.reset_timeout)
+            elif self.state == HALF_OPEN:
+                self._timeout = min(self._timeout * 2, self.max_timeout)
+                self._open(self._timeout)
+            elif self._failures >= self.failure_threshold:
+                self._open(self._timeout)
+
+    def _open(self, timeout):
+        self.state = OPEN
+        self._opened_until = self.clock() + min(timeout, self.max_timeout)
+
+
+class RetryBudget:
+    """Общий бюджет повторных запросов после сбоев.
+
+    Каждый успешный запрос добавляет ratio токена, кроме того бюджет
+    пополняется на min_per_second токенов в секунду. Повторный запрос
+    подписки, у которой предыдущий опрос завершился сбоем, тратит токен.
+    """
+
+    def __init__(self, ratio=0.1, min_per_second=1, capacity=10,
+                 clock=time.monotonic):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.capacity = capacity
+        self.clock = clock
+        self._tokens = capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def _refill(self):
+        now = self.clock()
+        self._tokens = min(
+            self.capacity,
+            self._tokens + (now - self._updated) * self.min_per_second)
+        self._updated = now
+
+    def deposit(self):
+        """Пополняет бюджет после успешного запроса."""
+        with self._lock:
+            self._refill()
+            self._tokens = min(self.capacity, self._tokens + self.ratio)
+
+    def withdraw(self):
+        """Тратит токен на повтор. Возвращает False, если бюджет исчерпан."""
+        with self._lock:
+            self._refill()
+            if self._tokens < 1:
+                return False
+            self._tokens -= 1
+            return True
+
+
+class ApiGuard:
+    """Связывает CircuitBreaker и RetryBudget с подписками."""
+
+    def __init__(self, breaker=None, budget=None):
+        self.breaker = breaker or CircuitBreaker()
+        self.budget = budget or RetryBudget()
+
+    def before_request(self, subscription):
+        """Проверяет, можно ли отправить запрос для подписки."""
+        if subscription.failures and not self.budget.withdraw():
+            raise CircuitOpenError('Исчерпан бюджет повторных запросов')
+        self.breaker.before_request()
+
+    def record_success(self, subscription):
+        """Учитывает успешный запрос подписки."""
+        subscription.failures = 0
+        self.budget.deposit()
+        self.breaker.record_success()
+
+    def record_failure(self, subscription, error):
+        """Учитывает сбой запроса подписки."""
+        subscription.failures += 1
+        self.breaker.record_failure(
+            getattr(error, 'status_code', None),
+            getattr(error, 'retry_after', None))
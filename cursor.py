@@ -0,0 +1,51 @@
+"""Инкрементальный курсор from_date для запросов к API Практикума."""
+
+
+import time
+
+
+class CursorPolicy:
+    """Определяет from_date очередного запроса подписки.
+
+    После успешного опроса from_date подписки сдвигается на current_date
+    из ответа API, и следующий ответ содержит только изменившиеся работы.
+    Раз в resync_time запрашивается вся история за history секунд,
+    чтобы исправить возможный рассинхрон. resync_time=None отключает
+    периодическую полную синхронизацию.
+    """
+
+    def __init__(self, history, resync_time=None, clock=time.time):
+        self.history = history
+        self.resync_time = resync_time
+        self.clock = clock
+
+    def full_from_date(self):
+        """from_date запроса полной истории."""
+        return int(self.clock()) - self.history
+
+    def resync_due(self, subscription):
+        """Пора ли запросить полную историю."""
+        if subscription.synced_at is None or not self.resync_time:
+            return False
+        return self.clock() - subscription.synced_at >= self.resync_time
+
+    def from_date(self, subscription):
+        """from_date для очередного запроса подписки."""
+        if subscription.from_date is None or self.resync_due(subscription):
+            return self.full_from_date()
+        return subscription.from_date
+
+    @staticmethod
+    def is_resync(subscription, requested_from_date):
+        """Запрошена ли с requested_from_date вся история подписки."""
+        return requested_from_date != subscription.from_date
+
+    def advance(self, subscription, response, requested_from_date):
+        """Сдвигает курсор после успешной обработки ответа."""
+        current_date = response.get('current_date')
+        if not isinstance(current_date, int):
+            return
+        if (subscription.synced_at is None
+                or self.is_resync(subscription, requested_from_date)):
+            subscription.synced_at = self.clock()
+        subscription.from_date = current_date
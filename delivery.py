@@ -0,0 +1,264 @@
+"""Очередь исходящих сообщений Telegram с ограничением частоты."""
+
+
+import heapq
+import logging
+import threading
+import time
+
+import metrics
+from lazy_imports import lazy_import
+
+telegram = lazy_import('telegram')
+
+logger = logging.getLogger(__name__)
+
+GLOBAL_RATE = 30
+CHAT_RATE = 1
+MESSAGE_LIMIT = 4096
+MAX_ATTEMPTS = 5
+SEPARATOR = '\n\n'
+CHAT_READY_LIMIT = 10000
+
+
+def is_transient(error):
+    """Ошибка сети, после которой отправку стоит повторить.
+
+    BadRequest в python-telegram-bot наследует NetworkError, но повтор
+    запроса с теми же данными его не исправит.
+    """
+    return (isinstance(error, telegram.error.NetworkError)
+            and not isinstance(error, telegram.error.BadRequest))
+
+
+class TokenBucket:
+    """Token bucket: rate токенов в секунду, не больше capacity в запасе."""
+
+    def __init__(self, rate, capacity=None, clock=time.monotonic):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self.clock = clock
+        self._tokens = self.capacity
+        self._updated = clock()
+        self._lock = threading.Lock()
+
+    def reserve(self):
+        """Забирает токен. Возвращает, сколько секунд нужно подождать."""
+        with self._lock:
+            now = self.clock()
+            self._tokens = min(
+                self.capacity,
+                self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+            self._tokens -= 1
+            if self._tokens >= 0:
+                return 0
+            return -self._tokens / self.rate
+
+
+class DeliveryQueue:
+    """Очередь доставки сообщений, отвязанная от цикла опроса.
+
+    Объект можно передавать вместо telegram.Bot: send_message() только
+    ставит сообщение в очередь. Фоновые потоки отправляют сообщения,
+    соблюдая общий лимит global_rate и лимит chat_rate на чат. Все
+    сообщения, накопившиеся для одного чата, склеиваются в одно
+    (в пределах MESSAGE_LIMIT символов). При RetryAfter чат
+    откладывается на указанное Telegram время, ошибки сети повторяются
+    с экспоненциальной задержкой до MAX_ATTEMPTS раз, а постоянные
+    ошибки (BadRequest, Unauthorized и другие) не повторяются:
+    сообщение сразу отбрасывается.
+    Если неотправленных сообщений max_pending, send_message() ждёт,
+    пока очередь не освободится: опрос притормаживает вместо того,
+    чтобы накапливать сообщения в памяти. Режим разметки parse_mode
+    задаётся для чата: действует переданный с последним сообщением.
+    """
+
+    def __init__(self, bot, global_rate=GLOBAL_RATE, chat_rate=CHAT_RATE,
+                 senders=4, clock=time.monotonic, max_pending=None):
+        self.bot = bot
+        self.chat_interval = 1 / chat_rate
+        self.clock = clock
+        self.senders = senders
+        self.max_pending = max_pending
+        self._bucket = TokenBucket(global_rate, clock=clock)
+        self._pending = {}
+        self._attempts = {}
+        self._chat_ready_at = {}
+        self._heap = []
+        self._busy = set()
+        self._parse_modes = {}
+        self._depth = 0
+        lock = threading.Lock()
+        self._condition = threading.Condition(lock)
+        self._space = threading.Condition(lock)
+        self._stopping = False
+        self._threads = []
+        self.delivered = 0
+        self.dropped = 0
+
+    def send_message(self, chat_id=None, text=None, parse_mode=None,
+                     **kwargs):
+        """Ставит сообщение в очередь доставки."""
+        with self._condition:
+            while (self.max_pending and self._depth >= self.max_pending
+                   and not self._stopping):
+                self._space.wait()
+            self._depth += 1
+            if parse_mode:
+                self._parse_modes[chat_id] = parse_mode
+            else:
+                self._parse_modes.pop(chat_id, None)
+            texts = self._pending.get(chat_id)
+            if texts is not None:
+                texts.append(text)
+                return
+            self._pending[chat_id] = [text]
+            if chat_id not in self._busy:
+                ready_at = max(
+                    self.clock(), self._chat_ready_at.pop(chat_id, 0))
+                self._schedule(chat_id, ready_at)
+
+    def _schedule(self, chat_id, ready_at):
+        heapq.heappush(self._heap, (ready_at, str(chat_id), chat_id))
+        self._condition.notify()
+
+    def depth(self):
+        """Число сообщений, ожидающих отправки или отправляемых сейчас."""
+        return self._depth
+
+    def start(self):
+        """Запускает потоки отправки."""
+        for number in range(self.senders):
+            thread = threading.Thread(
+                target=self._sender, name=f'delivery-{number}', daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def close(self, timeout=None):
+        """Дожидается отправки очереди не дольше timeout секунд.
+
+        Возвращает число сообщений, которые не удалось отправить.
+        """
+        deadline = None if timeout is None else self.clock() + timeout
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            self._space.notify_all()
+        for thread in self._threads:
+            remaining = None
+            if deadline is not None:
+                remaining = max(deadline - self.clock(), 0)
+            thread.join(remaining)
+        return self.depth()
+
+    @staticmethod
+    def coalesce(texts):
+        """Склеивает сообщения чата. Возвращает текст и остаток."""
+        size = len(texts[0])
+        count = 1
+        while count < len(texts):
+            size += len(SEPARATOR) + len(texts[count])
+            if size > MESSAGE_LIMIT:
+                break
+            count += 1
+        return SEPARATOR.join(texts[:count]), texts[count:]
+
+    def _next_chat(self):
+        with self._condition:
+            while True:
+                delay = None
+                if self._heap:
+                    delay = self._heap[0][0] - self.clock()
+                    if delay <= 0:
+                        _, _, chat_id = heapq.heappop(self._heap)
+                        self._busy.add(chat_id)
+                        return chat_id, self._pending.pop(chat_id)
+                elif self._stopping:
+                    return None, None
+                self._condition.wait(delay)
+
+    def _finish(self, chat_id, rest, ready_at, done):
+        with self._condition:
+            self._depth -= done
+            if done:
+                self._space.notify_all()
+            self._busy.discard(chat_id)
+            if rest:
+                self._pending[chat_id] = rest + self._pending.get(chat_id, [])
+            if chat_id in self._pending:
+                self._schedule(chat_id, ready_at)
+            else:
+                self._parse_modes.pop(chat_id, None)
+                self._chat_ready_at[chat_id] = ready_at
+                if len(self._chat_ready_at) > CHAT_READY_LIMIT:
+                    self._prune_ready_at()
+            self._condition.notify_all()
+
+    def _prune_ready_at(self):
+        now = self.clock()
+        self._chat_ready_at = {
+            chat_id: ready_at
+            for chat_id, ready_at in self._chat_ready_at.items()
+            if ready_at > now
+        }
+
+    def _sender(self):
+        while True:
+            chat_id, texts = self._next_chat()
+            if chat_id is None:
+                return
+            delay = self._bucket.reserve()
+            if delay:
+                time.sleep(delay)
+            text, rest = self.coalesce(texts)
+            ready_at = self._deliver(chat_id, text)
+            if ready_at is None:
+                ready_at = self.clock() + self.chat_interval
+            else:
+                rest = texts
+            self._finish(chat_id, rest, ready_at, len(texts) - len(rest))
+
+    def _deliver(self, chat_id, text):
+        """Отправляет текст. Возвращает срок повтора или None при успехе."""
+        parse_mode = self._parse_modes.get(chat_id)
+        options = {'parse_mode': parse_mode} if parse_mode else {}
+        try:
+            with metrics.DELIVERY_SECONDS.time():
+                self.bot.send_message(chat_id=chat_id, text=text, **options)
+        except telegram.error.RetryAfter as error:
+            metrics.count_error(error)
+            logger.warning(
+                'Telegram просит подождать %s с перед отправкой в чат %s',
+                error.retry_after, chat_id)
+            return self.clock() + error.retry_after
+        except telegram.TelegramError as error:
+            metrics.count_error(error)
+            if is_transient(error):
+                return self._retry(chat_id, error)
+            return self._drop(chat_id, error)
+        self._attempts.pop(chat_id, None)
+        with self._condition:
+            self.delivered += 1
+        logger.info('Сообщение в чат %s успешно отправлено', chat_id)
+        return None
+
+    def _retry(self, chat_id, error):
+        """Откладывает повтор после временной ошибки сети."""
+        attempts = self._attempts.get(chat_id, 0) + 1
+        if attempts >= MAX_ATTEMPTS:
+            return self._drop(chat_id, error, attempts)
+        self._attempts[chat_id] = attempts
+        logger.error(error)
+        return self.clock() + self.chat_interval * 2 ** attempts
+
+    def _drop(self, chat_id, error, attempts=1):
+        """Отбрасывает сообщение, которое не удалось доставить."""
+        self._attempts.pop(chat_id, None)
+        with self._condition:
+            self.dropped += 1
+        logger.error(
+            'Сообщение в чат %s не доставлено после %s попыток: %s',
+            chat_id, attempts, error)
+        return None
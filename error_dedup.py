@@ -0,0 +1,63 @@
+"""Дедупликация уведомлений об ошибках."""
+
+
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+
+ERROR_TTL = 24 * 60 * 60
+CACHE_SIZE = 10000
+
+
+class ErrorDeduplicator:
+    """Ограниченный по размеру кэш отправленных уведомлений об ошибках.
+
+    Ошибки группируются по подписке и классу исключения, а не по тексту,
+    поэтому меняющиеся детали сообщения не порождают новых уведомлений.
+    Повторная ошибка той же группы снова отправляется по истечении ttl
+    секунд. При переполнении вытесняются давно не встречавшиеся группы.
+    """
+
+    def __init__(self, ttl=ERROR_TTL, maxsize=CACHE_SIZE, clock=time.time):
+        self.ttl = ttl
+        self.maxsize = maxsize
+        self.clock = clock
+        self._reported = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(scope, error):
+        """Ключ группы ошибки: хэш подписки и класса исключения."""
+        group = f'{scope!r}:{type(error).__qualname__}'.encode()
+        return hashlib.blake2b(group, digest_size=12).hexdigest()
+
+    def should_report(self, key):
+        """Нужно ли отправлять уведомление об ошибке группы key."""
+        now = self.clock()
+        with self._lock:
+            reported_at = self._reported.get(key)
+            if reported_at is not None and now - reported_at < self.ttl:
+                self._reported.move_to_end(key)
+                return False
+            self._remember(key, now)
+            return True
+
+    def restore(self, key, reported_at):
+        """Восстанавливает отправленное ранее уведомление из хранилища."""
+        with self._lock:
+            self._remember(key, reported_at)
+
+    def forget(self, key):
+        """Забывает группу ошибки после восстановления работы."""
+        with self._lock:
+            self._reported.pop(key, None)
+
+    def _remember(self, key, reported_at):
+        self._reported[key] = reported_at
+        self._reported.move_to_end(key)
+        while len(self._reported) > self.maxsize:
+            self._reported.popitem(last=False)
+
+    def __len__(self):
+        return len(self._reported)
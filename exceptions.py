@@ -4,7 +4,10 @@ class YandexApiResponseError(Exception):
     Статус ответа не равен 200.
     """
 
-    pass
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
 
 
 class UnknownHomeworkStatus(Exception):
@@ -20,3 +23,12 @@ class ResponseHasNoHomeworks(Exception):
     """Принемаемый функцией аргумент не содержит ожидаемого ключа."""
 
     pass
+
+
+class CircuitOpenError(Exception):
+    """Запрос к API не отправлен.
+
+    Цепь разомкнута после серии сбоев или исчерпан бюджет повторов.
+    """
+
+    pass
@@ -1,30 +1,115 @@
 """Получает данные о статусе домашней работы и отправляет их в телеграм."""
 
 
+import codecs
+import functools
 import logging
 import os
+import signal
+import socket
+import threading
 import time
 from http import HTTPStatus
 from json.decoder import JSONDecodeError
 
-import requests
-import telegram
-from dotenv import load_dotenv
-
+import logs
+import metrics
+from circuit_breaker import (
+    ApiGuard, CircuitBreaker, RetryBudget, RETRY_AFTER_CODES,
+    parse_retry_after)
+from cursor import CursorPolicy
+from delivery import DeliveryQueue
+from error_dedup import ErrorDeduplicator
 from exceptions import (
-    YandexApiResponseError, UnknownHomeworkStatus,
-    ResponseHasNoHomeworks)
+    YandexApiResponseError, ResponseHasNoHomeworks, CircuitOpenError)
+from admin import AdminServer
+from lazy_imports import LazyObject, lazy_import
+from live_config import ConfigManager
+from messages import MessageCatalog, read_messages
+from records import Homework, StatusTable, status_name
+from response_cache import ResponseCache
+from scheduler import AdaptiveInterval, FixedInterval, PollScheduler
+from sharding import ShardCoordinator
+from single_flight import SingleFlight
+from storage import DEFAULT_PATHS, open_store
+from streaming import CHUNK_SIZE, HomeworkStream
+from subscriptions import Subscription, SubscriptionRegistry
+from webhook import WebhookServer
 
-load_dotenv()
+requests = lazy_import('requests')
+telegram = lazy_import('telegram')
+dotenv = lazy_import('dotenv')
+http_session = lazy_import('http_session')
 
+RETRY_TIME = 600
 
-PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
-TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
-TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
 
-RETRY_TIME = 600
+def read_settings():
+    """Читает настройки бота из переменных окружения."""
+    global PRACTICUM_TOKEN, TELEGRAM_TOKEN, TELEGRAM_CHAT_ID, \
+        SUBSCRIPTIONS_FILE, POLL_WORKERS, BREAKER_THRESHOLD, \
+        BREAKER_RESET_TIME, RETRY_BUDGET_RATIO, ERROR_TTL, ERROR_CACHE_SIZE, \
+        STREAM_RESPONSES, STREAM_LIMIT, RESPONSE_CACHE_SIZE, HTTP_POOL_SIZE, \
+        DELIVERY_SENDERS, DELIVERY_RATE, CHAT_RATE, SHUTDOWN_TIMEOUT, \
+        STATE_BACKEND, STATE_PATH, METRICS_PORT, METRICS_ADDRESS, LOG_LEVEL, \
+        LOG_FORMAT, LOG_SAMPLE, SHARDING, SHARD_WORKER, WEBHOOK_PORT, \
+        WEBHOOK_ADDRESS, WEBHOOK_SECRET, RECONCILE_TIME, FAST_RETRY_TIME, \
+        MAX_RETRY_TIME, RECENT_CHANGE_TIME, FULL_RESYNC_TIME, \
+        CONFIG_WATCH_TIME, ADMIN_PORT, ADMIN_ADDRESS, ADMIN_SECRET, \
+        COALESCE_TIME, API_CONNECT_TIMEOUT, API_READ_TIMEOUT, \
+        TELEGRAM_TIMEOUT, DELIVERY_QUEUE_LIMIT, MESSAGES_FILE, \
+        MESSAGE_CACHE_SIZE
+    PRACTICUM_TOKEN = os.getenv('PRACTICUM_TOKEN')
+    TELEGRAM_TOKEN = os.getenv('TELEGRAM_TOKEN')
+    TELEGRAM_CHAT_ID = os.getenv('TELEGRAM_CHAT_ID')
+    SUBSCRIPTIONS_FILE = os.getenv('SUBSCRIPTIONS_FILE')
+    POLL_WORKERS = int(os.getenv('POLL_WORKERS', 16))
+    BREAKER_THRESHOLD = int(os.getenv('BREAKER_THRESHOLD', 5))
+    BREAKER_RESET_TIME = int(os.getenv('BREAKER_RESET_TIME', 30))
+    RETRY_BUDGET_RATIO = float(os.getenv('RETRY_BUDGET_RATIO', 0.1))
+    ERROR_TTL = int(os.getenv('ERROR_TTL', 24 * 60 * 60))
+    ERROR_CACHE_SIZE = int(os.getenv('ERROR_CACHE_SIZE', 10000))
+    STREAM_RESPONSES = os.getenv('STREAM_RESPONSES', '') == '1'
+    STREAM_LIMIT = int(os.getenv('STREAM_LIMIT', 0)) or None
+    RESPONSE_CACHE_SIZE = int(os.getenv('RESPONSE_CACHE_SIZE', 10000))
+    HTTP_POOL_SIZE = int(os.getenv('HTTP_POOL_SIZE', POLL_WORKERS))
+    DELIVERY_SENDERS = int(os.getenv('DELIVERY_SENDERS', 4))
+    DELIVERY_RATE = float(os.getenv('DELIVERY_RATE', 30))
+    CHAT_RATE = float(os.getenv('CHAT_RATE', 1))
+    SHUTDOWN_TIMEOUT = int(os.getenv('SHUTDOWN_TIMEOUT', 20))
+    STATE_BACKEND = os.getenv('STATE_BACKEND', 'sqlite')
+    STATE_PATH = os.getenv('STATE_PATH') or DEFAULT_PATHS.get(STATE_BACKEND)
+    METRICS_PORT = int(os.getenv('METRICS_PORT', 0))
+    METRICS_ADDRESS = os.getenv('METRICS_ADDRESS', '127.0.0.1')
+    LOG_LEVEL = os.getenv('LOG_LEVEL', 'DEBUG')
+    LOG_FORMAT = os.getenv('LOG_FORMAT', 'text')
+    LOG_SAMPLE = int(os.getenv('LOG_SAMPLE', 1))
+    SHARDING = os.getenv('SHARDING', '') == '1'
+    SHARD_WORKER = os.getenv('SHARD_WORKER')
+    WEBHOOK_PORT = int(os.getenv('WEBHOOK_PORT', 0))
+    WEBHOOK_ADDRESS = os.getenv('WEBHOOK_ADDRESS', '127.0.0.1')
+    WEBHOOK_SECRET = os.getenv('WEBHOOK_SECRET')
+    RECONCILE_TIME = int(os.getenv('RECONCILE_TIME', 60 * 60))
+    FAST_RETRY_TIME = int(os.getenv('FAST_RETRY_TIME', 60))
+    MAX_RETRY_TIME = int(os.getenv('MAX_RETRY_TIME', 60 * 60))
+    RECENT_CHANGE_TIME = int(os.getenv('RECENT_CHANGE_TIME', 60 * 60))
+    FULL_RESYNC_TIME = int(os.getenv('FULL_RESYNC_TIME', 24 * 60 * 60))
+    CONFIG_WATCH_TIME = float(os.getenv('CONFIG_WATCH_TIME', 5))
+    ADMIN_PORT = int(os.getenv('ADMIN_PORT', 0))
+    ADMIN_ADDRESS = os.getenv('ADMIN_ADDRESS', '127.0.0.1')
+    ADMIN_SECRET = os.getenv('ADMIN_SECRET')
+    COALESCE_TIME = float(os.getenv('COALESCE_TIME', 5))
+    API_CONNECT_TIMEOUT = float(os.getenv('API_CONNECT_TIMEOUT', 5))
+    API_READ_TIMEOUT = float(os.getenv('API_READ_TIMEOUT', 30))
+    TELEGRAM_TIMEOUT = float(os.getenv('TELEGRAM_TIMEOUT', 10))
+    DELIVERY_QUEUE_LIMIT = int(os.getenv('DELIVERY_QUEUE_LIMIT', 10000))
+    MESSAGES_FILE = os.getenv('MESSAGES_FILE')
+    MESSAGE_CACHE_SIZE = int(os.getenv('MESSAGE_CACHE_SIZE', 10000))
+
+
+read_settings()
+
 ENDPOINT = 'https://practicum.yandex.ru/api/user_api/homework_statuses/'
-HEADERS = {'Authorization': f'OAuth {PRACTICUM_TOKEN}'}
 
 HOMEWORK_STATUSES = {
     'approved': 'Работа проверена: ревьюеру всё понравилось. Ура!',
@@ -32,54 +117,205 @@ HOMEWORK_STATUSES = {
     'rejected': 'Работа проверена: у ревьюера есть замечания.'
 }
 
+STATUS_TABLE = StatusTable(HOMEWORK_STATUSES)
+MESSAGE_CONFIG = None
+
+
+def set_statuses(statuses):
+    """Заменяет тексты статусов, применяется к следующим уведомлениям.
+
+    Тексты задают язык по умолчанию, шаблоны уведомлений (см. MESSAGES)
+    компилируются заново.
+    """
+    global HOMEWORK_STATUSES, STATUS_TABLE, MESSAGES
+    MESSAGES = MessageCatalog.from_config(
+        MESSAGE_CONFIG, statuses, MESSAGE_CACHE_SIZE)
+    STATUS_TABLE = StatusTable(statuses)
+    HOMEWORK_STATUSES = dict(statuses)
+
+
 YEAR = 31556926
 
 
+def reset_state():
+    """Создаёт общие для всех подписок объекты по текущим настройкам."""
+    global CURSOR, RESPONSE_CACHE, ERRORS, API_GUARD, SINGLE_FLIGHT, \
+        MESSAGE_CONFIG
+    CURSOR = CursorPolicy(YEAR, FULL_RESYNC_TIME)
+    RESPONSE_CACHE = ResponseCache(RESPONSE_CACHE_SIZE)
+    ERRORS = ErrorDeduplicator(ERROR_TTL, ERROR_CACHE_SIZE)
+    API_GUARD = ApiGuard(
+        CircuitBreaker(BREAKER_THRESHOLD, BREAKER_RESET_TIME, RETRY_TIME),
+        RetryBudget(RETRY_BUDGET_RATIO))
+    SINGLE_FLIGHT = SingleFlight(COALESCE_TIME)
+    MESSAGE_CONFIG = read_messages(MESSAGES_FILE) if MESSAGES_FILE else None
+    set_statuses(HOMEWORK_STATUSES)
+
+
+reset_state()
+NOTIFY_LOCKS = tuple(threading.Lock() for _ in range(64))
+
+
+def make_poll_policy(reconcile=False):
+    """Политика интервала опроса из настроек окружения.
+
+    В push-режиме опрос только сверяет состояние раз в RECONCILE_TIME.
+    """
+    if reconcile:
+        return FixedInterval(RECONCILE_TIME)
+    return AdaptiveInterval(
+        RETRY_TIME, FAST_RETRY_TIME, MAX_RETRY_TIME, RECENT_CHANGE_TIME)
+
+
 logger = logging.getLogger(__name__)
 logger.setLevel(logging.DEBUG)
-handler = logging.StreamHandler()
-logger.addHandler(handler)
-formatter = logging.Formatter(
-    '%(asctime)s - %(name)s - [%(levelname)s] - %(message)s')
-handler.setFormatter(formatter)
+
+
+def init(stream=None):
+    """Step 0: Загружает .env, перечитывает настройки и настраивает журнал.
+
+    Импорт модуля не загружает .env, не трогает журнал и не импортирует
+    telegram и requests: всё это делается здесь или при первом
+    обращении. Возвращает QueueListener журнала, который нужно
+    остановить при завершении.
+    """
+    dotenv.load_dotenv()
+    read_settings()
+    reset_state()
+    return logs.configure(
+        logger, LOG_LEVEL, LOG_FORMAT == 'json', LOG_SAMPLE, stream)
+
+
+def make_bot():
+    """Бот Telegram для очереди доставки."""
+    return telegram.Bot(
+        token=TELEGRAM_TOKEN,
+        request=telegram.utils.request.Request(
+            con_pool_size=DELIVERY_SENDERS + 1,
+            connect_timeout=TELEGRAM_TIMEOUT, read_timeout=TELEGRAM_TIMEOUT))
 
 
 def send_message(bot, message):
     """Step 5: Отправляет сообщение в Telegram чат."""
+    send_to_chat(bot, TELEGRAM_CHAT_ID, message)
+
+
+@metrics.STEP_SECONDS.timed('send_message')
+def send_to_chat(bot, chat_id, message):
+    """Отправляет сообщение в указанный Telegram чат.
+
+    Режим разметки берётся из шаблонов языка чата (см. MESSAGES).
+    """
+    parse_mode = MESSAGES.parse_mode(chat_id)
+    options = {'parse_mode': parse_mode} if parse_mode else {}
     try:
         bot.send_message(
-            chat_id=TELEGRAM_CHAT_ID,
-            text=message
+            chat_id=chat_id,
+            text=message,
+            **options
         )
-        logger.info(f'Сообщение: {message} - успешно отправлено')
+        logger.info('Сообщение: %s - успешно отправлено', message)
     except telegram.TelegramError as error:
         logger.error(error)
         raise error
 
 
+def make_headers(token):
+    """Заголовки авторизации для запроса к API Практикума."""
+    return {'Authorization': f'OAuth {token}'}
+
+
 def get_api_answer(current_timestamp):
     """Step 2: Получает данные о статусе домашних работ за месяц."""
+    return fetch_api_answer(PRACTICUM_TOKEN, current_timestamp)
+
+
+def api_response_error(status_code, response):
+    """Исключение для ответа API с кодом, отличным от 200."""
+    retry_after = None
+    if status_code in RETRY_AFTER_CODES:
+        retry_after = parse_retry_after(response.headers.get('Retry-After'))
+    return YandexApiResponseError(
+        f'Ошибка ответа от сервера Яндекс. Код ответа: {status_code}',
+        status_code, retry_after)
+
+
+def request_api(token, current_timestamp, extra_headers=None, **kwargs):
+    """Отправляет запрос к API Практикума и возвращает ответ requests.
+
+    Установка соединения ограничена API_CONNECT_TIMEOUT секундами,
+    ожидание очередной порции ответа — API_READ_TIMEOUT: зависшее
+    соединение занимает поток опроса не дольше этого.
+    """
+    kwargs.setdefault('timeout', (API_CONNECT_TIMEOUT, API_READ_TIMEOUT))
     timestamp = current_timestamp or int(time.time())
     params = {'from_date': timestamp}
+    headers = make_headers(token)
+    if extra_headers:
+        headers.update(extra_headers)
+    session = http_session.current()
+    http_get = requests.get if session is None else session.get
     try:
-        response = requests.get(ENDPOINT, headers=HEADERS, params=params)
+        response = http_get(ENDPOINT, headers=headers, params=params, **kwargs)
     except requests.exceptions.RequestException as error:
         logger.error(error)
         raise error
-    logger.info(f'step 2 - status code: {response.status_code}')
+    logger.info(
+        'step 2 - status code: %s', response.status_code,
+        extra={'step': 2})
+    return response
+
+
+@metrics.STEP_SECONDS.timed('get_api_answer')
+def fetch_api_answer(token, current_timestamp, cache=None, cache_key=None):
+    """Получает данные о статусе домашних работ для указанного токена.
+
+    С кэшем ответов запрос отправляется условным (If-None-Match,
+    If-Modified-Since) по ответу, запомненному для cache_key (ключа
+    подписки, по умолчанию token). Если данные не изменились — ответ 304
+    или тело с тем же хэшем, — возвращает None, и разбор пропускается.
+    """
+    if cache_key is None:
+        cache_key = token
+    extra_headers = None
+    if cache is not None:
+        extra_headers = cache.conditional_headers(cache_key)
+    response = request_api(token, current_timestamp, extra_headers)
     status_code = response.status_code
+    if cache is not None and status_code == HTTPStatus.NOT_MODIFIED:
+        cache.not_modified(cache_key)
+        return None
     if status_code != HTTPStatus.OK:
-        raise YandexApiResponseError(
-            f'Ошибка ответа от сервера Яндекс. Код ответа: {status_code}')
+        raise api_response_error(status_code, response)
+    if cache is not None and cache.update(
+            cache_key, response.headers, response.content):
+        return None
     try:
         response = response.json()
     except JSONDecodeError as error:
         logger.error(error)
         raise error
-    logger.info('step 2 - выполнен')
+    logger.info('step 2 - выполнен', extra={'step': 2})
     return response
 
 
+@metrics.STEP_SECONDS.timed('get_api_answer')
+def fetch_api_stream(token, current_timestamp):
+    """Получает ответ API в виде потока записей HomeworkStream.
+
+    Тело читается по мере разбора, поэтому пиковая память не зависит
+    от длины истории работ.
+    """
+    response = request_api(token, current_timestamp, stream=True)
+    status_code = response.status_code
+    if status_code != HTTPStatus.OK:
+        response.close()
+        raise api_response_error(status_code, response)
+    chunks = codecs.iterdecode(response.iter_content(CHUNK_SIZE), 'utf-8')
+    return HomeworkStream(chunks, close=response.close)
+
+
+@metrics.STEP_SECONDS.timed('check_response')
 def check_response(response):
     """Step 3: Проверяет ответ API на корректность."""
     if not isinstance(response, dict):
@@ -93,68 +329,494 @@ def check_response(response):
     homeworks = response['homeworks']
     if not isinstance(homeworks, list):
         raise TypeError('Функция возвращает не список')
-    logger.info('step 3 - выполнен')
+    logger.info('step 3 - выполнен', extra={'step': 3})
     return homeworks
 
 
+def check_response_stream(stream, limit=None):
+    """Step 3 для потокового ответа: проверяет записи по мере чтения.
+
+    Отдаёт не больше limit записей (API отдаёт новые работы первыми).
+    """
+    if not isinstance(stream, HomeworkStream):
+        raise TypeError(
+            f'Функция получила на вход аргумент типа: {type(stream)}.'
+            'Ожидаемыей тип: HomeworkStream'
+        )
+    for number, homework in enumerate(stream, 1):
+        if not isinstance(homework, dict):
+            raise TypeError('Запись домашней работы не является словарём')
+        yield homework
+        if limit is not None and number >= limit:
+            return
+    if not stream.has_homeworks:
+        raise ResponseHasNoHomeworks(
+            'Проверяемый ответ от сервера не содержит ключ "homeworks"')
+    if stream.homeworks_value is not None:
+        raise TypeError('Функция возвращает не список')
+    logger.info('step 3 - выполнен', extra={'step': 3})
+
+
 def parse_status(homework):
     """Step 4: Извлекает статус последней домашней работы."""
-    if 'homework_name' not in homework and 'status' not in homework:
-        raise KeyError('Ключи homework_name и status не найдены')
-    homework_name = homework['homework_name']
-    homework_status = homework['status']
-    if homework_status not in HOMEWORK_STATUSES:
-        raise UnknownHomeworkStatus(
-            f'{homework_status} - неизвестный статус домашней работы')
+    return render_status(Homework.from_dict(homework))
+
+
+def parse_homeworks(homework_list):
+    """Записи Homework для работ из ответа API, по мере чтения."""
+    return map(Homework.from_dict, homework_list)
 
-    verdict = HOMEWORK_STATUSES[homework_status]
-    logger.info('step 4 - выполнен')
-    return f'Изменился статус проверки работы "{homework_name}". {verdict}'
+
+@metrics.STEP_SECONDS.timed('parse_status')
+def render_status(record, chat_id=None):
+    """Текст уведомления о статусе работы record на языке чата chat_id.
+
+    Без чата текст берётся из шаблонов языка по умолчанию (см. MESSAGES).
+    """
+    STATUS_TABLE.verify(record)
+    logger.info('step 4 - выполнен', extra={'step': 4})
+    return MESSAGES.status_message(chat_id, record.status, record.name)
 
 
 def check_tokens():
     """Step 1: Проверяет доступность переменных окружения.
 
-    Которые необходимы для работы программы.
+    Которые необходимы для работы программы. Вместо пары
+    PRACTICUM_TOKEN и TELEGRAM_CHAT_ID можно указать файл подписок
+    SUBSCRIPTIONS_FILE.
     """
-    if PRACTICUM_TOKEN and TELEGRAM_TOKEN and TELEGRAM_CHAT_ID:
-        logger.info('step 1 - выполнен')
+    has_subscriptions = (
+        PRACTICUM_TOKEN and TELEGRAM_CHAT_ID) or SUBSCRIPTIONS_FILE
+    if TELEGRAM_TOKEN and has_subscriptions:
+        logger.info('step 1 - выполнен', extra={'step': 1})
         return True
     else:
         logger.critical('Отсутствуют переменные окружения')
         return False
 
 
-def main():
-    """Основная логика работы бота.
+def token_is_valid(token):
+    """Принимает ли API Практикума токен.
+
+    Запрос проходит через API_GUARD. Отказом считаются только ответы
+    401 и 403: при сбое сети или API токен проверить нельзя, и подписка
+    добавляется.
+    """
+    probe = Subscription(token, None)
+    try:
+        API_GUARD.before_request(probe)
+        response = request_api(token, int(time.time()))
+    except CircuitOpenError:
+        return True
+    except requests.exceptions.RequestException as error:
+        API_GUARD.record_failure(probe, error)
+        return True
+    status_code = response.status_code
+    if status_code == HTTPStatus.OK:
+        API_GUARD.record_success(probe)
+    else:
+        API_GUARD.record_failure(
+            probe, api_response_error(status_code, response))
+    return status_code not in (HTTPStatus.UNAUTHORIZED, HTTPStatus.FORBIDDEN)
+
+
+def pending_changes(subscription, homework_list):
+    """Изменившиеся работы в хронологическом порядке.
+
+    При первом опросе подписки (курсор ещё ни разу не сдвигался)
+    индекс заполняется всей историей, а уведомление отправляется только
+    о последней работе.
+    """
+    index = subscription.index
+    changes = index.diff(parse_homeworks(homework_list))
+    if subscription.synced_at is None and changes:
+        for homework in changes[1:]:
+            index.mark(homework)
+        changes = changes[:1]
+    return changes[::-1]
 
-    Проверяет статус последней работы и в случае изменения статуса
-    отпрявляет уведомление в телеграм чат, а в случает ошибки отправляет
-    в телеграм чат однократное уведомление об ошибке.
+
+def notify_lock(subscription):
+    """Блокировка, под которой сверяется и обновляется индекс подписки.
+
+    Опрос и событие webhook для одной подписки могут прийти
+    одновременно, блокировка не даёт отправить изменение дважды.
     """
-    current_date = int(time.time())
-    from_date = current_date - YEAR
-    bot = telegram.Bot(token=TELEGRAM_TOKEN)
-    errors_list = []
-    last_homework_status = ['has no status yet']
-    while check_tokens():
+    return NOTIFY_LOCKS[hash(subscription.key) % len(NOTIFY_LOCKS)]
+
+
+def notify_changes(bot, subscription, homework_list):
+    """Отправляет по одному уведомлению на каждое изменение статуса.
+
+    Возвращает число отправленных изменений.
+    """
+    with notify_lock(subscription):
+        changes = pending_changes(subscription, homework_list)
+        if not changes:
+            logger.debug('Статус работы не изменился.')
+        for homework in changes:
+            try:
+                message = render_status(homework, subscription.chat_id)
+            except Exception:
+                subscription.index.mark(homework)
+                raise
+            send_to_chat(bot, subscription.chat_id, message)
+            subscription.index.mark(homework)
+            metrics.STATUS_CHANGES.inc(status_name(homework.status))
+    return len(changes)
+
+
+def error_message(subscription, error):
+    """Текст уведомления об ошибке или None, если оно уже отправлялось.
+
+    Уведомления дедуплицируются по классу исключения (см. ERRORS):
+    повторная ошибка той же группы отправляется не чаще раза в ERROR_TTL.
+    """
+    logger.error(error)
+    key = ERRORS.key(subscription.key, error)
+    if not ERRORS.should_report(key):
+        return None
+    active = dict(subscription.error_keys)
+    active[key] = time.time()
+    subscription.error_keys = tuple(active.items())
+    return MESSAGES.error_message(subscription.chat_id, error)
+
+
+def recovery_message(subscription):
+    """Текст уведомления о восстановлении или None, если сбоя не было."""
+    if not subscription.error_keys:
+        return None
+    for key, _ in subscription.error_keys:
+        ERRORS.forget(key)
+    subscription.error_keys = ()
+    return MESSAGES.recovery_message(subscription.chat_id)
+
+
+def guarded_fetch(subscription, from_date):
+    """fetch_api_answer под защитой API_GUARD и SINGLE_FLIGHT."""
+    if STREAM_RESPONSES:
+        return guarded_request(subscription, from_date)
+    key = subscription.key
+    response, source = SINGLE_FLIGHT.do(
+        (subscription.token, from_date, RESPONSE_CACHE.state(key)),
+        shared_request, subscription, from_date)
+    if source != key:
+        RESPONSE_CACHE.copy(source, key)
+    return response
+
+
+def shared_request(subscription, from_date):
+    """guarded_request и ключ подписки, для которой запомнен ответ."""
+    return guarded_request(subscription, from_date), subscription.key
+
+
+def guarded_request(subscription, from_date):
+    """Запрос к API для подписки с учётом состояния API_GUARD."""
+    API_GUARD.before_request(subscription)
+    try:
+        if STREAM_RESPONSES:
+            response = fetch_api_stream(subscription.token, from_date)
+        else:
+            response = fetch_api_answer(
+                subscription.token, from_date, RESPONSE_CACHE,
+                subscription.key)
+    except Exception as error:
+        API_GUARD.record_failure(subscription, error)
+        raise
+    API_GUARD.record_success(subscription)
+    return response
+
+
+def process_response(bot, subscription, response, from_date):
+    """Шаги 3-5 для ответа API: словаря или потока HomeworkStream.
+
+    STREAM_LIMIT ограничивает только запрос всей истории: ответ
+    с курсора читается целиком, иначе курсор перескочил бы
+    непрочитанные работы.
+    """
+    if isinstance(response, HomeworkStream):
+        limit = None
+        if CURSOR.is_resync(subscription, from_date):
+            limit = STREAM_LIMIT
+        with response:
+            homeworks = check_response_stream(response, limit)
+            changes = notify_changes(bot, subscription, homeworks)
+            response.drain()
+    else:
+        homework_list = check_response(response)
+        changes = notify_changes(bot, subscription, homework_list)
+    CURSOR.advance(subscription, response, from_date)
+    return changes
+
+
+def poll_subscription(bot, subscription):
+    """Шаги 2-5 для одной подписки. Возвращает число изменений статуса."""
+    with logs.context(subscription.chat_id):
         try:
-            response = get_api_answer(from_date)
-            homework_list = check_response(response)
-            message = parse_status(homework_list[0])
-            if message not in last_homework_status:
-                send_message(bot, message)
-                last_homework_status[0] = message
+            from_date = CURSOR.from_date(subscription)
+            response = guarded_fetch(subscription, from_date)
+            changes = 0
+            if response is None:
+                logger.debug('Ответ API не изменился.')
             else:
-                logger.debug('Статус работы не изменился.')
-            time.sleep(RETRY_TIME)
+                changes = process_response(
+                    bot, subscription, response, from_date)
+            message = recovery_message(subscription)
+            if message:
+                send_to_chat(bot, subscription.chat_id, message)
+            return changes
+        except CircuitOpenError as error:
+            metrics.count_error(error)
+            logger.debug(error)
+            return 0
         except Exception as error:
-            message = f'Сбой в работе программы: {error}'
-            logger.error(error)
-            if message not in errors_list:
-                send_message(bot, message)
-                errors_list.append(message)
-            time.sleep(RETRY_TIME)
+            metrics.count_error(error)
+            RESPONSE_CACHE.forget(subscription.key)
+            message = error_message(subscription, error)
+            if message:
+                send_to_chat(bot, subscription.chat_id, message)
+            return 0
+
+
+def push_update(bot, subscription, response):
+    """Шаги 3-5 для события, присланного в webhook.
+
+    Курсор from_date не сдвигается: событие может содержать не все
+    изменившиеся работы, их подберёт сверочный опрос.
+    """
+    with logs.context(subscription.chat_id):
+        homework_list = check_response(response)
+        return notify_changes(bot, subscription, homework_list)
+
+
+def start_webhook(registry, bot, store):
+    """Запускает приём событий для подписок registry.
+
+    Возвращает сервер или None, если не задан WEBHOOK_SECRET.
+    """
+    if not WEBHOOK_SECRET:
+        logger.critical('Приём событий не запущен: не задан WEBHOOK_SECRET')
+        return None
+
+    def push(subscription, response):
+        changes = push_update(bot, subscription, response)
+        store.save(subscription)
+        return changes
+
+    return WebhookServer(
+        registry, push, WEBHOOK_SECRET, WEBHOOK_ADDRESS, WEBHOOK_PORT).start()
+
+
+def restore_subscription(store, subscription):
+    """Загружает состояние подписки из хранилища и ключи её ошибок."""
+    restored = store.load(subscription)
+    for key, reported_at in subscription.error_keys:
+        ERRORS.restore(key, reported_at)
+    return restored
+
+
+def start_sharding(store, registry):
+    """Запускает координатор шардов для подписок registry.
+
+    Процесс будет опрашивать только подписки из coordinator.owned.
+    """
+    worker = SHARD_WORKER or f'{socket.gethostname()}:{os.getpid()}'
+    coordinator = ShardCoordinator(
+        store, registry, worker,
+        restore=lambda subscription: restore_subscription(
+            store, subscription))
+    coordinator.refresh()
+    logger.info(
+        'Процесс %s: подписок %s из %s',
+        worker, len(coordinator.owned), len(registry))
+    return coordinator.start()
+
+
+def handle_signals(stop):
+    """Вызывает stop() по SIGTERM и SIGINT.
+
+    Обработчики ставятся только из главного потока. Возвращает прежние
+    обработчики сигналов.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return {}
+
+    def handler(signum, frame):
+        logger.warning(
+            'Получен сигнал %s, завершение работы',
+            signal.Signals(signum).name)
+        stop()
+
+    return {
+        signum: signal.signal(signum, handler)
+        for signum in (signal.SIGTERM, signal.SIGINT)
+    }
+
+
+def shutdown(scheduler, outbox, store, webhook=None, coordinator=None,
+             timeout=None):
+    """Дожидается опросов и отправки сообщений и сохраняет состояние.
+
+    Всё вместе укладывается в timeout секунд (по умолчанию
+    SHUTDOWN_TIMEOUT), после чего состояние записывается в хранилище
+    в любом случае. Возвращает число неотправленных сообщений.
+    """
+    if timeout is None:
+        timeout = SHUTDOWN_TIMEOUT
+    deadline = time.monotonic() + timeout
+
+    def remaining():
+        return max(deadline - time.monotonic(), 0)
+
+    if webhook is not None:
+        webhook.close()
+    running = scheduler.drain(remaining())
+    if running:
+        logger.warning('Не дождались завершения опросов: %s', running)
+    undelivered = outbox.close(remaining())
+    if undelivered:
+        logger.warning('Не отправлено сообщений: %s', undelivered)
+    if coordinator is not None:
+        coordinator.close()
+    store.close()
+    return undelivered
+
+
+def build_config(store=None):
+    """Собирает реестр подписок из переменных окружения и файла подписок.
+
+    Возвращает ConfigManager, который применяет изменения файла
+    SUBSCRIPTIONS_FILE к реестру manager.registry без перезапуска.
+    Токены подписок проверяются параллельно. Если передано хранилище,
+    состояние подписок восстанавливается из него.
+    """
+    registry = SubscriptionRegistry()
+    if PRACTICUM_TOKEN and TELEGRAM_CHAT_ID:
+        registry.add(PRACTICUM_TOKEN, TELEGRAM_CHAT_ID)
+    restore = None
+    if store is not None:
+        restore = functools.partial(restore_subscription, store)
+        for subscription in registry:
+            restore(subscription)
+    manager = ConfigManager(
+        registry, SUBSCRIPTIONS_FILE, check=token_is_valid, restore=restore,
+        set_statuses=set_statuses)
+    if SUBSCRIPTIONS_FILE:
+        manager.reload()
+    logger.info('Загружено подписок: %s', len(registry))
+    return manager
+
+
+def build_registry(store=None):
+    """Реестр подписок из переменных окружения и файла подписок."""
+    return build_config(store).registry
+
+
+def start_metrics():
+    """Запускает HTTP-сервер метрик. Возвращает его или None.
+
+    METRICS_PORT=0 (по умолчанию) отключает сервер. Процессы
+    с SHARDING=1 на одном узле делят METRICS_PORT: порт достаётся
+    первому, остальные работают без сервера метрик.
+    """
+    if not METRICS_PORT:
+        return None
+    try:
+        return metrics.start_server(METRICS_PORT, METRICS_ADDRESS)
+    except OSError as error:
+        logger.error(
+            'Сервер метрик на порту %s не запущен: %s', METRICS_PORT, error)
+        return None
+
+
+def start_config(manager, wake):
+    """Запускает слежение за файлом подписок и API администратора.
+
+    wake() вызывается после изменения состава подписок. Возвращает
+    сервер API администратора или None.
+    """
+    manager.on_change = wake
+    if manager.path and CONFIG_WATCH_TIME:
+        manager.start(CONFIG_WATCH_TIME)
+    if not ADMIN_PORT:
+        return None
+    if not ADMIN_SECRET:
+        logger.critical('API администратора не запущен: не задан ADMIN_SECRET')
+        return None
+    return AdminServer(
+        manager, ADMIN_SECRET, ADMIN_ADDRESS, ADMIN_PORT).start()
+
+
+def main():
+    """Основная логика работы бота.
+
+    Опрашивает API для всех подписок и отправляет уведомления об
+    изменении статусов и о сбоях, пока бот не остановят. Настройки
+    описаны в read_settings() и в модулях, которые их используют.
+    """
+    log_listener = init()
+    try:
+        if check_tokens():
+            run_bot()
+    finally:
+        log_listener.stop()
+
+
+def run_bot():
+    """Запускает опрос и доставку и работает до остановки.
+
+    Бот Telegram создаётся при первой отправке сообщения, так что
+    первый опрос не ждёт импорта python-telegram-bot.
+    """
+    if SHARDING and STATE_BACKEND != 'sqlite':
+        logger.critical(
+            'SHARDING=1 требует STATE_BACKEND=sqlite, задано: %s',
+            STATE_BACKEND)
+        return
+    http_session.configure(pool_maxsize=HTTP_POOL_SIZE)
+    outbox = DeliveryQueue(
+        LazyObject(make_bot), DELIVERY_RATE, CHAT_RATE,
+        senders=DELIVERY_SENDERS, max_pending=DELIVERY_QUEUE_LIMIT).start()
+    store = open_store(STATE_BACKEND, STATE_PATH)
+    metrics.QUEUE_DEPTH.set_function(outbox.depth)
+    metrics_server = start_metrics()
+
+    def poll(subscription):
+        changes = poll_subscription(outbox, subscription)
+        store.save(subscription)
+        return changes
+
+    coordinator = None
+    if SHARDING:
+        manager = build_config()
+        coordinator = start_sharding(store, manager.registry)
+        registry = coordinator.owned
+        poll = coordinator.wrap(poll)
+    else:
+        manager = build_config(store)
+        registry = manager.registry
+    webhook = None
+    if WEBHOOK_PORT:
+        webhook = start_webhook(registry, outbox, store)
+    interval = RETRY_TIME if webhook is None else RECONCILE_TIME
+    scheduler = PollScheduler(
+        registry, poll, interval, workers=POLL_WORKERS,
+        policy=make_poll_policy(reconcile=webhook is not None))
+    store.start_autoflush()
+    admin = start_config(manager, scheduler.wake)
+    previous_handlers = handle_signals(scheduler.stop)
+    try:
+        scheduler.run()
+    finally:
+        if admin is not None:
+            admin.close()
+        manager.close()
+        shutdown(scheduler, outbox, store, webhook, coordinator)
+        for signum, previous in previous_handlers.items():
+            signal.signal(signum, previous)
+        if metrics_server is not None:
+            metrics_server.shutdown()
+        logger.info('Бот остановлен')
 
 
 if __name__ == '__main__':
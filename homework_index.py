@@ -0,0 +1,98 @@
+"""Индекс последних известных статусов домашних работ подписки."""
+
+
+from records import intern_status, status_name
+
+
+class HomeworkIndex:
+    """Последние статус и date_updated каждой работы подписки.
+
+    Принимает записи records.Homework и индексирует их по Homework.key.
+    Статус хранится кодом intern_status, а не строкой. diff() просматривает
+    только записи из ответа API, поэтому стоимость опроса зависит от числа
+    изменившихся работ, а не от размера истории. Счётчик reviewing хранит
+    число работ, находящихся на проверке.
+    """
+
+    __slots__ = ('_states', '_dirty', 'reviewing')
+
+    REVIEWING = intern_status('reviewing')
+
+    def __init__(self):
+        self._states = {}
+        self._dirty = None
+        self.reviewing = 0
+
+    @staticmethod
+    def state(homework):
+        """Состояние записи, изменение которого считается переходом."""
+        return homework.status, homework.date_updated
+
+    def changed(self, homework):
+        """Отличается ли состояние работы от известного.
+
+        date_updated сравнивается, только если оно известно с обеих
+        сторон: событие webhook может прийти без него.
+        """
+        known = self._states.get(homework.key)
+        if known is None:
+            return True
+        if known[0] != homework.status:
+            return True
+        date_updated = homework.date_updated
+        return (
+            known[1] is not None and date_updated is not None
+            and known[1] != date_updated)
+
+    def diff(self, homeworks):
+        """Работы из ответа, чьё состояние отличается от известного.
+
+        homeworks — записи Homework, может быть генератором: в памяти
+        остаются только изменившиеся записи.
+        """
+        return [homework for homework in homeworks if self.changed(homework)]
+
+    def mark(self, homework):
+        """Запоминает текущее состояние работы."""
+        key = homework.key
+        self._set(key, self.state(homework))
+        if self._dirty is None:
+            self._dirty = set()
+        self._dirty.add(key)
+
+    def restore(self, key, state):
+        """Восстанавливает состояние работы (status, date_updated)."""
+        status, date_updated = state
+        self._set(key, (intern_status(status), date_updated))
+
+    @staticmethod
+    def _external(state):
+        return status_name(state[0]), state[1]
+
+    def _set(self, key, state):
+        previous = self._states.get(key)
+        if previous is not None and previous[0] == self.REVIEWING:
+            self.reviewing -= 1
+        if state[0] == self.REVIEWING:
+            self.reviewing += 1
+        self._states[key] = state
+
+    def drain_dirty(self):
+        """Состояния, изменившиеся с прошлого вызова, для хранилища."""
+        if not self._dirty:
+            return {}
+        dirty, self._dirty = self._dirty, None
+        return {key: self._external(self._states[key]) for key in dirty}
+
+    def get(self, key):
+        """Известное состояние работы (status, date_updated) или None."""
+        state = self._states.get(key)
+        return None if state is None else self._external(state)
+
+    def items(self):
+        """Пары (ключ, (status, date_updated)) всех известных работ."""
+        for key, state in self._states.items():
+            yield key, self._external(state)
+
+    def __len__(self):
+        return len(self._states)
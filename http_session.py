@@ -0,0 +1,121 @@
+"""Общий пул keep-alive соединений для запросов к API.
+
+Вместо requests.get, открывающего новое TCP/TLS соединение на каждый
+запрос, используется одна requests.Session с пулом соединений.
+Счётчики ConnectionStats показывают, сколько запросов обслужено
+повторно использованными соединениями, и дублируются в метрики
+homework_api_http_requests_total и homework_api_connections_opened_total.
+"""
+
+
+import threading
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+import metrics
+
+POOL_CONNECTIONS = 10
+POOL_MAXSIZE = 16
+
+_session = None
+_stats = None
+
+
+class ConnectionStats:
+    """Потокобезопасные счётчики запросов и новых соединений."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.new_connections = 0
+
+    def add_request(self):
+        """Учитывает отправленный запрос."""
+        with self._lock:
+            self.requests += 1
+        metrics.API_REQUESTS.inc()
+
+    def add_connection(self):
+        """Учитывает новое соединение."""
+        with self._lock:
+            self.new_connections += 1
+        metrics.API_CONNECTIONS.inc()
+
+    @property
+    def reused_connections(self):
+        """Запросы, отправленные по уже открытому соединению."""
+        return max(self.requests - self.new_connections, 0)
+
+    def as_dict(self):
+        """Снимок счётчиков."""
+        return {
+            'requests': self.requests,
+            'new_connections': self.new_connections,
+            'reused_connections': self.reused_connections,
+        }
+
+
+def _counting_pool(base, stats):
+    class CountingConnectionPool(base):
+        def _new_conn(self):
+            stats.add_connection()
+            return super()._new_conn()
+
+    return CountingConnectionPool
+
+
+class PooledHTTPAdapter(HTTPAdapter):
+    """HTTPAdapter, который считает новые соединения в пулах urllib3.
+
+    pool_maxsize ограничивает число соединений к одному хосту,
+    при pool_block=True лишние запросы ждут свободного соединения.
+    """
+
+    def __init__(self, stats, **kwargs):
+        self.stats = stats
+        super().__init__(**kwargs)
+
+    def init_poolmanager(self, *args, **kwargs):
+        """Подменяет классы пулов urllib3 на считающие соединения."""
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            'http': _counting_pool(HTTPConnectionPool, self.stats),
+            'https': _counting_pool(HTTPSConnectionPool, self.stats),
+        }
+
+    def send(self, request, **kwargs):
+        """Учитывает запрос и отправляет его через пул."""
+        self.stats.add_request()
+        return super().send(request, **kwargs)
+
+
+def create_session(pool_connections=POOL_CONNECTIONS,
+                   pool_maxsize=POOL_MAXSIZE, pool_block=True, stats=None):
+    """Создаёт requests.Session с пулом keep-alive соединений."""
+    stats = stats or ConnectionStats()
+    adapter = PooledHTTPAdapter(
+        stats, pool_connections=pool_connections,
+        pool_maxsize=pool_maxsize, pool_block=pool_block)
+    session = requests.Session()
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session, stats
+
+
+def configure(**kwargs):
+    """Создаёт общую для процесса сессию. Аргументы как у create_session."""
+    global _session, _stats
+    _session, _stats = create_session(**kwargs)
+    return _session
+
+
+def current():
+    """Общая сессия процесса или None, если configure() не вызывался."""
+    return _session
+
+
+def stats():
+    """Счётчики соединений общей сессии или None."""
+    return _stats
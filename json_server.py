@@ -0,0 +1,97 @@
+"""Общая часть HTTP-серверов бота: приёма событий и API администратора.
+
+Тело запроса не больше MAX_BODY байт, каждый запрос должен содержать
+секрет в заголовке secret_header, ответ всегда в формате JSON.
+"""
+
+
+import hmac
+import json
+import logging
+import threading
+from http import HTTPStatus
+
+from lazy_imports import lazy_import
+
+http_server = lazy_import('http.server')
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY = 1024 * 1024
+
+
+class JsonServer:
+    """HTTP-сервер в фоновом потоке, отвечающий JSON.
+
+    Подкласс задаёт secret_header, methods, name, title и метод
+    receive(method, path, headers, body), возвращающий код ответа
+    и тело ответа.
+    """
+
+    secret_header = None
+    methods = ('POST',)
+    name = 'http'
+    title = 'HTTP-сервер'
+
+    def __init__(self, secret, address='127.0.0.1', port=0):
+        if not secret:
+            raise ValueError(f'{self.title} требует секрет')
+        self.secret = secret
+        self._server = http_server.ThreadingHTTPServer(
+            (address, port), self._handler_class())
+        self._server.daemon_threads = True
+
+    @property
+    def port(self):
+        """Порт, на котором принимаются запросы."""
+        return self._server.server_port
+
+    def authorized(self, headers):
+        """Проверяет секрет запроса."""
+        return hmac.compare_digest(
+            headers.get(self.secret_header, ''), self.secret)
+
+    def _handler_class(self):
+        server = self
+
+        class JsonHandler(http_server.BaseHTTPRequestHandler):
+
+            def respond(self):
+                length = int(self.headers.get('Content-Length') or 0)
+                if length > MAX_BODY:
+                    self.send_error(HTTPStatus.REQUEST_ENTITY_TOO_LARGE)
+                    return
+                try:
+                    status, answer = server.receive(
+                        self.command, self.path, self.headers,
+                        self.rfile.read(length))
+                except Exception as error:
+                    logger.exception(error)
+                    status = HTTPStatus.INTERNAL_SERVER_ERROR
+                    answer = {'error': 'Внутренняя ошибка'}
+                body = json.dumps(answer, ensure_ascii=False).encode()
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        for method in self.methods:
+            setattr(JsonHandler, f'do_{method}', JsonHandler.respond)
+        return JsonHandler
+
+    def start(self):
+        """Запускает сервер в фоновом потоке."""
+        threading.Thread(
+            target=self._server.serve_forever, name=self.name,
+            daemon=True).start()
+        logger.info('%s на порту %s', self.title, self.port)
+        return self
+
+    def close(self):
+        """Останавливает сервер."""
+        self._server.shutdown()
+        self._server.server_close()
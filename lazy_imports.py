@@ -0,0 +1,54 @@
+"""Отложенный импорт тяжёлых зависимостей.
+
+python-telegram-bot и requests импортируются десятки миллисекунд.
+LazyModule откладывает импорт до первого обращения к атрибуту модуля,
+так что import homework (тесты, скрипты, бенчмарк) их не загружает.
+"""
+
+
+import importlib
+import threading
+
+
+class LazyModule:
+    """Модуль, который импортируется при первом обращении к атрибуту.
+
+    Атрибуты каждый раз читаются из настоящего модуля, поэтому подмены
+    через monkeypatch в самом модуле видны и через LazyModule.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attribute):
+        module = self._module
+        if module is None:
+            module = self._module = importlib.import_module(self._name)
+        return getattr(module, attribute)
+
+    def __repr__(self):
+        return f'<lazy module {self._name!r}>'
+
+
+class LazyObject:
+    """Объект, который создаётся factory() при первом обращении к нему."""
+
+    def __init__(self, factory):
+        self._factory = factory
+        self._object = None
+        self._lock = threading.Lock()
+
+    def __getattr__(self, attribute):
+        instance = self._object
+        if instance is None:
+            with self._lock:
+                if self._object is None:
+                    self._object = self._factory()
+                instance = self._object
+        return getattr(instance, attribute)
+
+
+def lazy_import(name):
+    """Отложенный модуль name."""
+    return LazyModule(name)
@@ -0,0 +1,300 @@
+"""Конфигурация, которая применяется без перезапуска бота.
+
+Источник — JSON-файл SUBSCRIPTIONS_FILE. Кроме списка подписок
+[{"token": ..., "chat_id": ...}] он может содержать объект
+{"subscriptions": [...], "statuses": {"approved": "...", ...}}.
+ConfigManager следит за временем изменения файла и применяет новую
+версию инкрементально: добавляются и удаляются только изменившиеся
+подписки, остальные продолжают опрашиваться со своим состоянием.
+Токены новых подписок проверяются параллельно при каждой загрузке,
+подписки с отклонёнными токенами не добавляются в реестр, но остаются
+в конфигурации. Изменения через API администратора (см. admin.py)
+записываются обратно в тот же файл.
+"""
+
+
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from lazy_imports import lazy_import
+from storage import subscription_id
+from subscriptions import Subscription, make_key
+
+tempfile = lazy_import('tempfile')
+
+logger = logging.getLogger(__name__)
+
+WATCH_TIME = 5
+CHECK_WORKERS = 8
+
+
+class Config:
+    """Версия конфигурации: подписки по ключу реестра и тексты статусов."""
+
+    __slots__ = ('subscriptions', 'statuses')
+
+    def __init__(self, subscriptions=None, statuses=None):
+        self.subscriptions = subscriptions or {}
+        self.statuses = statuses
+
+    def as_dict(self):
+        """Конфигурация в формате файла."""
+        data = {'subscriptions': [
+            {'token': token, 'chat_id': chat_id}
+            for token, chat_id in self.subscriptions.values()
+        ]}
+        if self.statuses is not None:
+            data['statuses'] = self.statuses
+        return data
+
+
+def check_statuses(statuses):
+    """Проверяет тексты статусов: непустой словарь строк."""
+    if not isinstance(statuses, dict) or not statuses or not all(
+            isinstance(name, str) and isinstance(verdict, str)
+            for name, verdict in statuses.items()):
+        raise TypeError(
+            'Тексты статусов должны быть непустым словарём строк')
+    return statuses
+
+
+def parse_config(data):
+    """Config из содержимого файла конфигурации."""
+    if isinstance(data, list):
+        items, statuses = data, None
+    elif isinstance(data, dict):
+        items, statuses = data.get('subscriptions', []), data.get('statuses')
+    else:
+        raise TypeError(
+            f'Конфигурация должна быть списком или объектом, '
+            f'получен {type(data)}')
+    if not isinstance(items, list):
+        raise TypeError('Ключ subscriptions должен содержать список')
+    if statuses is not None:
+        check_statuses(statuses)
+    subscriptions = {}
+    for item in items:
+        token, chat_id = item['token'], item['chat_id']
+        subscriptions[make_key(token, chat_id)] = (token, chat_id)
+    return Config(subscriptions, statuses)
+
+
+def read_config(path):
+    """Читает и разбирает файл конфигурации."""
+    with open(path, encoding='utf-8') as file:
+        return parse_config(json.load(file))
+
+
+def write_config(path, config):
+    """Атомарно записывает конфигурацию в файл."""
+    directory = os.path.dirname(os.path.abspath(path))
+    descriptor, temporary = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(descriptor, 'w', encoding='utf-8') as file:
+            json.dump(config.as_dict(), file, ensure_ascii=False, indent=2)
+        os.replace(temporary, path)
+    except BaseException:
+        os.unlink(temporary)
+        raise
+
+
+def validate_tokens(tokens, check, workers=CHECK_WORKERS):
+    """Проверяет токены параллельно. Возвращает множество отклонённых."""
+    tokens = list(set(tokens))
+    if not tokens:
+        return set()
+    with ThreadPoolExecutor(min(workers, len(tokens))) as pool:
+        results = pool.map(check, tokens)
+        return {token for token, valid in zip(tokens, results) if not valid}
+
+
+class ConfigManager:
+    """Применяет версии конфигурации к реестру подписок registry.
+
+    Удаляются только подписки, добавленные из конфигурации, подписка
+    из переменных окружения не затрагивается. check(token) проверяет
+    токен, restore(subscription) загружает состояние новой подписки,
+    set_statuses(statuses) заменяет тексты статусов, on_change()
+    вызывается после изменения состава подписок. Отклонённые токены
+    проверяются снова при следующем чтении файла.
+    """
+
+    def __init__(self, registry, path=None, check=None, restore=None,
+                 set_statuses=None, on_change=None, workers=CHECK_WORKERS):
+        self.registry = registry
+        self.path = path
+        self.check = check
+        self.restore = restore
+        self.set_statuses = set_statuses
+        self.on_change = on_change
+        self.workers = workers
+        self.config = Config()
+        self._owned = set()
+        self._rejected = set()
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def apply(self, config):
+        """Применяет версию конфигурации. Возвращает отчёт об изменениях."""
+        return self._update(lambda current: config)
+
+    def _added(self, config):
+        return {
+            key: item for key, item in config.subscriptions.items()
+            if key not in self._owned and key not in self._rejected
+            and self.registry.get(*item) is None
+        }
+
+    def _update(self, change, write=False):
+        """Применяет change(текущая конфигурация) и, если write, пишет файл.
+
+        Токены новых подписок проверяются без блокировки, поэтому
+        запросы к API не задерживают другие изменения конфигурации.
+        """
+        checked = set()
+        rejected = set()
+        while True:
+            with self._lock:
+                config = change(self.config)
+                if config is None:
+                    return None
+                tokens = set()
+                if self.check is not None:
+                    tokens = {
+                        token for token, _ in self._added(config).values()
+                    } - checked
+                if not tokens:
+                    return self._commit(config, rejected, write)
+            checked |= tokens
+            rejected |= validate_tokens(tokens, self.check, self.workers)
+
+    def _commit(self, config, rejected_tokens, write):
+        previous = self.config.subscriptions
+        report, rejected = self._apply(config, rejected_tokens)
+        if write and self.path:
+            self.config.subscriptions = {
+                key: item for key, item in self.config.subscriptions.items()
+                if key in previous or key not in rejected
+            }
+            self._rejected &= self.config.subscriptions.keys()
+            write_config(self.path, self.config)
+            self._mtime = os.stat(self.path).st_mtime_ns
+        return report
+
+    def _apply(self, config, rejected_tokens):
+        added = self._added(config)
+        rejected = {
+            key for key, (token, _) in added.items()
+            if token in rejected_tokens}
+        for key, (token, chat_id) in added.items():
+            if key in rejected:
+                logger.error('Токен подписки чата %s отклонён API', chat_id)
+                continue
+            subscription = self.registry.add(token, chat_id)
+            self._owned.add(key)
+            if self.restore is not None:
+                self.restore(subscription)
+        removed = self._owned - config.subscriptions.keys()
+        for key in removed:
+            self.registry.remove(*key)
+        self._owned -= removed
+        statuses = self.config.statuses
+        statuses_changed = (
+            config.statuses is not None and config.statuses != statuses)
+        if statuses_changed:
+            statuses = config.statuses
+            if self.set_statuses is not None:
+                self.set_statuses(statuses)
+        self.config = Config(dict(config.subscriptions), statuses)
+        self._rejected = (
+            (self._rejected | rejected) & config.subscriptions.keys())
+        report = {
+            'added': len(added) - len(rejected),
+            'removed': len(removed),
+            'rejected': len(rejected),
+            'statuses': statuses_changed,
+        }
+        if (report['added'] or removed) and self.on_change is not None:
+            self.on_change()
+        logger.info('Конфигурация применена: %s', report)
+        return report, rejected
+
+    def reload(self):
+        """Перечитывает файл конфигурации и применяет его."""
+        if not self.path:
+            raise ValueError('Файл конфигурации не задан')
+
+        def change(current):
+            self._rejected.clear()
+            self._mtime = os.stat(self.path).st_mtime_ns
+            return read_config(self.path)
+
+        return self._update(change)
+
+    def add(self, token, chat_id):
+        """Добавляет подписку. Возвращает отчёт об изменениях."""
+        def change(config):
+            subscriptions = dict(config.subscriptions)
+            subscriptions[make_key(token, chat_id)] = (token, chat_id)
+            return Config(subscriptions, config.statuses)
+
+        return self._update(change, write=True)
+
+    def remove(self, sub_id):
+        """Удаляет подписку по идентификатору хранилища.
+
+        Возвращает отчёт об изменениях или None, если такой подписки
+        в конфигурации нет.
+        """
+        def change(config):
+            subscriptions = {
+                key: item for key, item in config.subscriptions.items()
+                if subscription_id(Subscription(*item)) != sub_id
+            }
+            if len(subscriptions) == len(config.subscriptions):
+                return None
+            return Config(subscriptions, config.statuses)
+
+        return self._update(change, write=True)
+
+    def update_statuses(self, statuses):
+        """Заменяет тексты статусов. Возвращает отчёт об изменениях."""
+        check_statuses(statuses)
+        return self._update(
+            lambda config: Config(config.subscriptions, statuses), write=True)
+
+    def changed(self):
+        """Изменился ли файл с момента последнего чтения."""
+        try:
+            return os.stat(self.path).st_mtime_ns != self._mtime
+        except FileNotFoundError:
+            return False
+
+    def start(self, interval=WATCH_TIME):
+        """Запускает фоновую проверку файла раз в interval секунд."""
+        self._thread = threading.Thread(
+            target=self._watch, args=(interval,), name='config',
+            daemon=True)
+        self._thread.start()
+        return self
+
+    def _watch(self, interval):
+        while not self._stop.wait(interval):
+            if not self.changed():
+                continue
+            try:
+                self.reload()
+            except Exception as error:
+                logger.error(
+                    'Конфигурация %s не применена: %s', self.path, error)
+
+    def close(self):
+        """Останавливает проверку файла."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
@@ -0,0 +1,130 @@
+"""Журнал бота: фоновая запись, JSON-формат и прореживание шагов.
+
+configure() переводит журнал на QueueHandler: вызывающий поток только
+кладёт запись в очередь, а форматирование и запись в поток вывода
+выполняет QueueListener в отдельном потоке. Строки шагов конвейера
+(записи с extra={'step': N}) можно прореживать: из каждых sample
+одинаковых шагов одной подписки в журнал попадает одна. Уровень
+журнала задаётся только логгерам бота, сторонние библиотеки пишут
+в журнал лишь предупреждения и ошибки.
+"""
+
+
+import contextlib
+import contextvars
+import json
+import logging
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+TEXT_FORMAT = '%(asctime)s - %(name)s - [%(levelname)s] - %(message)s'
+LIBRARY_LEVEL = logging.WARNING
+SAMPLE_LIMIT = 100000
+BOT_LOGGERS = (
+    'admin', 'async_bot', 'backfill', 'delivery', 'homework',
+    'json_server', 'live_config', 'metrics', 'scheduler', 'sharding',
+    'storage', 'webhook',
+)
+
+CHAT_ID = contextvars.ContextVar('chat_id', default=None)
+
+
+@contextlib.contextmanager
+def context(chat_id):
+    """Помечает записи журнала внутри блока чатом подписки."""
+    token = CHAT_ID.set(chat_id)
+    try:
+        yield
+    finally:
+        CHAT_ID.reset(token)
+
+
+class ContextFilter(logging.Filter):
+    """Добавляет chat_id к записи и прореживает строки шагов.
+
+    Работает в потоке, который пишет в журнал, поэтому отброшенные
+    записи не попадают в очередь.
+    """
+
+    def __init__(self, sample=1):
+        super().__init__()
+        self.sample = max(sample, 1)
+        self._seen = {}
+
+    def filter(self, record):
+        """Пропускает запись в журнал или отбрасывает её."""
+        record.chat_id = CHAT_ID.get()
+        step = getattr(record, 'step', None)
+        if step is None or self.sample == 1:
+            return True
+        key = (record.chat_id, step, record.msg)
+        seen = self._seen.get(key, 0)
+        if len(self._seen) >= SAMPLE_LIMIT and not seen:
+            self._seen.clear()
+        self._seen[key] = seen + 1
+        return seen % self.sample == 0
+
+
+class JsonFormatter(logging.Formatter):
+    """Запись журнала одной строкой JSON."""
+
+    def format(self, record):
+        """Сериализует запись с её контекстом."""
+        entry = {
+            'time': self.formatTime(record),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        for field in ('chat_id', 'step'):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BackgroundHandler(QueueHandler):
+    """QueueHandler, который не форматирует запись в вызывающем потоке.
+
+    Аргументы записей бота — строки и числа, поэтому сообщение можно
+    собрать позже, в потоке QueueListener.
+    """
+
+    def prepare(self, record):
+        """Запись передаётся в очередь как есть."""
+        return record
+
+
+def configure(app_logger, level=logging.DEBUG, json_format=False,
+              sample=1, stream=None):
+    """Переводит журнал на фоновую запись.
+
+    Прямые обработчики app_logger снимаются: его записи, как и записи
+    остальных модулей, идут через корневой логгер в очередь. Уровень
+    level получают app_logger и логгеры модулей бота, корневой логгер
+    остаётся на LIBRARY_LEVEL: отладочные записи telegram и urllib3
+    отбрасываются, не создавая записей журнала.
+    Возвращает запущенный QueueListener, его нужно остановить (stop())
+    при завершении, чтобы дописать очередь.
+    """
+    output = logging.StreamHandler(stream)
+    if json_format:
+        output.setFormatter(JsonFormatter())
+    else:
+        output.setFormatter(logging.Formatter(TEXT_FORMAT))
+    records = queue.SimpleQueue()
+    handler = BackgroundHandler(records)
+    handler.addFilter(ContextFilter(sample))
+    for existing in list(app_logger.handlers):
+        app_logger.removeHandler(existing)
+    app_logger.setLevel(level)
+    for name in BOT_LOGGERS:
+        logging.getLogger(name).setLevel(level)
+    root = logging.getLogger()
+    root.addHandler(handler)
+    root.setLevel(LIBRARY_LEVEL)
+    listener = QueueListener(records, output)
+    listener.start()
+    return listener
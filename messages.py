@@ -0,0 +1,236 @@
+"""Шаблоны уведомлений для нескольких языков и режимов разметки.
+
+Каталог сообщений задаётся JSON-файлом MESSAGES_FILE:
+{"default": "ru",
+ "locales": {"en": {"parse_mode": "HTML",
+                    "status": "<b>{name}</b>: {verdict}",
+                    "error": "Bot failure: {error}",
+                    "recovery": "Bot recovered.",
+                    "statuses": {"approved": "Approved!", ...}}},
+ "chats": {"123456": "en"}}
+Ключи, которых нет у языка, берутся из встроенного русского, и их
+текст экранируется для режима разметки языка. Шаблоны
+компилируются один раз при загрузке каталога: текст вердикта
+подставляется в шаблон статуса сразу, а при отправке остаётся
+подставить только экранированные название работы или текст ошибки.
+Готовые уведомления о статусах хранятся в LRU-кэше по ключу
+(язык, статус, название работы).
+"""
+
+
+import functools
+import json
+import re
+import string
+
+from lazy_imports import lazy_import
+from records import intern_status
+
+html = lazy_import('html')
+
+DEFAULT_LOCALE = 'ru'
+CACHE_SIZE = 10000
+MESSAGE_TEMPLATE = 'Изменился статус проверки работы "{name}". {verdict}'
+ERROR_TEMPLATE = 'Сбой в работе программы: {error}'
+RECOVERY_TEMPLATE = 'Работа программы восстановлена.'
+MARKDOWN_V2_SPECIAL = re.compile(r'([_*\[\]()~`>#+\-=|{}.!\\])')
+MARKDOWN_SPECIAL = re.compile(r'([_*`\[])')
+
+
+def escape_html(value):
+    """Экранирует текст для parse_mode=HTML."""
+    return html.escape(value, quote=False)
+
+
+def escape_markdown_v2(value):
+    """Экранирует текст для parse_mode=MarkdownV2."""
+    return MARKDOWN_V2_SPECIAL.sub(r'\\\1', value)
+
+
+def escape_markdown(value):
+    """Экранирует текст для устаревшего parse_mode=Markdown."""
+    return MARKDOWN_SPECIAL.sub(r'\\\1', value)
+
+
+ESCAPES = {
+    None: str,
+    'HTML': escape_html,
+    'MarkdownV2': escape_markdown_v2,
+    'Markdown': escape_markdown,
+}
+BUILTIN_TEMPLATES = {
+    'status': MESSAGE_TEMPLATE,
+    'error': ERROR_TEMPLATE,
+    'recovery': RECOVERY_TEMPLATE,
+}
+LOCALE_OPTIONS = {'parse_mode', 'statuses', *BUILTIN_TEMPLATES}
+
+
+def escape_template(source, parse_mode):
+    """Шаблон source, текст которого экранирован для parse_mode.
+
+    Поля шаблона остаются полями.
+    """
+    escape = ESCAPES[parse_mode]
+    parts = []
+    for text, field, _, _ in string.Formatter().parse(source):
+        parts.append(escape(text).replace('{', '{{').replace('}', '}}'))
+        if field is not None:
+            parts.append(f'{{{field}}}')
+    return ''.join(parts)
+
+
+class Template:
+    """Скомпилированный шаблон str.format с полями fields.
+
+    Значения constants подставляются при компиляции как есть, значения
+    остальных полей экранируются для parse_mode при каждом render().
+    """
+
+    __slots__ = ('parse_mode', '_parts', '_escape')
+
+    def __init__(self, source, parse_mode=None, fields=(), constants=None):
+        if parse_mode not in ESCAPES:
+            raise ValueError(f'Неизвестный режим разметки {parse_mode}')
+        constants = constants or {}
+        self.parse_mode = parse_mode
+        self._escape = ESCAPES[parse_mode]
+        self._parts = []
+        literal = ''
+        for text, field, spec, conversion in string.Formatter().parse(
+                source):
+            literal += text
+            if field is None:
+                continue
+            if spec or conversion:
+                raise ValueError(
+                    f'Формат поля {field} в шаблоне не поддерживается')
+            if field in constants:
+                literal += constants[field]
+            elif field in fields:
+                self._parts.append((literal, field))
+                literal = ''
+            else:
+                raise ValueError(f'Неизвестное поле {field} в шаблоне')
+        self._parts.append((literal, None))
+
+    def render(self, **values):
+        """Текст шаблона с экранированными значениями полей."""
+        escape = self._escape
+        return ''.join(
+            literal if field is None else literal + escape(str(values[field]))
+            for literal, field in self._parts
+        )
+
+
+class Locale:
+    """Скомпилированные шаблоны уведомлений одного языка."""
+
+    __slots__ = ('parse_mode', 'statuses', 'error', 'recovery')
+
+    def __init__(self, statuses, status=MESSAGE_TEMPLATE,
+                 error=ERROR_TEMPLATE, recovery=RECOVERY_TEMPLATE,
+                 parse_mode=None):
+        self.parse_mode = parse_mode
+        self.statuses = {
+            intern_status(name): Template(
+                status, parse_mode, ('name',), {'verdict': verdict})
+            for name, verdict in statuses.items()
+        }
+        self.error = Template(error, parse_mode, ('error',))
+        self.recovery = Template(recovery, parse_mode)
+
+
+def make_locale(options, statuses):
+    """Locale из настроек языка в MESSAGES_FILE.
+
+    Недостающие шаблоны и вердикты берутся из встроенных русских
+    и экранируются для режима разметки языка: Telegram отклоняет
+    сообщение с неэкранированными служебными символами.
+    """
+    unknown = options.keys() - LOCALE_OPTIONS
+    if unknown:
+        raise ValueError(f'Неизвестные ключи языка {sorted(unknown)}')
+    parse_mode = options.get('parse_mode')
+    if parse_mode not in ESCAPES:
+        raise ValueError(f'Неизвестный режим разметки {parse_mode}')
+    escape = ESCAPES[parse_mode]
+    templates = {
+        key: options.get(key) or escape_template(source, parse_mode)
+        for key, source in BUILTIN_TEMPLATES.items()
+    }
+    verdicts = {name: escape(verdict) for name, verdict in statuses.items()}
+    verdicts.update(options.get('statuses', {}))
+    return Locale(verdicts, parse_mode=parse_mode, **templates)
+
+
+class MessageCatalog:
+    """Уведомления на языке, выбранном для каждого чата.
+
+    locales — словарь {язык: Locale}, chats — {chat_id: язык}, чаты
+    без явного языка получают язык default.
+    """
+
+    def __init__(self, locales, default=DEFAULT_LOCALE, chats=None,
+                 cache_size=CACHE_SIZE):
+        if default not in locales:
+            raise ValueError(f'Нет шаблонов для языка по умолчанию {default}')
+        unknown = set((chats or {}).values()) - locales.keys()
+        if unknown:
+            raise ValueError(f'Нет шаблонов для языков {sorted(unknown)}')
+        self.locales = locales
+        self.default = default
+        self.chats = {
+            str(chat_id): locale for chat_id, locale in (chats or {}).items()}
+        self._status_message = functools.lru_cache(cache_size)(
+            self._render_status)
+
+    @classmethod
+    def from_config(cls, data, statuses, cache_size=CACHE_SIZE):
+        """Каталог из содержимого MESSAGES_FILE и русских текстов статусов.
+
+        data=None даёт каталог из одного встроенного русского языка.
+        """
+        data = data or {}
+        settings = {DEFAULT_LOCALE: {}, **data.get('locales', {})}
+        locales = {
+            name: make_locale(options, statuses)
+            for name, options in settings.items()
+        }
+        return cls(
+            locales, data.get('default', DEFAULT_LOCALE), data.get('chats'),
+            cache_size)
+
+    def locale(self, chat_id=None):
+        """Шаблоны языка чата chat_id."""
+        return self.locales[self.chats.get(str(chat_id), self.default)]
+
+    def parse_mode(self, chat_id=None):
+        """Режим разметки сообщений для чата или None."""
+        return self.locale(chat_id).parse_mode
+
+    def _render_status(self, locale, code, name):
+        return self.locales[locale].statuses[code].render(name=name)
+
+    def status_message(self, chat_id, code, name):
+        """Уведомление об изменении статуса работы name."""
+        locale = self.chats.get(str(chat_id), self.default)
+        return self._status_message(locale, code, name)
+
+    def error_message(self, chat_id, error):
+        """Уведомление о сбое."""
+        return self.locale(chat_id).error.render(error=error)
+
+    def recovery_message(self, chat_id):
+        """Уведомление о восстановлении после сбоя."""
+        return self.locale(chat_id).recovery.render()
+
+    def cache_info(self):
+        """Статистика LRU-кэша уведомлений о статусах."""
+        return self._status_message.cache_info()
+
+
+def read_messages(path):
+    """Читает файл MESSAGES_FILE."""
+    with open(path, encoding='utf-8') as file:
+        return json.load(file)
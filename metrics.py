@@ -0,0 +1,289 @@
+"""Метрики бота в текстовом формате Prometheus.
+
+Модуль хранит общий реестр REGISTRY и метрики конвейера опроса.
+start_server() отдаёт их по HTTP на /metrics.
+"""
+
+
+import bisect
+import contextlib
+import functools
+import logging
+import threading
+import time
+
+from lazy_imports import lazy_import
+
+http_server = lazy_import('http.server')
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (
+    0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+LAG_BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 600)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+def format_labels(names, values, extra=()):
+    """Метки в виде {name="value",...} или пустая строка."""
+    pairs = list(zip(names, values)) + list(extra)
+    if not pairs:
+        return ''
+    text = ','.join(
+        '{}="{}"'.format(
+            name,
+            str(value).replace('\\', r'\\').replace('"', r'\"')
+            .replace('\n', r'\n'))
+        for name, value in pairs)
+    return f'{{{text}}}'
+
+
+def format_value(value):
+    """Число в формате Prometheus."""
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value))
+
+
+class Metric:
+    """Базовая метрика с набором меток."""
+
+    kind = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if len(labels) != len(self.labelnames):
+            raise ValueError(
+                f'Метрика {self.name} ожидает метки {self.labelnames}')
+        return tuple(str(label) for label in labels)
+
+    def samples(self):
+        """Строки значений метрики."""
+        with self._lock:
+            values = list(self._values.items())
+        for labels, value in sorted(values):
+            yield (
+                f'{self.name}{format_labels(self.labelnames, labels)} '
+                f'{format_value(value)}')
+
+    def render(self):
+        """Описание и значения метрики в текстовом формате."""
+        lines = [
+            f'# HELP {self.name} {self.documentation}',
+            f'# TYPE {self.name} {self.kind}',
+        ]
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Монотонно растущий счётчик."""
+
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        """Увеличивает счётчик."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, *labels):
+        """Текущее значение счётчика."""
+        return self._values.get(self._key(labels), 0)
+
+
+class Gauge(Metric):
+    """Значение, которое может расти и убывать.
+
+    Вместо set() можно передать функцию: она вызывается при каждом
+    чтении метрики.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._function = None
+
+    def set(self, value, *labels):
+        """Устанавливает значение."""
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, function):
+        """Берёт значение из function() при чтении метрики."""
+        self._function = function
+
+    def samples(self):
+        """Строки значений метрики."""
+        if self._function is not None:
+            self.set(self._function())
+        return super().samples()
+
+
+class Histogram(Metric):
+    """Распределение значений по корзинам buckets."""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float('inf'),)
+
+    def observe(self, value, *labels):
+        """Учитывает наблюдение."""
+        self._observe(self._key(labels), value)
+
+    def _observe(self, key, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            state = self._values.get(key)
+            if state is None:
+                state = self._values[key] = [[0] * len(self.buckets), 0, 0]
+            state[0][index] += 1
+            state[1] += value
+            state[2] += 1
+
+    @contextlib.contextmanager
+    def time(self, *labels):
+        """Замеряет длительность блока with."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def timed(self, *labels):
+        """Декоратор, замеряющий длительность вызовов функции."""
+        key = self._key(labels)
+
+        def decorator(function):
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                started = time.perf_counter()
+                try:
+                    return function(*args, **kwargs)
+                finally:
+                    self._observe(key, time.perf_counter() - started)
+            return wrapper
+        return decorator
+
+    def count(self, *labels):
+        """Число наблюдений."""
+        state = self._values.get(self._key(labels))
+        return 0 if state is None else state[2]
+
+    def samples(self):
+        """Строки корзин, суммы и числа наблюдений."""
+        with self._lock:
+            values = [
+                (labels, list(counts), total, count)
+                for labels, (counts, total, count) in self._values.items()
+            ]
+        for labels, counts, total, count in sorted(values):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = format_labels(
+                    self.labelnames, labels, [('le', format_value(bound))])
+                yield f'{self.name}_bucket{bucket_labels} {cumulative}'
+            text = format_labels(self.labelnames, labels)
+            yield f'{self.name}_sum{text} {format_value(total)}'
+            yield f'{self.name}_count{text} {count}'
+
+
+class Registry:
+    """Набор метрик, отдаваемых одной страницей."""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        """Добавляет метрику в реестр и возвращает её."""
+        if metric.name in self._metrics:
+            raise ValueError(f'Метрика {metric.name} уже зарегистрирована')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self):
+        """Все метрики в текстовом формате Prometheus."""
+        return ''.join(
+            metric.render() + '\n' for metric in self._metrics.values())
+
+
+REGISTRY = Registry()
+STEP_SECONDS = REGISTRY.register(Histogram(
+    'homework_step_seconds', 'Длительность шагов конвейера опроса',
+    ('step',)))
+DELIVERY_SECONDS = REGISTRY.register(Histogram(
+    'homework_delivery_seconds',
+    'Длительность отправки сообщения в Telegram из очереди доставки'))
+STATUS_CHANGES = REGISTRY.register(Counter(
+    'homework_status_changes_total', 'Уведомления об изменении статуса',
+    ('status',)))
+ERRORS = REGISTRY.register(Counter(
+    'homework_errors_total', 'Ошибки по типу исключения', ('type',)))
+QUEUE_DEPTH = REGISTRY.register(Gauge(
+    'homework_delivery_queue_depth', 'Сообщения в очереди доставки'))
+COALESCED_REQUESTS = REGISTRY.register(Counter(
+    'homework_api_requests_coalesced_total',
+    'Опросы, получившие ответ общего запроса к API'))
+API_REQUESTS = REGISTRY.register(Counter(
+    'homework_api_http_requests_total',
+    'HTTP-запросы к API Практикума'))
+API_CONNECTIONS = REGISTRY.register(Counter(
+    'homework_api_connections_opened_total',
+    'Соединения с API Практикума, открытые для запросов; остальные '
+    'запросы ушли по уже открытым соединениям'))
+POLL_LAG = REGISTRY.register(Histogram(
+    'homework_poll_lag_seconds',
+    'Задержка начала опроса подписки относительно срока',
+    buckets=LAG_BUCKETS))
+
+
+def count_error(error):
+    """Учитывает ошибку в homework_errors_total."""
+    ERRORS.inc(type(error).__name__)
+
+
+def make_handler(registry):
+    """Класс обработчика HTTP-запросов к /metrics."""
+
+    class MetricsHandler(http_server.BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            if self.path.split('?')[0] not in ('/', '/metrics'):
+                self.send_error(404)
+                return
+            body = registry.render().encode()
+            self.send_response(200)
+            self.send_header('Content-Type', CONTENT_TYPE)
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    return MetricsHandler
+
+
+def start_server(port, address='127.0.0.1', registry=REGISTRY):
+    """Запускает HTTP-сервер метрик в фоновом потоке."""
+    server = http_server.ThreadingHTTPServer(
+        (address, port), make_handler(registry))
+    server.daemon_threads = True
+    threading.Thread(
+        target=server.serve_forever, name='metrics', daemon=True).start()
+    logger.info(
+        'Метрики доступны на http://%s:%s/metrics',
+        address, server.server_port)
+    return server
@@ -0,0 +1,83 @@
+"""Компактные записи домашних работ и таблица статусов."""
+
+
+import threading
+
+from exceptions import UnknownHomeworkStatus
+
+_status_codes = {}
+_status_names = []
+_lock = threading.Lock()
+
+
+def intern_status(name):
+    """Небольшое целое число для строки статуса.
+
+    Реестр только пополняется, различных статусов единицы, поэтому
+    в индексах хранится int вместо отдельной строки на каждую работу.
+    """
+    code = _status_codes.get(name)
+    if code is None:
+        with _lock:
+            code = _status_codes.get(name)
+            if code is None:
+                code = len(_status_names)
+                _status_names.append(name)
+                _status_codes[name] = code
+    return code
+
+
+def status_name(code):
+    """Строка статуса по его коду."""
+    return _status_names[code]
+
+
+class StatusTable:
+    """Коды статусов, о которых бот умеет уведомлять.
+
+    Тексты вердиктов хранятся в шаблонах уведомлений (см. messages.py).
+    """
+
+    def __init__(self, statuses):
+        self._codes = frozenset(intern_status(name) for name in statuses)
+
+    def verify(self, record):
+        """Проверяет, что о работе record можно отправить уведомление."""
+        if record.name is None:
+            raise KeyError('Ключ homework_name не найден')
+        if record.status not in self._codes:
+            raise UnknownHomeworkStatus(
+                f'{status_name(record.status)} - '
+                'неизвестный статус домашней работы')
+
+
+class Homework:
+    """Запись домашней работы, собранная из ответа API при разборе.
+
+    Индекс подписки и уведомления работают с записями, а не со
+    словарями ответа. key — id работы или, без него, название.
+    """
+
+    __slots__ = ('key', 'name', 'status', 'date_updated')
+
+    def __init__(self, key, name, status, date_updated=None):
+        self.key = key
+        self.name = name
+        self.status = status
+        self.date_updated = date_updated
+
+    @classmethod
+    def from_dict(cls, data):
+        """Собирает запись из словаря ответа API.
+
+        Поля проверяет StatusTable.verify() перед уведомлением: работа
+        с неизвестным статусом тоже запоминается в индексе, чтобы сбой
+        не повторялся на каждом опросе.
+        """
+        name = data.get('homework_name')
+        return cls(
+            data.get('id', name), name, intern_status(data.get('status')),
+            data.get('date_updated'))
+
+    def __repr__(self):
+        return f'Homework({self.name!r}, {status_name(self.status)!r})'
@@ -0,0 +1,120 @@
+"""Кэш ответов API для условных запросов.
+
+Для каждой подписки (ключ (token, chat_id)) хранятся валидаторы ETag
+и Last-Modified и хэш тела последнего обработанного ответа. Ответ 304
+или тело с тем же хэшем означают, что подписка этот ответ уже видела,
+и дальнейшая обработка не нужна. from_date в ключ не входит: курсор
+сдвигает его после каждого опроса. Поле current_date API заполняет
+временем сервера в каждом ответе, поэтому в хэш тела оно не входит.
+"""
+
+
+import hashlib
+import re
+import threading
+from collections import OrderedDict
+
+CACHE_SIZE = 10000
+VOLATILE_FIELDS = re.compile(rb'"current_date"\s*:\s*-?[\d.eE+-]+')
+
+
+class CachedResponse:
+    """Валидаторы и хэш тела последнего ответа."""
+
+    __slots__ = ('etag', 'last_modified', 'body_hash')
+
+    def __init__(self, etag, last_modified, body_hash):
+        self.etag = etag
+        self.last_modified = last_modified
+        self.body_hash = body_hash
+
+
+def body_digest(body):
+    """Короткий хэш тела ответа без поля current_date.
+
+    Поле вырезается из байтов регулярным выражением: так неизменившийся
+    ответ распознаётся без разбора JSON.
+    """
+    return hashlib.blake2b(
+        VOLATILE_FIELDS.sub(b'', body), digest_size=16).digest()
+
+
+class ResponseCache:
+    """LRU-кэш валидаторов ответов ограниченного размера."""
+
+    def __init__(self, maxsize=CACHE_SIZE):
+        self.maxsize = maxsize
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def conditional_headers(self, key):
+        """Заголовки If-None-Match/If-Modified-Since для запроса."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return {}
+        headers = {}
+        if entry.etag:
+            headers['If-None-Match'] = entry.etag
+        if entry.last_modified:
+            headers['If-Modified-Since'] = entry.last_modified
+        return headers
+
+    def state(self, key):
+        """Запомненный для key ответ в виде сравнимого значения или None."""
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        return entry.etag, entry.last_modified, entry.body_hash
+
+    def copy(self, source, key):
+        """Запоминает для key ответ, запомненный для source."""
+        with self._lock:
+            entry = self._entries.get(source)
+            if entry is None:
+                return
+            self._entries.pop(key, None)
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def not_modified(self, key):
+        """Учитывает ответ 304 для ключа."""
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+            self.hits += 1
+
+    def update(self, key, headers, body):
+        """Запоминает ответ. Возвращает True, если тело не изменилось."""
+        entry = CachedResponse(
+            headers.get('ETag'), headers.get('Last-Modified'),
+            body_digest(body))
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            self._entries[key] = entry
+            if len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+            unchanged = (
+                previous is not None
+                and previous.body_hash == entry.body_hash)
+            if unchanged:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return unchanged
+
+    def forget(self, key):
+        """Забывает ответ, который не удалось обработать.
+
+        Следующий такой же ответ будет разобран заново, а не сочтён
+        неизменившимся.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def __len__(self):
+        return len(self._entries)
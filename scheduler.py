@@ -0,0 +1,252 @@
+"""Планировщик опросов API для множества подписок."""
+
+
+import heapq
+import itertools
+import logging
+import threading
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+
+def token_fraction(subscription, *salt):
+    """Число из [0, 1), одинаковое для всех подписок одного токена.
+
+    Подписки одного токена опрашиваются в одно и то же время, и их
+    запросы к API объединяются (см. single_flight.py).
+    """
+    digest = zlib.crc32(repr((subscription.token, *salt)).encode())
+    return digest % 1000 / 1000
+
+
+class FixedInterval:
+    """Постоянный интервал между опросами подписки."""
+
+    def __init__(self, interval):
+        self.interval = interval
+
+    def observe(self, subscription, changes):
+        """Учитывает результат опроса: для постоянного интервала не нужен."""
+
+    def next_interval(self, subscription):
+        """Интервал до следующего опроса подписки."""
+        return self.interval
+
+
+class AdaptiveInterval:
+    """Интервал опроса, зависящий от активности подписки.
+
+    Пока работа на проверке (reviewing) или статус менялся не далее
+    recent_time секунд назад, подписка опрашивается раз в fast секунд.
+    Каждый опрос без изменений удваивает интервал, начиная с base,
+    но не больше max_interval. К результату добавляется разброс
+    ±jitter, чтобы подписки разных токенов не опрашивали API
+    синхронно. По умолчанию разброс псевдослучайный и одинаковый для
+    подписок одного токена с одинаковой историей опросов; random()
+    задаёт вместо него случайный.
+    """
+
+    def __init__(self, base, fast, max_interval, recent_time,
+                 backoff=2, jitter=0.1, clock=time.time, random=None):
+        self.base = base
+        self.fast = fast
+        self.max_interval = max_interval
+        self.recent_time = recent_time
+        self.backoff = backoff
+        self.jitter = jitter
+        self.clock = clock
+        self.random = random
+
+    def observe(self, subscription, changes):
+        """Учитывает число изменений, найденных при опросе."""
+        if changes:
+            subscription.changed_at = self.clock()
+            subscription.idle_polls = 0
+        else:
+            subscription.idle_polls += 1
+
+    def is_active(self, subscription):
+        """Идёт ли по подписке проверка работы."""
+        if subscription.index.reviewing:
+            return True
+        changed_at = subscription.changed_at
+        return (changed_at is not None
+                and self.clock() - changed_at < self.recent_time)
+
+    def next_interval(self, subscription):
+        """Интервал до следующего опроса подписки."""
+        if self.is_active(subscription):
+            interval = self.fast
+        else:
+            steps = max(subscription.idle_polls - 1, 0)
+            interval = min(
+                self.base * self.backoff ** min(steps, 32),
+                self.max_interval)
+        if self.random is None:
+            fraction = token_fraction(subscription, subscription.idle_polls)
+        else:
+            fraction = self.random()
+        return interval * (1 + self.jitter * (2 * fraction - 1))
+
+
+class PollScheduler:
+    """Распределяет опросы подписок по ограниченному пулу потоков.
+
+    Каждый токен получает постоянное смещение внутри окна interval,
+    поэтому тысячи подписок не обращаются к API одновременно, а
+    подписки одного токена опрашиваются вместе. После завершения
+    опроса подписка снова ставится в очередь через интервал,
+    который выбирает policy. Очередь заданий пула ограничена, так что
+    память не растёт, даже если API отвечает медленнее, чем наступают
+    сроки опросов. Между опросами цикл спит ровно до срока ближайшего
+    из них, stop() и wake() прерывают ожидание.
+    """
+
+    def __init__(self, registry, poll, interval, workers=16, policy=None,
+                 clock=time.monotonic, sleep=None):
+        self.registry = registry
+        self.poll = poll
+        self.interval = interval
+        self.workers = workers
+        self.policy = policy or FixedInterval(interval)
+        self.clock = clock
+        self.sleep = sleep or self._wait
+        self._heap = []
+        self._seq = itertools.count()
+        self._scheduled = set()
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._stopping = threading.Event()
+        self._idle = threading.Condition()
+        self._running = 0
+        self._slots = threading.BoundedSemaphore(workers * 2)
+        self._registry_version = None
+
+    def offset(self, subscription):
+        """Постоянное смещение подписки внутри окна опроса."""
+        return token_fraction(subscription) * self.interval
+
+    def _wait(self, seconds):
+        self._wakeup.wait(seconds)
+
+    def _push(self, due, subscription):
+        with self._lock:
+            heapq.heappush(self._heap, (due, next(self._seq), subscription))
+        self._wakeup.set()
+
+    def sync(self):
+        """Ставит в расписание подписки, добавленные в реестр."""
+        if self._registry_version == self.registry.version:
+            return
+        self._registry_version = self.registry.version
+        now = self.clock()
+        for subscription in self.registry:
+            if subscription.key not in self._scheduled:
+                self._scheduled.add(subscription.key)
+                self._push(now + self.offset(subscription), subscription)
+
+    def _run_one(self, subscription, due):
+        try:
+            if not self._stopping.is_set():
+                self._poll(subscription, due)
+        finally:
+            self._slots.release()
+            with self._idle:
+                self._running -= 1
+                self._idle.notify_all()
+
+    def _poll(self, subscription, due):
+        metrics.POLL_LAG.observe(max(self.clock() - due, 0))
+        changes = 0
+        try:
+            changes = self.poll(subscription)
+        except Exception as error:
+            logger.exception(error)
+        finally:
+            self.policy.observe(subscription, changes)
+            interval = self.policy.next_interval(subscription)
+            self._push(self.clock() + interval, subscription)
+
+    def _pop_due(self):
+        with self._lock:
+            if not self._heap:
+                return self.interval, None, None
+            due, _, subscription = self._heap[0]
+            delay = due - self.clock()
+            if delay > 0:
+                return delay, None, None
+            heapq.heappop(self._heap)
+            return 0, subscription, due
+
+    def step(self, pool):
+        """Запускает опрос ближайшей по сроку подписки."""
+        self._wakeup.clear()
+        if self._stopping.is_set():
+            return
+        self.sync()
+        delay, subscription, due = self._pop_due()
+        if subscription is None:
+            self.sleep(delay)
+            return
+        if subscription not in self.registry:
+            self._replace(subscription, due)
+            return
+        self._slots.acquire()
+        with self._idle:
+            self._running += 1
+        pool.submit(self._run_one, subscription, due)
+
+    def _replace(self, stale, due):
+        """Снимает с расписания подписку, которой больше нет в реестре.
+
+        Если под тем же ключом в реестре уже другой объект (подписку
+        удалили и добавили снова, процесс потерял и вернул её аренду),
+        в расписание ставится он: sync() его не подхватит, ключ уже
+        числится запланированным.
+        """
+        current = self.registry.get(stale.token, stale.chat_id)
+        if current is None:
+            self._scheduled.discard(stale.key)
+        else:
+            self._push(due, current)
+
+    def wake(self):
+        """Прерывает ожидание, чтобы цикл заново просмотрел расписание."""
+        self._wakeup.set()
+
+    def stop(self):
+        """Просит цикл run() завершиться.
+
+        Метод не блокируется, его можно вызывать из обработчика сигнала.
+        """
+        self._stopping.set()
+        self._wakeup.set()
+
+    def run(self, keep_running=lambda: True):
+        """Основной цикл: опрашивает подписки до вызова stop().
+
+        Цикл завершается и когда keep_running() становится ложным.
+        Начатые опросы не прерываются, их завершения ждёт drain().
+        Опросы, которые ещё стоят в очереди пула, пропускаются.
+        """
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            while keep_running() and not self._stopping.is_set():
+                self.step(pool)
+        finally:
+            self._stopping.set()
+            pool.shutdown(wait=False)
+
+    def drain(self, timeout=None):
+        """Ждёт завершения начатых опросов не дольше timeout секунд.
+
+        Возвращает число опросов, которые не успели завершиться.
+        """
+        with self._idle:
+            self._idle.wait_for(lambda: not self._running, timeout)
+            return self._running
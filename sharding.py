@@ -0,0 +1,191 @@
+"""Распределение подписок между процессами бота.
+
+Процессы отмечаются в общем хранилище состояния и строят одинаковое
+консистентное хэш-кольцо из живых процессов. Подписка принадлежит
+процессу, на которого кольцо отображает её токен. При добавлении
+или уходе процесса переезжает только часть подписок.
+
+Чтобы подписку не опрашивали два процесса сразу, опрос разрешён
+только под арендой в хранилище. Процесс, потерявший подписку,
+перестаёт её планировать, дожидается текущего опроса, записывает
+состояние и только после этого отдаёт аренду. Новый владелец берёт
+аренду и загружает состояние из хранилища, поэтому уже отправленные
+уведомления не повторяются.
+"""
+
+
+import bisect
+import hashlib
+import logging
+import threading
+import time
+
+from storage import subscription_id
+from subscriptions import SubscriptionRegistry
+
+logger = logging.getLogger(__name__)
+
+REPLICAS = 64
+REFRESH_TIME = 10
+LEASE_TIME = 30
+
+
+def ring_hash(value):
+    """Положение строки на хэш-кольце."""
+    digest = hashlib.blake2b(value.encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'big')
+
+
+class HashRing:
+    """Консистентное хэш-кольцо с replicas виртуальными узлами на процесс."""
+
+    def __init__(self, nodes, replicas=REPLICAS):
+        points = sorted(
+            (ring_hash(f'{node}#{replica}'), node)
+            for node in nodes for replica in range(replicas))
+        self._hashes = [point for point, _ in points]
+        self._nodes = [node for _, node in points]
+
+    def owner(self, key):
+        """Процесс, которому принадлежит ключ, или None для пустого кольца."""
+        if not self._nodes:
+            return None
+        index = bisect.bisect(self._hashes, ring_hash(key))
+        return self._nodes[index % len(self._nodes)]
+
+
+class ShardCoordinator:
+    """Ведёт реестр owned из подписок source, принадлежащих процессу.
+
+    refresh() отмечает процесс в хранилище, пересчитывает кольцо,
+    продлевает аренду своих подписок, берёт новые и отдаёт потерянные.
+    Функция опроса оборачивается в wrap(): она не вызывается для
+    подписки без действующей аренды. restore(subscription) загружает
+    состояние подписки, полученной процессом.
+    """
+
+    def __init__(self, store, source, worker, restore=None,
+                 lease_time=LEASE_TIME, replicas=REPLICAS, clock=time.time):
+        self.store = store
+        self.source = source
+        self.worker = worker
+        self.restore = restore or store.load
+        self.lease_time = lease_time
+        self.replicas = replicas
+        self.clock = clock
+        self.owned = SubscriptionRegistry()
+        self._leases = {}
+        self._releasing = {}
+        self._active = set()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def owns(self, subscription):
+        """Может ли процесс сейчас опрашивать подписку."""
+        lease = self._leases.get(subscription.key)
+        return (
+            lease is not None and subscription in self.owned
+            and lease[1] > self.clock())
+
+    def wrap(self, poll):
+        """Функция опроса, пропускающая подписки без аренды."""
+        def guarded(subscription):
+            with self._lock:
+                if not self.owns(subscription):
+                    return 0
+                self._active.add(subscription.key)
+            try:
+                return poll(subscription)
+            finally:
+                with self._lock:
+                    self._active.discard(subscription.key)
+        return guarded
+
+    def refresh(self):
+        """Пересчитывает распределение подписок между процессами."""
+        now = self.clock()
+        self.store.heartbeat(self.worker, now)
+        ring = HashRing(
+            self.store.live_workers(now - self.lease_time), self.replicas)
+        wanted = {
+            subscription.key: subscription for subscription in self.source
+            if ring.owner(subscription.token) == self.worker
+        }
+        with self._lock:
+            for key, (sub_id, _) in list(self._leases.items()):
+                if key not in wanted:
+                    self._drop(key)
+                    self._releasing[key] = sub_id
+        self._release_idle()
+        candidates = {
+            key: subscription_id(subscription)
+            for key, subscription in wanted.items()
+            if key not in self._releasing
+        }
+        expires_at = now + self.lease_time
+        acquired = self.store.acquire_leases(
+            candidates.values(), self.worker, now, expires_at)
+        gained = 0
+        for key, sub_id in candidates.items():
+            if sub_id not in acquired:
+                if key in self._leases:
+                    logger.warning(
+                        'Аренда подписки перехвачена другим процессом')
+                    with self._lock:
+                        self._drop(key)
+                continue
+            if key not in self._leases:
+                source = wanted[key]
+                subscription = self.owned.add(
+                    source.token, source.chat_id, source.from_date)
+                self.restore(subscription)
+                gained += 1
+            self._leases[key] = (sub_id, expires_at)
+        if gained:
+            logger.info(
+                'Процесс %s получил подписок: %s, всего: %s',
+                self.worker, gained, len(self.owned))
+
+    def _drop(self, key):
+        self._leases.pop(key, None)
+        self.owned.remove(*key)
+
+    def _release_idle(self):
+        with self._lock:
+            idle = {
+                key: sub_id for key, sub_id in self._releasing.items()
+                if key not in self._active
+            }
+        if not idle:
+            return
+        self.store.flush()
+        self.store.release_leases(idle.values(), self.worker)
+        with self._lock:
+            for key in idle:
+                self._releasing.pop(key, None)
+        logger.info(
+            'Процесс %s отдал подписок: %s', self.worker, len(idle))
+
+    def start(self, interval=REFRESH_TIME):
+        """Запускает фоновый пересчёт раз в interval секунд."""
+        self._thread = threading.Thread(
+            target=self._refresh_loop, args=(interval,), name='shards',
+            daemon=True)
+        self._thread.start()
+        return self
+
+    def _refresh_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.refresh()
+            except Exception as error:
+                logger.exception(error)
+
+    def close(self):
+        """Сохраняет состояние и отдаёт все подписки процесса."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.store.flush()
+        self.store.retire(self.worker)
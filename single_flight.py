@@ -0,0 +1,113 @@
+"""Объединение одинаковых запросов к API (single-flight).
+
+Один токен Практикума часто читают несколько чатов: студент, наставник,
+группа. Их опросы с одинаковым ключом (token, from_date) выполняются
+одним HTTP-запросом, а ответ разбирается каждой подпиской отдельно.
+"""
+
+
+import collections
+import threading
+import time
+
+import metrics
+from lazy_imports import lazy_import
+
+asyncio = lazy_import('asyncio')
+
+
+class _Call:
+
+    __slots__ = ('done', 'value', 'error')
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+    def result(self):
+        if self.error is not None:
+            raise self.error
+        return self.value
+
+
+class _Flights:
+
+    def __init__(self, linger=0, clock=time.monotonic):
+        self.linger = linger
+        self.clock = clock
+        self._calls = {}
+        self._expiry = collections.deque()
+
+    def _expire(self, now):
+        while self._expiry and self._expiry[0][0] <= now:
+            _, key, call = self._expiry.popleft()
+            if self._calls.get(key) is call:
+                del self._calls[key]
+
+
+class SingleFlight(_Flights):
+    """Выполняет func один раз для всех одновременных вызовов с ключом key.
+
+    Остальные вызовы ждут первого и получают тот же результат или то же
+    исключение. Успешный результат ещё linger секунд отдаётся вызовам,
+    пришедшим сразу после завершения: опросы подписок одного токена
+    совпадают по времени лишь приблизительно.
+    """
+
+    def __init__(self, linger=0, clock=time.monotonic):
+        super().__init__(linger, clock)
+        self._lock = threading.Lock()
+
+    def do(self, key, func, *args):
+        """Результат func(*args), общий для вызовов с одинаковым key."""
+        with self._lock:
+            self._expire(self.clock())
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+        if not leader:
+            metrics.COALESCED_REQUESTS.inc()
+            call.done.wait()
+            return call.result()
+        try:
+            call.value = func(*args)
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            self._finish(key, call)
+        return call.value
+
+    def _finish(self, key, call):
+        with self._lock:
+            if self.linger and call.error is None:
+                self._expiry.append((self.clock() + self.linger, key, call))
+            elif self._calls.get(key) is call:
+                del self._calls[key]
+        call.done.set()
+
+
+class AsyncSingleFlight(_Flights):
+    """SingleFlight для корутин одного event loop."""
+
+    async def do(self, key, func, *args):
+        """Результат await func(*args), общий для вызовов с одним key."""
+        self._expire(self.clock())
+        future = self._calls.get(key)
+        if future is not None:
+            metrics.COALESCED_REQUESTS.inc()
+            return await asyncio.shield(future)
+        future = self._calls[key] = asyncio.ensure_future(func(*args))
+        future.add_done_callback(lambda _: self._finish(key, future))
+        return await asyncio.shield(future)
+
+    def _finish(self, key, future):
+        if self._calls.get(key) is not future:
+            return
+        if (self.linger and not future.cancelled()
+                and future.exception() is None):
+            self._expiry.append((self.clock() + self.linger, key, future))
+        else:
+            del self._calls[key]
@@ -0,0 +1,363 @@
+"""Постоянное хранилище состояния подписок.
+
+Хранит курсор from_date, последние статусы работ и ключи
+дедупликации уведомлений, чтобы после перезапуска бот не присылал
+старые уведомления повторно и не запрашивал всю историю заново.
+"""
+
+
+import abc
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+FLUSH_TIME = 1
+BUSY_TIMEOUT = 30
+
+
+def subscription_id(subscription):
+    """Идентификатор подписки в хранилище: токен хранится только хэшем."""
+    digest = hashlib.sha256(subscription.token.encode()).hexdigest()[:32]
+    return f'{digest}:{subscription.chat_id}'
+
+
+class StateStore(abc.ABC):
+    """Базовое хранилище: буферизует изменения и пишет их пачкой.
+
+    save() только складывает изменения подписки в буфер и не трогает
+    диск. flush() записывает весь буфер одной транзакцией, то есть
+    не более одного fsync на пачку. start_autoflush() запускает фоновый
+    поток, вызывающий flush() раз в FLUSH_TIME секунд. Аренды подписок
+    для шардирования есть только у SQLiteStateStore.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._written_cursors = {}
+        self._written_dedup = {}
+        self._stop = threading.Event()
+        self._thread = None
+
+    def load(self, subscription):
+        """Восстанавливает состояние подписки из хранилища."""
+        record = self._read(subscription_id(subscription))
+        if record is None:
+            return False
+        from_date, synced_at, homeworks, dedup_keys = record
+        if from_date is not None:
+            subscription.from_date = from_date
+            subscription.synced_at = synced_at
+        for key, state in homeworks.items():
+            subscription.index.restore(key, state)
+        subscription.error_keys = tuple(
+            (key, reported_at) for key, reported_at in dedup_keys)
+        sub_id = subscription_id(subscription)
+        self._written_cursors[sub_id] = (from_date, synced_at)
+        self._written_dedup[sub_id] = subscription.error_keys
+        return True
+
+    def save(self, subscription):
+        """Добавляет в буфер изменившееся состояние подписки."""
+        sub_id = subscription_id(subscription)
+        cursor = (subscription.from_date, subscription.synced_at)
+        dedup_keys = subscription.error_keys
+        homeworks = subscription.index.drain_dirty()
+        with self._lock:
+            pending = self._pending.setdefault(sub_id, [None, {}, None])
+            if self._written_cursors.get(sub_id) != cursor:
+                self._written_cursors[sub_id] = cursor
+                pending[0] = cursor
+            pending[1].update(homeworks)
+            if self._written_dedup.get(sub_id, ()) != dedup_keys:
+                self._written_dedup[sub_id] = dedup_keys
+                pending[2] = dedup_keys
+
+    def flush(self):
+        """Записывает буфер на диск. Возвращает число подписок в пачке."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            batch = {
+                sub_id: record for sub_id, record in pending.items()
+                if record[0] is not None or record[1]
+                or record[2] is not None
+            }
+            if batch:
+                try:
+                    self._write(batch)
+                except Exception:
+                    self._pending = pending
+                    raise
+        return len(batch)
+
+    def start_autoflush(self, interval=FLUSH_TIME):
+        """Запускает фоновую запись буфера раз в interval секунд."""
+        self._thread = threading.Thread(
+            target=self._autoflush, args=(interval,), daemon=True)
+        self._thread.start()
+
+    def _autoflush(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                self.flush()
+            except Exception as error:
+                logger.exception(error)
+
+    def close(self):
+        """Останавливает фоновую запись и сбрасывает остаток буфера."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self.flush()
+
+    @abc.abstractmethod
+    def _read(self, sub_id):
+        """Запись подписки: курсор, статусы и ключи дедупликации."""
+
+    @abc.abstractmethod
+    def _write(self, batch):
+        """Записывает пачку изменений одной транзакцией."""
+
+
+class SQLiteStateStore(StateStore):
+    """Хранилище в SQLite в режиме WAL."""
+
+    SCHEMA = (
+        'CREATE TABLE IF NOT EXISTS cursors ('
+        'subscription TEXT PRIMARY KEY, from_date INTEGER, synced_at REAL)',
+        'CREATE TABLE IF NOT EXISTS homeworks ('
+        'subscription TEXT, homework TEXT, status TEXT, date_updated TEXT, '
+        'PRIMARY KEY (subscription, homework))',
+        'CREATE TABLE IF NOT EXISTS dedup_keys ('
+        'subscription TEXT PRIMARY KEY, dedup_keys TEXT)',
+        'CREATE TABLE IF NOT EXISTS workers ('
+        'worker TEXT PRIMARY KEY, heartbeat_at REAL)',
+        'CREATE TABLE IF NOT EXISTS leases ('
+        'subscription TEXT PRIMARY KEY, worker TEXT, expires_at REAL)',
+    )
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._connection = sqlite3.connect(
+            path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=FULL')
+        with self._connection:
+            for statement in self.SCHEMA:
+                self._connection.execute(statement)
+
+    def _read(self, sub_id):
+        with self._lock:
+            connection = self._connection
+            cursor = connection.execute(
+                'SELECT from_date, synced_at FROM cursors '
+                'WHERE subscription = ?', (sub_id,)).fetchone()
+            homeworks = {
+                json.loads(homework): (status, date_updated)
+                for homework, status, date_updated in connection.execute(
+                    'SELECT homework, status, date_updated FROM homeworks '
+                    'WHERE subscription = ?', (sub_id,))
+            }
+            dedup = connection.execute(
+                'SELECT dedup_keys FROM dedup_keys WHERE subscription = ?',
+                (sub_id,)).fetchone()
+        if cursor is None and not homeworks and dedup is None:
+            return None
+        from_date, synced_at = cursor or (None, None)
+        dedup_keys = json.loads(dedup[0]) if dedup else []
+        return from_date, synced_at, homeworks, dedup_keys
+
+    def _write(self, batch):
+        with self._connection:
+            for sub_id, (cursor, homeworks, dedup_keys) in batch.items():
+                if cursor is not None:
+                    self._connection.execute(
+                        'INSERT OR REPLACE INTO cursors VALUES (?, ?, ?)',
+                        (sub_id, *cursor))
+                self._connection.executemany(
+                    'INSERT OR REPLACE INTO homeworks VALUES (?, ?, ?, ?)',
+                    [(sub_id, json.dumps(key), *state)
+                     for key, state in homeworks.items()])
+                if dedup_keys is not None:
+                    self._connection.execute(
+                        'INSERT OR REPLACE INTO dedup_keys VALUES (?, ?)',
+                        (sub_id, json.dumps(dedup_keys, ensure_ascii=False)))
+
+    def heartbeat(self, worker, now):
+        """Отмечает, что процесс worker жив (для шардирования)."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO workers VALUES (?, ?)', (worker, now))
+
+    def live_workers(self, since):
+        """Процессы, отметившиеся не раньше since."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT worker FROM workers WHERE heartbeat_at >= ? '
+                'ORDER BY worker', (since,)).fetchall()
+        return [worker for worker, in rows]
+
+    def retire(self, worker):
+        """Удаляет процесс и его аренды подписок."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM leases WHERE worker = ?', (worker,))
+            self._connection.execute(
+                'DELETE FROM workers WHERE worker = ?', (worker,))
+
+    def acquire_leases(self, sub_ids, worker, now, expires_at):
+        """Берёт или продлевает аренду подписок. Возвращает полученные.
+
+        Аренда достаётся процессу, если подписка свободна, её аренда
+        истекла или уже принадлежит ему.
+        """
+        acquired = set()
+        with self._lock, self._connection:
+            for sub_id in sub_ids:
+                cursor = self._connection.execute(
+                    'INSERT INTO leases VALUES (?, ?, ?) '
+                    'ON CONFLICT (subscription) DO UPDATE SET '
+                    'worker = excluded.worker, '
+                    'expires_at = excluded.expires_at '
+                    'WHERE leases.worker = excluded.worker '
+                    'OR leases.expires_at < ?',
+                    (sub_id, worker, expires_at, now))
+                if cursor.rowcount:
+                    acquired.add(sub_id)
+        return acquired
+
+    def release_leases(self, sub_ids, worker):
+        """Отдаёт аренду подписок процесса worker."""
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'DELETE FROM leases WHERE subscription = ? AND worker = ?',
+                [(sub_id, worker) for sub_id in sub_ids])
+
+    def close(self):
+        """Сбрасывает буфер и закрывает соединение с базой."""
+        super().close()
+        self._connection.close()
+
+
+class FileStateStore(StateStore):
+    """Хранилище в append-only файле JSON-строк.
+
+    Каждая пачка дописывается в конец файла с одним fsync. При открытии
+    файл проигрывается целиком, более поздние записи перекрывают ранние,
+    после чего он переписывается снимком, чтобы не расти бесконечно.
+    Снимок в памяти обновляется при каждой записи, так что подписка,
+    удалённая и снова добавленная без перезапуска, получает своё
+    последнее состояние.
+    """
+
+    def __init__(self, path):
+        super().__init__()
+        self.path = path
+        self._records = {}
+        if os.path.exists(path):
+            self._replay()
+            self._compact()
+        self._file = open(path, 'a', encoding='utf-8')
+
+    def _compact(self):
+        compacted = f'{self.path}.compact'
+        with open(compacted, 'w', encoding='utf-8') as file:
+            for sub_id, record in self._records.items():
+                from_date, synced_at, homeworks, dedup_keys = record
+                entry = {
+                    'subscription': sub_id,
+                    'cursor': [from_date, synced_at],
+                    'homeworks': list(homeworks.items()),
+                    'dedup_keys': dedup_keys,
+                }
+                file.write(json.dumps(entry, ensure_ascii=False) + '\n')
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(compacted, self.path)
+
+    def _replay(self):
+        with open(self.path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logger.warning(
+                        f'Пропущена повреждённая запись в {self.path}')
+                    continue
+                self._merge(entry)
+
+    def _merge(self, entry):
+        record = self._records.setdefault(
+            entry['subscription'], [None, None, {}, []])
+        if 'cursor' in entry:
+            record[0], record[1] = entry['cursor']
+        for key, state in entry.get('homeworks', []):
+            record[2][key] = tuple(state)
+        if 'dedup_keys' in entry:
+            record[3] = list(entry['dedup_keys'])
+
+    def _read(self, sub_id):
+        record = self._records.get(sub_id)
+        if record is None:
+            return None
+        from_date, synced_at, homeworks, dedup_keys = record
+        return from_date, synced_at, dict(homeworks), list(dedup_keys)
+
+    def _write(self, batch):
+        entries = []
+        for sub_id, (cursor, homeworks, dedup_keys) in batch.items():
+            entry = {'subscription': sub_id}
+            if cursor is not None:
+                entry['cursor'] = cursor
+            if homeworks:
+                entry['homeworks'] = list(homeworks.items())
+            if dedup_keys is not None:
+                entry['dedup_keys'] = dedup_keys
+            entries.append(entry)
+        self._file.write(''.join(
+            json.dumps(entry, ensure_ascii=False) + '\n'
+            for entry in entries))
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        for entry in entries:
+            self._merge(entry)
+
+    def close(self):
+        """Сбрасывает буфер и закрывает файл."""
+        super().close()
+        self._file.close()
+
+
+class NullStateStore(StateStore):
+    """Хранилище-заглушка: состояние живёт только в памяти."""
+
+    def _read(self, sub_id):
+        return None
+
+    def _write(self, batch):
+        pass
+
+
+BACKENDS = {
+    'sqlite': SQLiteStateStore,
+    'file': FileStateStore,
+}
+DEFAULT_PATHS = {
+    'sqlite': 'homework_bot.sqlite3',
+    'file': 'homework_bot.state',
+}
+
+
+def open_store(backend, path):
+    """Открывает хранилище по имени бэкенда: sqlite, file или none."""
+    if backend == 'none':
+        return NullStateStore()
+    if backend not in BACKENDS:
+        raise ValueError(f'Неизвестное хранилище состояния: {backend}')
+    return BACKENDS[backend](path)
@@ -0,0 +1,138 @@
+"""Потоковый разбор ответа API со списком домашних работ.
+
+Вместо response.json(), который загружает весь ответ за год в память,
+HomeworkStream читает тело кусками и отдаёт записи списка homeworks
+по одной. Остальные ключи верхнего уровня (например, current_date)
+собираются в fields.
+"""
+
+
+import json
+
+CHUNK_SIZE = 16 * 1024
+WHITESPACE = ' \t\n\r'
+HOMEWORKS = 'homeworks'
+
+
+class HomeworkStream:
+    """Генератор записей homeworks поверх итератора строковых кусков.
+
+    Одновременно в памяти держится только буфер текущего куска и одна
+    запись. Если потребитель остановился раньше, drain() дочитывает
+    ответ без сохранения записей, чтобы заполнить fields.
+    """
+
+    def __init__(self, chunks, close=None):
+        self._chunks = iter(chunks)
+        self._close = close
+        self._buffer = ''
+        self._position = 0
+        self._exhausted = False
+        self._decoder = json.JSONDecoder()
+        self._records = self._parse()
+        self.fields = {}
+        self.has_homeworks = False
+        self.homeworks_value = None
+
+    def get(self, key, default=None):
+        """Значение ключа верхнего уровня, как у dict."""
+        return self.fields.get(key, default)
+
+    def __iter__(self):
+        return self._records
+
+    def drain(self):
+        """Дочитывает ответ до конца, не сохраняя записи."""
+        for _ in self._records:
+            pass
+
+    def close(self):
+        """Освобождает соединение, из которого читается ответ."""
+        if self._close is not None:
+            self._close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def _read_more(self):
+        if self._exhausted:
+            return False
+        for chunk in self._chunks:
+            if chunk:
+                self._buffer = self._buffer[self._position:] + chunk
+                self._position = 0
+                return True
+        self._exhausted = True
+        return False
+
+    def _peek(self):
+        """Первый непробельный символ или '' в конце ответа."""
+        while True:
+            buffer = self._buffer
+            position = self._position
+            while position < len(buffer) and buffer[position] in WHITESPACE:
+                position += 1
+            self._position = position
+            if position < len(buffer):
+                return buffer[position]
+            if not self._read_more():
+                return ''
+
+    def _expect(self, expected):
+        char = self._peek()
+        if char not in expected:
+            raise json.JSONDecodeError(
+                f'Ожидался один из символов {expected!r}',
+                self._buffer, self._position)
+        self._position += 1
+        return char
+
+    def _value(self):
+        """Разбирает очередное JSON-значение целиком."""
+        self._peek()
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(
+                    self._buffer, self._position)
+            except json.JSONDecodeError:
+                if self._read_more():
+                    continue
+                raise
+            if end == len(self._buffer) and self._read_more():
+                continue
+            self._position = end
+            return value
+
+    def _parse(self):
+        self._expect('{')
+        if self._peek() == '}':
+            self._position += 1
+            return
+        while True:
+            key = self._value()
+            self._expect(':')
+            if key == HOMEWORKS and self._peek() == '[':
+                self.has_homeworks = True
+                yield from self._array()
+            else:
+                value = self._value()
+                if key == HOMEWORKS:
+                    self.has_homeworks = True
+                    self.homeworks_value = value
+                else:
+                    self.fields[key] = value
+            if self._expect(',}') == '}':
+                return
+
+    def _array(self):
+        self._expect('[')
+        if self._peek() == ']':
+            self._position += 1
+            return
+        while True:
+            yield self._value()
+            if self._expect(',]') == ']':
+                return
@@ -0,0 +1,105 @@
+"""Реестр подписок: пары (токен Практикума, чат Telegram)."""
+
+
+import json
+import threading
+
+from homework_index import HomeworkIndex
+
+
+class Subscription:
+    """Подписка чата Telegram на статусы работ по токену Практикума.
+
+    Помимо ключа (token, chat_id) хранит состояние опроса. Подписок
+    в одном процессе тысячи, поэтому атрибуты объявлены в __slots__.
+    """
+
+    __slots__ = (
+        'token', 'chat_id', 'from_date', 'synced_at', 'index', 'error_keys',
+        'changed_at', 'idle_polls', 'failures')
+
+    def __init__(self, token, chat_id, from_date=None):
+        self.token = token
+        self.chat_id = chat_id
+        self.from_date = from_date
+        self.synced_at = None
+        self.index = HomeworkIndex()
+        self.error_keys = ()
+        self.changed_at = None
+        self.idle_polls = 0
+        self.failures = 0
+
+    @property
+    def key(self):
+        """Ключ подписки в реестре."""
+        return make_key(self.token, self.chat_id)
+
+    def __repr__(self):
+        return f'Subscription(chat_id={self.chat_id!r})'
+
+
+def make_key(token, chat_id):
+    """Ключ подписки: chat_id приводится к строке, как в переменных env."""
+    return token, str(chat_id)
+
+
+class SubscriptionRegistry:
+    """Потокобезопасный реестр подписок одного процесса.
+
+    Счётчик version увеличивается при каждом изменении состава,
+    по нему планировщик понимает, что пора подхватить новые подписки.
+    """
+
+    def __init__(self):
+        self._items = {}
+        self._lock = threading.Lock()
+        self.version = 0
+
+    def add(self, token, chat_id, from_date=None):
+        """Добавляет подписку. Повторное добавление возвращает существующую."""
+        key = make_key(token, chat_id)
+        with self._lock:
+            subscription = self._items.get(key)
+            if subscription is None:
+                subscription = Subscription(token, chat_id, from_date)
+                self._items[key] = subscription
+                self.version += 1
+            return subscription
+
+    def remove(self, token, chat_id):
+        """Удаляет подписку, возвращает её или None."""
+        with self._lock:
+            subscription = self._items.pop(make_key(token, chat_id), None)
+            if subscription is not None:
+                self.version += 1
+            return subscription
+
+    def get(self, token, chat_id):
+        """Возвращает подписку по паре (token, chat_id) или None."""
+        return self._items.get(make_key(token, chat_id))
+
+    def __contains__(self, subscription):
+        return self._items.get(subscription.key) is subscription
+
+    def __len__(self):
+        return len(self._items)
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._items.values()))
+
+
+def load_subscriptions(path, registry, from_date=None):
+    """Загружает подписки из JSON-файла вида [{"token": ..., "chat_id": ...}].
+
+    Возвращает количество подписок в файле.
+    """
+    with open(path, encoding='utf-8') as file:
+        items = json.load(file)
+    if not isinstance(items, list):
+        raise TypeError(
+            f'Файл подписок {path} должен содержать список, '
+            f'получен {type(items)}')
+    for item in items:
+        registry.add(item['token'], item['chat_id'], from_date)
+    return len(items)
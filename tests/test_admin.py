@@ -0,0 +1,61 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from admin import SECRET_HEADER, AdminServer
+from live_config import ConfigManager
+from storage import subscription_id
+from subscriptions import SubscriptionRegistry
+
+
+@pytest.fixture
+def admin(tmp_path):
+    path = tmp_path / 'subscriptions.json'
+    path.write_text('[]')
+    manager = ConfigManager(
+        SubscriptionRegistry(), str(path), check=lambda token: token != 'bad')
+    manager.reload()
+    server = AdminServer(manager, 'secret').start()
+    yield server, manager
+    server.close()
+
+
+def call(server, method, path, payload=None, secret='secret'):
+    request = urllib.request.Request(
+        f'http://127.0.0.1:{server.port}{path}', method=method,
+        data=None if payload is None else json.dumps(payload).encode(),
+        headers={SECRET_HEADER: secret})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+class TestAdmin:
+
+    def test_subscriptions_are_managed_at_runtime(self, admin):
+        server, manager = admin
+        status, _ = call(
+            server, 'POST', '/subscriptions', {'token': 'a', 'chat_id': 5})
+        assert status == 201
+        subscription = manager.registry.get('a', 5)
+        sub_id = subscription_id(subscription)
+        assert call(server, 'GET', '/subscriptions') == (
+            200, {'subscriptions': [{'id': sub_id, 'chat_id': 5}]}), (
+            'Список подписок не должен раскрывать токены'
+        )
+        assert call(server, 'DELETE', f'/subscriptions/{sub_id}')[0] == 200
+        assert subscription not in manager.registry
+        assert call(server, 'DELETE', f'/subscriptions/{sub_id}')[0] == 404
+
+    def test_rejected_requests(self, admin):
+        server, manager = admin
+        assert call(server, 'GET', '/subscriptions', secret='wrong')[0] == 401
+        assert call(
+            server, 'POST', '/subscriptions',
+            {'token': 'bad', 'chat_id': 1})[0] == 422
+        assert call(server, 'PUT', '/statuses', {'approved': 1})[0] == 422
+        assert not len(manager.registry)
@@ -0,0 +1,140 @@
+import asyncio
+
+import aiohttp
+import telegram
+from aiohttp import web
+
+import async_bot
+import homework
+import metrics
+from subscriptions import SubscriptionRegistry
+
+
+def make_app(sent):
+    async def statuses(request):
+        assert request.headers['Authorization'].startswith('OAuth ')
+        assert 'from_date' in request.query
+        return web.json_response({
+            'homeworks': [{'homework_name': 'hw123', 'status': 'approved'}],
+            'current_date': 1000198000,
+        })
+
+    async def send(request):
+        sent.append(await request.json())
+        return web.json_response({'ok': True})
+
+    app = web.Application()
+    app.router.add_get('/homework_statuses/', statuses)
+    app.router.add_post('/bot{token}/sendMessage', send)
+    return app
+
+
+async def poll_twice(sent, monkeypatch):
+    runner = web.AppRunner(make_app(sent))
+    await runner.setup()
+    site = web.TCPSite(runner, '127.0.0.1', 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base = f'http://127.0.0.1:{port}'
+    monkeypatch.setattr(homework, 'ENDPOINT', f'{base}/homework_statuses/')
+    monkeypatch.setattr(
+        async_bot, 'TELEGRAM_API', base + '/bot{token}/sendMessage')
+    registry = SubscriptionRegistry()
+    subscription = registry.add('token', 42, from_date=0)
+    poller = async_bot.AsyncPoller(registry, '1234:abc', interval=600)
+    try:
+        async with aiohttp.ClientSession() as session:
+            await poller.poll_subscription(session, subscription)
+            await poller.poll_subscription(session, subscription)
+    finally:
+        await runner.cleanup()
+
+
+class TestAsyncBot:
+
+    def test_poll_subscription(self, monkeypatch):
+        sent = []
+        asyncio.run(poll_twice(sent, monkeypatch))
+        assert len(sent) == 1, (
+            'При неизменном статусе сообщение должно отправляться один раз'
+        )
+        assert sent[0]['chat_id'] == 42
+        assert sent[0]['text'].startswith(
+            'Изменился статус проверки работы "hw123"')
+
+    def test_stop_interrupts_run(self):
+        async def stop_soon(poller):
+            await asyncio.sleep(0.05)
+            poller.stop()
+
+        async def main():
+            registry = SubscriptionRegistry()
+            registry.add('token', 1, from_date=0)
+            poller = async_bot.AsyncPoller(registry, '1234:abc', interval=600)
+            begin = asyncio.get_running_loop().time()
+            await asyncio.gather(poller.run(1), stop_soon(poller))
+            return asyncio.get_running_loop().time() - begin
+
+        assert asyncio.run(main()) < 1, (
+            'stop() должен прерывать ожидание подписок'
+        )
+
+    def test_busy_metrics_port_does_not_stop_bot(
+            self, monkeypatch, tmp_path):
+        class Listener:
+            def stop(self):
+                pass
+
+        served = []
+
+        async def serve(poller):
+            served.append(poller)
+
+        server = metrics.start_server(0)
+        try:
+            monkeypatch.setattr(homework, 'METRICS_PORT', server.server_port)
+            monkeypatch.setattr(homework, 'init', Listener)
+            monkeypatch.setattr(homework, 'check_tokens', lambda: True)
+            monkeypatch.setattr(
+                homework, 'STATE_PATH', str(tmp_path / 'state.sqlite3'))
+            monkeypatch.setattr(
+                homework, 'build_registry',
+                lambda store: SubscriptionRegistry())
+            monkeypatch.setattr(async_bot, 'serve', serve)
+            async_bot.main()
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert served, 'Занятый порт метрик не должен останавливать бота'
+
+    def test_sender_respects_chat_rate(self, monkeypatch):
+        sent = []
+
+        async def send_message(session, token, chat_id, message):
+            if not sent:
+                sent.append(None)
+                raise telegram.error.RetryAfter(0.05)
+            sent.append((chat_id, message, loop.time()))
+
+        async def main():
+            sender = async_bot.AsyncSender(
+                '1234:abc', global_rate=100, chat_rate=10)
+            await asyncio.gather(*(
+                sender.send(None, chat_id, text)
+                for chat_id, text in [(1, 'a'), (1, 'b'), (2, 'c')]))
+
+        monkeypatch.setattr(async_bot, 'send_message', send_message)
+        loop = asyncio.new_event_loop()
+        try:
+            begin = loop.time()
+            loop.run_until_complete(main())
+        finally:
+            loop.close()
+        delivered = {text: at - begin for _, text, at in sent[1:]}
+        assert sorted(delivered) == ['a', 'b', 'c'], (
+            'Сообщение должно отправляться повторно после RetryAfter'
+        )
+        assert delivered['b'] - delivered['a'] >= 0.09, (
+            'Сообщения одному чату должны уходить не чаще chat_rate'
+        )
+        assert delivered['c'] < delivered['b']
@@ -0,0 +1,120 @@
+import io
+
+import backfill
+from records import Homework
+from storage import SQLiteStateStore
+from subscriptions import Subscription, SubscriptionRegistry
+from utils import RecordingBot
+
+
+HISTORY = [
+    {'id': 2, 'homework_name': 'hw2.zip', 'status': 'approved',
+     'date_updated': '2024-09-20T10:00:00Z'},
+    {'id': 1, 'homework_name': 'hw1.zip', 'status': 'rejected',
+     'date_updated': '2024-09-05T10:00:00Z'},
+]
+
+
+def fake_api(monkeypatch, failing=()):
+    import homework
+
+    requests = []
+
+    def fetch(token, from_date, cache=None):
+        requests.append((token, from_date))
+        if token in failing:
+            raise ConnectionError('API недоступен')
+        return {'homeworks': HISTORY, 'current_date': 1730000000}
+
+    monkeypatch.setattr(homework, 'fetch_api_answer', fetch)
+    return requests
+
+
+def make_registry(count):
+    registry = SubscriptionRegistry()
+    for number in range(count):
+        registry.add(f'token-{number}', number)
+    return registry
+
+
+class TestBackfill:
+
+    def test_parse_date_formats(self):
+        moment = 1725184800
+        for value in ('1725184800', '2024-09-01T10:00:00',
+                      '2024-09-01T10:00:00Z', '2024-09-01T13:00:00+03:00'):
+            assert backfill.parse_date(value) == moment, (
+                f'Дата {value} должна разбираться как UTC {moment}'
+            )
+        assert backfill.updated_at({'date_updated': ''}) is None
+
+    def test_history_is_stored_without_notifications(
+            self, monkeypatch, tmp_path):
+        requests = fake_api(monkeypatch, failing={'token-3'})
+        path = str(tmp_path / 'state.sqlite3')
+        store = SQLiteStateStore(path)
+        since = backfill.parse_date('2024-09-01')
+        progress = backfill.run_backfill(
+            make_registry(5), store, since, workers=3,
+            progress=backfill.Progress(5, stream=io.StringIO()))
+        store.close()
+        assert sorted(requests) == [
+            (f'token-{number}', since) for number in range(5)], (
+            'История каждой подписки должна запрашиваться с --since'
+        )
+        report = progress.report()
+        assert report['subscriptions'] == 5 and report['errors'] == 1
+        assert report['homeworks'] == 8 and report['notifications'] == 0
+
+        store = SQLiteStateStore(path)
+        restored = Subscription('token-0', 0)
+        assert store.load(restored)
+        assert restored.index.get(1) == (
+            'rejected', '2024-09-05T10:00:00Z'), (
+            'Загруженные статусы должны попадать в хранилище'
+        )
+        assert restored.from_date == 1730000000
+        assert not store.load(Subscription('token-3', 3)), (
+            'Ошибка одной подписки не должна записывать её состояние'
+        )
+        store.close()
+
+    def test_replay_sends_only_missed_changes(self, monkeypatch, tmp_path):
+        fake_api(monkeypatch)
+        store = SQLiteStateStore(str(tmp_path / 'state.sqlite3'))
+        registry = make_registry(1)
+        subscription = registry.get('token-0', 0)
+        subscription.index.mark(Homework.from_dict({
+            'id': 1, 'status': 'rejected',
+            'date_updated': '2024-09-05T10:00:00Z'}))
+        subscription.from_date = 100
+        bot = RecordingBot()
+        until = backfill.parse_date('2024-09-30')
+        progress = backfill.run_backfill(
+            registry, store, backfill.parse_date('2024-09-01'), until,
+            bot=bot, progress=backfill.Progress(1, stream=io.StringIO()))
+        store.close()
+        assert bot.sent == [(0, (
+            'Изменился статус проверки работы "hw2.zip". '
+            'Работа проверена: ревьюеру всё понравилось. Ура!'))], (
+            'Повторно должны отправляться только пропущенные изменения'
+        )
+        assert progress.notifications == 1
+        assert subscription.from_date == 100, (
+            'Загрузка прошлого периода не должна сдвигать курсор'
+        )
+        bot.sent.clear()
+        backfill.run_backfill(
+            registry, SQLiteStateStore(str(tmp_path / 'other.sqlite3')),
+            0, until, bot=bot,
+            progress=backfill.Progress(1, stream=io.StringIO()))
+        assert not bot.sent, 'Повторный прогон не должен дублировать сообщения'
+
+    def test_until_filters_by_date_updated(self, monkeypatch):
+        fake_api(monkeypatch)
+        subscription = Subscription('token', 1)
+        homeworks, _ = backfill.backfill_subscription(
+            subscription, 0, backfill.parse_date('2024-09-10'))
+        assert homeworks == 1 and subscription.index.get(2) is None, (
+            'Работы, изменённые позже --until, должны пропускаться'
+        )
@@ -0,0 +1,45 @@
+import http_session
+
+
+class TestBenchmark:
+
+    def test_run_benchmark_reports_all_stages(self, monkeypatch):
+        import benchmark
+        import homework
+
+        monkeypatch.setattr(http_session, '_session', None)
+        monkeypatch.setattr(http_session, '_stats', None)
+        endpoint = homework.ENDPOINT
+        options = benchmark.parse_args([
+            '--subscriptions', '4', '--rounds', '2', '--iterations', '5',
+            '--workers', '2', '--homeworks', '3', '--api-latency', '0',
+            '--telegram-latency', '0', '--startup-runs', '1'])
+        report = benchmark.run_benchmark(options)
+        assert set(report['stages']) == {
+            'get_api_answer', 'check_response', 'parse_status',
+            'send_message', 'loop', 'startup'}, 'В отчёте должны быть все шаги'
+        for stage, result in report['stages'].items():
+            assert result['errors'] == 0, f'Шаг {stage} завершился ошибкой'
+        assert report['stages']['loop']['ops'] == 8, (
+            'Полный цикл должен опросить каждую подписку rounds раз'
+        )
+        assert homework.ENDPOINT == endpoint, (
+            'Бенчмарк должен восстанавливать настройки модуля homework'
+        )
+
+    def test_compare_detects_regressions(self):
+        import benchmark
+
+        stage = {'throughput': 100, 'p50_ms': 5, 'p99_ms': 10}
+        baseline = {'stages': {'loop': stage}, 'rss_mb': 30}
+        same = {'stages': {'loop': dict(stage)}, 'rss_mb': 31}
+        assert benchmark.compare(same, baseline) == []
+        slower = {
+            'stages': {'loop': {
+                'throughput': 50, 'p50_ms': 5, 'p99_ms': 40}},
+            'rss_mb': 60,
+        }
+        assert len(benchmark.compare(slower, baseline)) == 3, (
+            'Падение пропускной способности, рост p99 и RSS '
+            'должны считаться регрессиями'
+        )
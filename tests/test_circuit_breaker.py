@@ -0,0 +1,71 @@
+import pytest
+
+from circuit_breaker import (
+    CLOSED, HALF_OPEN, OPEN, ApiGuard, CircuitBreaker, RetryBudget,
+    parse_retry_after)
+from exceptions import CircuitOpenError
+from subscriptions import Subscription
+from utils import FakeClock
+
+
+class TestCircuitBreaker:
+
+    def test_opens_after_failures_and_probes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(
+            failure_threshold=3, reset_timeout=10, clock=clock)
+        for _ in range(3):
+            breaker.before_request()
+            breaker.record_failure(500)
+        assert breaker.state == OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+        clock.now = 10
+        breaker.before_request()
+        assert breaker.state == HALF_OPEN
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+        breaker.record_failure(None)
+        assert breaker.state == OPEN
+        clock.now = 29
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+        clock.now = 30
+        breaker.before_request()
+        breaker.record_success()
+        assert breaker.state == CLOSED, (
+            'Успешный пробный запрос должен замыкать цепь'
+        )
+
+    def test_retry_after_and_ignored_codes(self):
+        clock = FakeClock()
+        breaker = CircuitBreaker(failure_threshold=1, clock=clock)
+        breaker.record_failure(401)
+        assert breaker.state == CLOSED, (
+            'Ошибка одного токена не должна размыкать цепь'
+        )
+        breaker.record_failure(429, retry_after=120)
+        clock.now = 119
+        with pytest.raises(CircuitOpenError):
+            breaker.before_request()
+        clock.now = 120
+        breaker.before_request()
+
+    def test_parse_retry_after(self):
+        assert parse_retry_after('30') == 30
+        assert parse_retry_after(None) is None
+        assert parse_retry_after('Wed, 21 Oct 2015 07:28:00 GMT') == 0
+
+    def test_retry_budget(self):
+        clock = FakeClock()
+        guard = ApiGuard(
+            CircuitBreaker(clock=clock),
+            RetryBudget(ratio=0.5, min_per_second=0, capacity=1, clock=clock))
+        subscription = Subscription('token', 1)
+        subscription.failures = 1
+        guard.before_request(subscription)
+        with pytest.raises(CircuitOpenError):
+            guard.before_request(subscription)
+        guard.record_success(Subscription('token', 2))
+        guard.record_success(Subscription('token', 3))
+        guard.before_request(subscription)
@@ -0,0 +1,38 @@
+from cursor import CursorPolicy
+from subscriptions import Subscription
+from utils import FakeClock
+
+
+class TestCursor:
+
+    def test_cursor_advances_to_current_date(self):
+        clock = FakeClock(10_000)
+        cursor = CursorPolicy(history=1000, resync_time=None, clock=clock)
+        subscription = Subscription('token', 1)
+        first = cursor.from_date(subscription)
+        assert first == 9000, 'Первый запрос должен охватывать всю историю'
+        cursor.advance(subscription, {'current_date': 10_001}, first)
+        assert cursor.from_date(subscription) == 10_001, (
+            'После опроса from_date должен сдвигаться на current_date'
+        )
+
+    def test_cursor_ignores_response_without_current_date(self):
+        cursor = CursorPolicy(history=1000, clock=FakeClock(10_000))
+        subscription = Subscription('token', 1, from_date=5)
+        cursor.advance(subscription, {'homeworks': []}, 5)
+        assert subscription.from_date == 5
+
+    def test_periodic_full_resync(self):
+        clock = FakeClock(10_000)
+        cursor = CursorPolicy(history=1000, resync_time=100, clock=clock)
+        subscription = Subscription('token', 1, from_date=9000)
+        cursor.advance(subscription, {'current_date': 10_000}, 9000)
+        clock.now = 10_050
+        assert cursor.from_date(subscription) == 10_000
+        cursor.advance(subscription, {'current_date': 10_050}, 10_000)
+        clock.now = 10_100
+        assert cursor.from_date(subscription) == 9100, (
+            'По истечении resync_time нужно запросить всю историю'
+        )
+        cursor.advance(subscription, {'current_date': 10_100}, 9100)
+        assert cursor.from_date(subscription) == 10_100
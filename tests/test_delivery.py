@@ -0,0 +1,127 @@
+import threading
+
+import telegram
+
+from delivery import DeliveryQueue, TokenBucket
+from utils import FakeClock
+
+
+class FlakyBot:
+
+    def __init__(self, failures=()):
+        self.failures = list(failures)
+        self.sent = []
+        self.options = []
+        self.lock = threading.Lock()
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        with self.lock:
+            if self.failures:
+                raise self.failures.pop(0)
+            self.sent.append((chat_id, text))
+            self.options.append(kwargs)
+
+
+class TestDelivery:
+
+    def test_token_bucket(self):
+        clock = FakeClock()
+        bucket = TokenBucket(rate=2, capacity=2, clock=clock)
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0
+        assert bucket.reserve() == 0.5, (
+            'После исчерпания токенов нужно ждать 1/rate секунд'
+        )
+        clock.now = 2
+        assert bucket.reserve() == 0
+
+    def test_messages_to_one_chat_are_coalesced(self):
+        bot = FlakyBot()
+        outbox = DeliveryQueue(bot, global_rate=100, chat_rate=100)
+        for number in range(3):
+            outbox.send_message(chat_id=1, text=f'status {number}')
+        outbox.send_message(chat_id=2, text='other chat')
+        assert outbox.depth() == 4
+        outbox.start()
+        assert outbox.close(timeout=5) == 0
+        assert sorted(bot.sent) == [
+            (1, 'status 0\n\nstatus 1\n\nstatus 2'),
+            (2, 'other chat'),
+        ], 'Сообщения одному чату должны склеиваться в одно'
+
+    def test_parse_mode_is_kept_per_chat(self):
+        bot = FlakyBot()
+        outbox = DeliveryQueue(bot, global_rate=100, chat_rate=100)
+        outbox.send_message(chat_id=1, text='<b>a</b>', parse_mode='HTML')
+        outbox.send_message(chat_id=1, text='<i>b</i>', parse_mode='HTML')
+        outbox.start()
+        assert outbox.close(timeout=5) == 0
+        assert bot.sent == [(1, '<b>a</b>\n\n<i>b</i>')]
+        assert bot.options == [{'parse_mode': 'HTML'}], (
+            'Режим разметки чата должен передаваться в Telegram'
+        )
+
+    def test_full_queue_blocks_producers(self):
+        release = threading.Event()
+
+        class SlowBot(FlakyBot):
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                release.wait(5)
+                super().send_message(chat_id, text)
+
+        bot = SlowBot()
+        outbox = DeliveryQueue(
+            bot, global_rate=100, chat_rate=100, senders=1,
+            max_pending=2).start()
+        outbox.send_message(chat_id=1, text='first')
+        outbox.send_message(chat_id=2, text='second')
+        producer = threading.Thread(
+            target=outbox.send_message, kwargs={'chat_id': 3, 'text': 'third'})
+        producer.start()
+        producer.join(0.2)
+        assert producer.is_alive(), (
+            'При заполненной очереди send_message должен ждать отправки'
+        )
+        release.set()
+        producer.join(5)
+        assert not producer.is_alive()
+        assert outbox.close(timeout=5) == 0
+        assert len(bot.sent) == 3
+
+    def test_retry_after_is_honored(self):
+        bot = FlakyBot([
+            telegram.error.RetryAfter(0.05),
+            telegram.error.NetworkError('boom'),
+        ])
+        outbox = DeliveryQueue(
+            bot, global_rate=100, chat_rate=100, senders=1).start()
+        outbox.send_message(chat_id=1, text='status')
+        assert outbox.close(timeout=5) == 0
+        assert bot.sent == [(1, 'status')], (
+            'Сообщение должно быть доставлено после RetryAfter и ошибки сети'
+        )
+        assert outbox.delivered == 1
+
+    def test_long_messages_are_split(self):
+        text, rest = DeliveryQueue.coalesce(['a' * 3000, 'b' * 3000, 'c'])
+        assert text == 'a' * 3000
+        assert rest == ['b' * 3000, 'c']
+
+    def test_permanent_errors_are_not_retried(self):
+        bot = FlakyBot([
+            telegram.error.Unauthorized('Forbidden: bot was blocked'),
+            telegram.error.BadRequest('Chat not found'),
+        ])
+        outbox = DeliveryQueue(
+            bot, global_rate=100, chat_rate=100, senders=1).start()
+        outbox.send_message(chat_id=1, text='first')
+        outbox.send_message(chat_id=2, text='second', parse_mode='HTML')
+        assert outbox.close(timeout=5) == 0
+        assert bot.sent == [] and bot.failures == []
+        assert outbox.dropped == 2, (
+            'Постоянные ошибки Telegram не должны повторяться'
+        )
+        assert outbox._parse_modes == {}, (
+            'Режим разметки чата должен забываться после отправки'
+        )
@@ -0,0 +1,87 @@
+import json
+
+from error_dedup import ErrorDeduplicator
+from exceptions import YandexApiResponseError
+from subscriptions import Subscription
+from utils import FakeClock, RecordingBot
+
+
+class TestErrorDedup:
+
+    def test_ttl_and_grouping_by_class(self):
+        clock = FakeClock()
+        errors = ErrorDeduplicator(ttl=100, clock=clock)
+        first = errors.key('sub', YandexApiResponseError('Код ответа: 500'))
+        second = errors.key('sub', YandexApiResponseError('Код ответа: 502'))
+        assert first == second, 'Ошибки одного класса должны группироваться'
+        assert errors.should_report(first)
+        assert not errors.should_report(second)
+        clock.now = 100
+        assert errors.should_report(first), (
+            'Ошибка должна снова отправляться по истечении TTL'
+        )
+
+    def test_lru_bound(self):
+        errors = ErrorDeduplicator(maxsize=3)
+        for number in range(10):
+            errors.should_report(f'key{number}')
+        assert len(errors) == 3, 'Размер кэша ошибок должен быть ограничен'
+        assert errors.should_report('key0')
+
+    def test_error_and_recovery_messages(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework, 'ERRORS', ErrorDeduplicator())
+        subscription = Subscription('token', 1)
+        error = YandexApiResponseError('Код ответа: 500')
+        assert homework.error_message(subscription, error) == (
+            'Сбой в работе программы: Код ответа: 500')
+        assert homework.error_message(subscription, error) is None
+        assert homework.recovery_message(subscription) == (
+            'Работа программы восстановлена.')
+        assert homework.recovery_message(subscription) is None
+        assert homework.error_message(subscription, error), (
+            'После восстановления новый сбой должен отправляться снова'
+        )
+
+    def test_malformed_response_does_not_flap(self, monkeypatch):
+        import homework
+        from response_cache import ResponseCache
+        from single_flight import SingleFlight
+
+        class Response:
+            status_code = 200
+            headers = {}
+
+            def __init__(self, data):
+                self.data = data
+                self.content = json.dumps(data).encode()
+
+            def json(self):
+                return self.data
+
+        answers = [{'current_date': 1}] * 4 + [{
+            'current_date': 2,
+            'homeworks': [{'id': 1, 'homework_name': 'hw',
+                           'status': 'reviewing'}],
+        }]
+        monkeypatch.setattr(
+            homework, 'request_api',
+            lambda *args, **kwargs: Response(answers.pop(0)))
+        monkeypatch.setattr(homework, 'ERRORS', ErrorDeduplicator())
+        monkeypatch.setattr(homework, 'RESPONSE_CACHE', ResponseCache())
+        monkeypatch.setattr(homework, 'SINGLE_FLIGHT', SingleFlight())
+        bot = RecordingBot()
+        subscription = Subscription('token', 1, from_date=100)
+        for _ in range(4):
+            homework.poll_subscription(bot, subscription)
+        assert len(bot.sent) == 1, (
+            'Повторяющийся ответ без homeworks должен давать одно '
+            'уведомление о сбое без уведомлений о восстановлении'
+        )
+        homework.poll_subscription(bot, subscription)
+        assert [text for _, text in bot.sent[1:]] == [
+            homework.parse_status(
+                {'homework_name': 'hw', 'status': 'reviewing'}),
+            'Работа программы восстановлена.',
+        ], 'О восстановлении сообщается после обработки ответа'
@@ -0,0 +1,74 @@
+from homework_index import HomeworkIndex
+from records import Homework
+from subscriptions import Subscription
+from utils import RecordingBot
+
+
+def make_homework(homework_id, status, date_updated='2022-01-01T00:00:00Z'):
+    return {
+        'id': homework_id,
+        'homework_name': f'hw{homework_id}',
+        'status': status,
+        'date_updated': date_updated,
+    }
+
+
+class TestHomeworkIndex:
+
+    def test_diff_returns_only_changed(self):
+        index = HomeworkIndex()
+        first = Homework.from_dict(make_homework(1, 'reviewing'))
+        second = Homework.from_dict(make_homework(2, 'approved'))
+        assert index.diff([first, second]) == [first, second]
+        index.mark(first)
+        index.mark(second)
+        rejected = Homework.from_dict(
+            make_homework(1, 'rejected', '2022-01-02T00:00:00Z'))
+        assert index.diff([rejected, second]) == [rejected], (
+            'diff должен возвращать только изменившиеся работы'
+        )
+
+    def test_notify_every_transition(self):
+        import homework
+
+        bot = RecordingBot()
+        subscription = Subscription('token', 7)
+        history = [make_homework(2, 'reviewing'), make_homework(1, 'approved')]
+        homework.notify_changes(bot, subscription, history)
+        assert len(bot.sent) == 1, (
+            'При первом опросе уведомление отправляется только '
+            'о последней работе'
+        )
+        homework.CURSOR.advance(subscription, {'current_date': 100}, None)
+        homework.notify_changes(bot, subscription, history)
+        assert len(bot.sent) == 1
+
+        changes = [
+            make_homework(3, 'reviewing', '2022-01-03T00:00:00Z'),
+            make_homework(2, 'approved', '2022-01-02T00:00:00Z'),
+        ]
+        homework.notify_changes(bot, subscription, changes)
+        texts = [text for _, text in bot.sent[1:]]
+        assert len(texts) == 2, 'Каждый переход должен дать уведомление'
+        assert texts[0].startswith(
+            'Изменился статус проверки работы "hw2"'), (
+            'Уведомления должны отправляться в хронологическом порядке'
+        )
+
+    def test_works_appearing_after_empty_poll(self):
+        import homework
+
+        bot = RecordingBot()
+        subscription = Subscription('token', 7)
+        homework.notify_changes(bot, subscription, [])
+        homework.CURSOR.advance(subscription, {'current_date': 100}, None)
+        homework.notify_changes(bot, subscription, [
+            make_homework(2, 'reviewing', '2022-01-02T00:00:00Z'),
+            make_homework(1, 'approved', '2022-01-01T00:00:00Z'),
+        ])
+        texts = [text for _, text in bot.sent]
+        assert len(texts) == 2, (
+            'После опроса без работ каждая новая работа должна дать '
+            'уведомление'
+        )
+        assert texts[0].startswith('Изменился статус проверки работы "hw1"')
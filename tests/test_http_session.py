@@ -0,0 +1,83 @@
+import socket
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import http_session
+import metrics
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'{"homeworks": [], "current_date": 0}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def local_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield f'http://127.0.0.1:{server.server_port}/'
+    server.shutdown()
+    server.server_close()
+
+
+class TestHttpSession:
+
+    def test_connections_are_reused(self, local_server):
+        requests_before = metrics.API_REQUESTS.value()
+        connections_before = metrics.API_CONNECTIONS.value()
+        session, stats = http_session.create_session(pool_maxsize=2)
+        for _ in range(5):
+            assert session.get(local_server).json()['homeworks'] == []
+        assert stats.as_dict() == {
+            'requests': 5,
+            'new_connections': 1,
+            'reused_connections': 4,
+        }, 'Повторные запросы должны идти по открытому соединению'
+        assert metrics.API_REQUESTS.value() - requests_before == 5
+        assert metrics.API_CONNECTIONS.value() - connections_before == 1, (
+            'Счётчики соединений должны отдаваться в /metrics'
+        )
+
+    def test_current_session(self, monkeypatch):
+        monkeypatch.setattr(http_session, '_session', None)
+        monkeypatch.setattr(http_session, '_stats', None)
+        assert http_session.current() is None
+        session = http_session.configure(pool_maxsize=4)
+        assert http_session.current() is session
+
+    def test_hung_api_times_out(self, monkeypatch):
+        import homework
+        import requests
+
+        listener = socket.socket()
+        listener.bind(('127.0.0.1', 0))
+        listener.listen()
+        monkeypatch.setattr(http_session, '_session', None)
+        monkeypatch.setattr(http_session, '_stats', None)
+        monkeypatch.setattr(
+            homework, 'ENDPOINT',
+            f'http://127.0.0.1:{listener.getsockname()[1]}/')
+        monkeypatch.setattr(homework, 'API_READ_TIMEOUT', 0.2)
+        begin = time.monotonic()
+        try:
+            with pytest.raises(requests.exceptions.Timeout):
+                homework.get_api_answer(0)
+        finally:
+            listener.close()
+        assert time.monotonic() - begin < 5, (
+            'Зависшее соединение должно прерываться по API_READ_TIMEOUT'
+        )
@@ -0,0 +1,49 @@
+import subprocess
+import sys
+import threading
+
+from lazy_imports import LazyObject, lazy_import
+
+
+class TestLazyImports:
+
+    def test_import_does_not_load_heavy_dependencies(self):
+        code = (
+            'import sys, homework; '
+            'print(sorted({"telegram", "requests", "dotenv", "http.server"} '
+            '& set(sys.modules)))')
+        result = subprocess.run(
+            [sys.executable, '-c', code], capture_output=True, text=True,
+            check=True)
+        assert result.stdout.strip() == '[]', (
+            'import homework не должен загружать telegram, requests, '
+            'dotenv и http.server'
+        )
+
+    def test_lazy_module_sees_monkeypatch(self, monkeypatch):
+        import json
+
+        module = lazy_import('json')
+        assert module.dumps([1]) == '[1]'
+        monkeypatch.setattr(json, 'dumps', lambda value: 'patched')
+        assert module.dumps([1]) == 'patched', (
+            'Атрибуты должны читаться из настоящего модуля'
+        )
+
+    def test_lazy_object_is_created_once(self):
+        created = []
+
+        def factory():
+            created.append(1)
+            return 'value'
+
+        lazy = LazyObject(factory)
+        assert not created, 'Объект не должен создаваться заранее'
+        threads = [
+            threading.Thread(target=lambda: lazy.upper()) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        assert lazy.upper() == 'VALUE'
+        assert created == [1], 'Объект должен создаваться один раз'
@@ -0,0 +1,196 @@
+import json
+import threading
+import time
+
+import pytest
+
+from live_config import ConfigManager, parse_config, read_config
+from records import Homework
+from scheduler import PollScheduler
+from storage import subscription_id
+from subscriptions import SubscriptionRegistry
+from utils import FakeClock, InlinePool
+
+
+def write(path, data):
+    path.write_text(json.dumps(data))
+
+
+class TestLiveConfig:
+
+    def test_reload_applies_changes_incrementally(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        write(path, [
+            {'token': 'a', 'chat_id': 1}, {'token': 'b', 'chat_id': 2}])
+        registry = SubscriptionRegistry()
+        env_subscription = registry.add('env', 0)
+        restored = []
+        changes = []
+        manager = ConfigManager(
+            registry, str(path), restore=restored.append,
+            on_change=lambda: changes.append(1))
+        assert manager.reload()['added'] == 2
+        kept = registry.get('a', 1)
+        kept.index.mark(
+            Homework.from_dict({'id': 1, 'status': 'reviewing'}))
+
+        write(path, {
+            'subscriptions': [
+                {'token': 'a', 'chat_id': 1}, {'token': 'c', 'chat_id': 3}],
+            'statuses': {'approved': 'Принято'}})
+        report = manager.reload()
+        assert report == {
+            'added': 1, 'removed': 1, 'rejected': 0, 'statuses': True}
+        assert registry.get('a', 1) is kept and kept.index.get(1), (
+            'Неизменившаяся подписка должна сохранять своё состояние'
+        )
+        assert registry.get('b', 2) is None
+        assert env_subscription in registry, (
+            'Подписка из переменных окружения не должна удаляться'
+        )
+        assert [sub.chat_id for sub in restored] == [1, 2, 3]
+        assert len(changes) == 2
+
+    def test_tokens_are_validated_in_parallel(self):
+        active = []
+        peak = []
+        lock = threading.Lock()
+
+        def check(token):
+            with lock:
+                active.append(token)
+                peak.append(len(active))
+            time.sleep(0.05)
+            with lock:
+                active.remove(token)
+            return token != 'bad'
+
+        registry = SubscriptionRegistry()
+        manager = ConfigManager(registry, check=check, workers=4)
+        config = parse_config(
+            [{'token': f'token-{number}', 'chat_id': number}
+             for number in range(4)] + [{'token': 'bad', 'chat_id': 9}])
+        report = manager.apply(config)
+        assert report['added'] == 4 and report['rejected'] == 1
+        assert registry.get('bad', 9) is None, (
+            'Подписка с отклонённым токеном не должна добавляться'
+        )
+        assert max(peak) > 1, 'Токены должны проверяться параллельно'
+
+    def test_tokens_are_checked_outside_lock(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        write(path, [{'token': 'good', 'chat_id': 1},
+                     {'token': 'bad', 'chat_id': 2}])
+        locked = []
+
+        def check(token):
+            locked.append(manager._lock.locked())
+            return token != 'bad'
+
+        registry = SubscriptionRegistry()
+        manager = ConfigManager(registry, str(path), check=check)
+        report = manager.reload()
+        assert report['rejected'] == 1, (
+            'Токены должны проверяться и при первой загрузке'
+        )
+        assert sorted(locked) == [False, False], (
+            'Токены должны проверяться без блокировки конфигурации'
+        )
+        assert registry.get('bad', 2) is None
+
+    def test_rejected_entries_stay_in_file(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        write(path, [{'token': 'env', 'chat_id': 0},
+                     {'token': 'bad', 'chat_id': 2}])
+        registry = SubscriptionRegistry()
+        registry.add('env', 0)
+        manager = ConfigManager(
+            registry, str(path), check=lambda token: token != 'bad')
+        manager.reload()
+        report = manager.add('new', 3)
+        assert report['added'] == 1
+        assert manager.add('bad', 4)['rejected'] == 1
+        assert list(read_config(str(path)).subscriptions) == [
+            ('env', '0'), ('bad', '2'), ('new', '3')], (
+            'Изменение через API не должно удалять из файла подписки '
+            'с отклонёнными токенами и дубли подписки из окружения'
+        )
+
+    def test_token_check_is_guarded(self, monkeypatch):
+        import homework
+        from circuit_breaker import ApiGuard, CircuitBreaker
+
+        class Response:
+            status_code = 500
+            headers = {}
+
+        requests = []
+
+        def request_api(*args, **kwargs):
+            requests.append(args)
+            return Response()
+
+        monkeypatch.setattr(homework, 'request_api', request_api)
+        monkeypatch.setattr(
+            homework, 'API_GUARD', ApiGuard(CircuitBreaker(1)))
+        assert homework.token_is_valid('token')
+        assert homework.token_is_valid('token')
+        assert len(requests) == 1, (
+            'Проверка токена должна учитывать состояние API_GUARD'
+        )
+
+    def test_admin_changes_are_written_to_file(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        write(path, [])
+        manager = ConfigManager(SubscriptionRegistry(), str(path))
+        manager.reload()
+        manager.add('a', 1)
+        assert not manager.changed(), (
+            'Собственная запись файла не должна вызывать перезагрузку'
+        )
+        assert list(read_config(str(path)).subscriptions) == [('a', '1')]
+
+    def test_statuses_apply_to_parse_status(self, monkeypatch):
+        import homework
+
+        monkeypatch.setattr(homework, 'STATUS_TABLE', homework.STATUS_TABLE)
+        monkeypatch.setattr(
+            homework, 'HOMEWORK_STATUSES', homework.HOMEWORK_STATUSES)
+        monkeypatch.setattr(homework, 'MESSAGES', homework.MESSAGES)
+        manager = ConfigManager(
+            SubscriptionRegistry(), set_statuses=homework.set_statuses)
+        manager.update_statuses({'approved': 'Принято'})
+        assert homework.parse_status(
+            {'homework_name': 'hw', 'status': 'approved'}).endswith('Принято')
+        with pytest.raises(Exception):
+            homework.parse_status(
+                {'homework_name': 'hw', 'status': 'rejected'})
+        with pytest.raises(TypeError):
+            manager.update_statuses({})
+
+    def test_readded_subscription_is_polled(self, tmp_path):
+        registry = SubscriptionRegistry()
+        manager = ConfigManager(registry, str(tmp_path / 'config.json'))
+        manager.add('a', 1)
+        manager.add('b', 2)
+        clock = FakeClock()
+        polled = []
+        scheduler = PollScheduler(
+            registry, lambda sub: polled.append(sub), interval=600,
+            clock=clock, sleep=clock.sleep)
+        pool = InlinePool()
+        while len(polled) < 2:
+            scheduler.step(pool)
+        removed = registry.get('a', 1)
+        manager.remove(subscription_id(removed))
+        manager.add('a', 1)
+        readded = registry.get('a', 1)
+        assert readded is not removed
+        polled.clear()
+        end = clock.now + 1200
+        while clock.now < end:
+            scheduler.step(pool)
+        assert any(sub is readded for sub in polled), (
+            'Удалённая и снова добавленная подписка должна опрашиваться'
+        )
+        assert not any(sub is removed for sub in polled)
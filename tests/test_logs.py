@@ -0,0 +1,91 @@
+import io
+import json
+import logging
+import pathlib
+
+import pytest
+
+import logs
+
+
+@pytest.fixture
+def configure():
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    levels = {
+        name: logging.getLogger(name).level
+        for name in logs.BOT_LOGGERS
+    }
+    yield logs.configure
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    for name, level in levels.items():
+        logging.getLogger(name).setLevel(level)
+
+
+class TestLogs:
+
+    def test_json_records_with_context(self, configure):
+        app_logger = logging.getLogger('test_logs.json')
+        app_logger.addHandler(logging.StreamHandler(io.StringIO()))
+        stream = io.StringIO()
+        listener = configure(app_logger, json_format=True, stream=stream)
+        with logs.context(42):
+            app_logger.info('Сообщение: %s', 'текст', extra={'step': 5})
+        app_logger.warning('без подписки')
+        listener.stop()
+        first, second = [
+            json.loads(line) for line in stream.getvalue().splitlines()]
+        assert first['message'] == 'Сообщение: текст'
+        assert first['chat_id'] == 42 and first['step'] == 5, (
+            'JSON-запись должна содержать чат подписки и номер шага'
+        )
+        assert 'chat_id' not in second
+        assert not app_logger.handlers, (
+            'Прямые обработчики логгера должны быть сняты'
+        )
+
+    def test_step_lines_are_sampled_per_subscription(self, configure):
+        app_logger = logging.getLogger('test_logs.sample')
+        stream = io.StringIO()
+        listener = configure(app_logger, sample=3, stream=stream)
+        for chat_id in (1, 2):
+            with logs.context(chat_id):
+                for _ in range(6):
+                    app_logger.info('step 3 - выполнен', extra={'step': 3})
+                app_logger.info('изменение статуса')
+        listener.stop()
+        lines = stream.getvalue().splitlines()
+        assert sum('step 3' in line for line in lines) == 4, (
+            'Из каждых трёх строк шага подписки должна остаться одна'
+        )
+        assert sum('изменение статуса' in line for line in lines) == 2, (
+            'Строки без шага не должны прореживаться'
+        )
+
+    def test_level_applies_to_bot_loggers_only(self, configure):
+        app_logger = logging.getLogger('test_logs.level')
+        stream = io.StringIO()
+        listener = configure(app_logger, logging.DEBUG, stream=stream)
+        app_logger.debug('отладка бота')
+        logging.getLogger('delivery').debug('отладка доставки')
+        logging.getLogger('urllib3.connectionpool').debug('отладка urllib3')
+        logging.getLogger('telegram.bot').warning('предупреждение telegram')
+        listener.stop()
+        output = stream.getvalue()
+        assert 'отладка бота' in output and 'отладка доставки' in output
+        assert 'отладка urllib3' not in output, (
+            'Отладочные записи сторонних библиотек не должны попадать '
+            'в журнал'
+        )
+        assert 'предупреждение telegram' in output
+
+    def test_bot_loggers_cover_modules(self):
+        root = pathlib.Path(logs.__file__).parent
+        modules = {
+            path.stem for path in root.glob('*.py')
+            if 'logging.getLogger(__name__)' in path.read_text('utf-8')
+        }
+        assert modules == set(logs.BOT_LOGGERS), (
+            'BOT_LOGGERS должен перечислять все модули бота с логгером'
+        )
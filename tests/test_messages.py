@@ -0,0 +1,123 @@
+import json
+
+import pytest
+
+from messages import MessageCatalog, Template, read_messages
+from records import Homework, intern_status
+
+STATUSES = {
+    'approved': 'Работа проверена!',
+    'rejected': 'Есть замечания.',
+}
+
+CONFIG = {
+    'locales': {
+        'en': {
+            'parse_mode': 'HTML',
+            'status': '<b>{name}</b>: {verdict}',
+            'error': 'Failure: {error}',
+            'statuses': {'approved': 'Approved <i>!</i>'},
+        },
+        'md': {'parse_mode': 'MarkdownV2', 'status': '*{name}*'},
+    },
+    'chats': {'10': 'en', 20: 'md'},
+}
+
+
+class TestMessages:
+
+    def test_default_locale_keeps_russian_texts(self):
+        catalog = MessageCatalog.from_config(None, STATUSES)
+        code = intern_status('rejected')
+        assert catalog.status_message(1, code, 'hw.zip') == (
+            'Изменился статус проверки работы "hw.zip". Есть замечания.'
+        ), 'Русский текст уведомления должен совпадать с прежним форматом'
+        assert catalog.error_message(1, ValueError('x')) == (
+            'Сбой в работе программы: x')
+        assert catalog.recovery_message(1) == (
+            'Работа программы восстановлена.')
+        assert catalog.parse_mode(1) is None
+
+    def test_chat_locales_and_escaping(self):
+        catalog = MessageCatalog.from_config(CONFIG, STATUSES)
+        approved = intern_status('approved')
+        rejected = intern_status('rejected')
+        assert catalog.status_message(10, approved, 'a<b>&c') == (
+            '<b>a&lt;b&gt;&amp;c</b>: Approved <i>!</i>'
+        ), 'Название работы экранируется, а текст вердикта — нет'
+        assert catalog.status_message(10, rejected, 'hw') == (
+            '<b>hw</b>: Есть замечания.'
+        ), 'Отсутствующий у языка вердикт берётся из русского'
+        assert catalog.status_message('20', approved, 'hw_1.zip') == (
+            r'*hw\_1\.zip*')
+        assert catalog.error_message(10, '<oops>') == 'Failure: &lt;oops&gt;'
+        assert catalog.recovery_message(10) == (
+            'Работа программы восстановлена.')
+        assert catalog.parse_mode(10) == 'HTML'
+        assert catalog.parse_mode(30) is None
+
+    def test_builtin_texts_are_escaped(self):
+        catalog = MessageCatalog.from_config(
+            {'locales': {'md': {'parse_mode': 'MarkdownV2'}},
+             'chats': {'1': 'md'}}, STATUSES)
+        approved = intern_status('approved')
+        assert catalog.status_message(1, approved, 'hw_1.zip') == (
+            r'Изменился статус проверки работы "hw\_1\.zip"\. '
+            r'Работа проверена\!'
+        ), 'Встроенный текст должен экранироваться для MarkdownV2'
+        assert catalog.recovery_message(1) == (
+            r'Работа программы восстановлена\.')
+        assert catalog.error_message(1, 'x.') == (
+            r'Сбой в работе программы: x\.')
+        assert catalog.recovery_message(2) == (
+            'Работа программы восстановлена.')
+
+    def test_rendered_messages_are_cached(self):
+        catalog = MessageCatalog.from_config(CONFIG, STATUSES)
+        approved = intern_status('approved')
+        for chat_id in (1, 2, 10, 10):
+            catalog.status_message(chat_id, approved, 'hw')
+        info = catalog.cache_info()
+        assert (info.hits, info.misses) == (2, 2), (
+            'Кэш должен хранить уведомления по языку, а не по чату'
+        )
+
+    def test_invalid_templates_are_rejected(self):
+        with pytest.raises(ValueError):
+            Template('{unknown}')
+        with pytest.raises(ValueError):
+            Template('{name!r}', fields=('name',))
+        with pytest.raises(ValueError):
+            Template('text', parse_mode='BBCode')
+        with pytest.raises(ValueError):
+            MessageCatalog.from_config({'chats': {'1': 'fr'}}, STATUSES)
+
+    def test_bot_uses_chat_templates(self, monkeypatch, tmp_path):
+        import homework
+
+        path = tmp_path / 'messages.json'
+        path.write_text(json.dumps(CONFIG), encoding='utf-8')
+        monkeypatch.setattr(homework, 'MESSAGE_CONFIG', read_messages(path))
+        monkeypatch.setattr(homework, 'MESSAGES', homework.MESSAGES)
+        monkeypatch.setattr(homework, 'STATUS_TABLE', homework.STATUS_TABLE)
+        monkeypatch.setattr(
+            homework, 'HOMEWORK_STATUSES', homework.HOMEWORK_STATUSES)
+        homework.set_statuses(homework.HOMEWORK_STATUSES)
+        homework_data = {'homework_name': 'hw', 'status': 'approved'}
+        assert homework.parse_status(homework_data) == (
+            'Изменился статус проверки работы "hw". '
+            'Работа проверена: ревьюеру всё понравилось. Ура!'
+        ), 'Без чата parse_status должен возвращать русский текст'
+
+        class Bot:
+            sent = []
+
+            def send_message(self, chat_id=None, text=None, **kwargs):
+                self.sent.append((chat_id, text, kwargs))
+
+        homework.send_to_chat(
+            Bot(), '10', homework.render_status(
+                Homework.from_dict(homework_data), '10'))
+        assert Bot.sent == [
+            ('10', '<b>hw</b>: Approved <i>!</i>', {'parse_mode': 'HTML'})
+        ], 'Сообщение должно отправляться с режимом разметки языка чата'
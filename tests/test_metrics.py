@@ -0,0 +1,80 @@
+import urllib.request
+
+import pytest
+
+import metrics
+
+
+class TestMetrics:
+
+    def test_histogram_render(self):
+        histogram = metrics.Histogram(
+            'test_seconds', 'Тест', ('step',), buckets=(0.1, 1))
+        histogram.observe(0.05, 'a')
+        histogram.observe(0.5, 'a')
+        histogram.observe(5, 'a')
+        text = histogram.render()
+        assert '# TYPE test_seconds histogram' in text
+        assert 'test_seconds_bucket{step="a",le="0.1"} 1' in text
+        assert 'test_seconds_bucket{step="a",le="1.0"} 2' in text, (
+            'Корзины гистограммы должны быть накопительными'
+        )
+        assert 'test_seconds_bucket{step="a",le="+Inf"} 3' in text
+        assert 'test_seconds_count{step="a"} 3' in text
+        with pytest.raises(ValueError):
+            histogram.observe(1)
+
+    def test_counter_and_gauge(self):
+        counter = metrics.Counter('test_total', 'Тест', ('type',))
+        counter.inc('KeyError')
+        counter.inc('KeyError', amount=2)
+        assert counter.value('KeyError') == 3
+        assert 'test_total{type="KeyError"} 3.0' in counter.render()
+        gauge = metrics.Gauge('test_depth', 'Тест')
+        gauge.set_function(lambda: 7)
+        assert 'test_depth 7.0' in gauge.render(), (
+            'Gauge с функцией должен читать значение при выводе'
+        )
+
+    def test_pipeline_is_instrumented(self):
+        import homework
+
+        before = metrics.STEP_SECONDS.count('parse_status')
+        homework.parse_status(
+            {'homework_name': 'hw', 'status': 'approved'})
+        assert metrics.STEP_SECONDS.count('parse_status') == before + 1, (
+            'parse_status должен учитываться в homework_step_seconds'
+        )
+
+    def test_server_serves_registry(self):
+        registry = metrics.Registry()
+        registry.register(metrics.Counter('served_total', 'Тест')).inc()
+        server = metrics.start_server(0, registry=registry)
+        try:
+            url = f'http://127.0.0.1:{server.server_port}/metrics'
+            with urllib.request.urlopen(url) as response:
+                body = response.read().decode()
+                content_type = response.headers['Content-Type']
+        finally:
+            server.shutdown()
+            server.server_close()
+        assert 'served_total 1.0' in body
+        assert content_type.startswith('text/plain'), (
+            'Метрики должны отдаваться в текстовом формате Prometheus'
+        )
+
+    def test_busy_port_does_not_stop_bot(self, monkeypatch):
+        import homework
+
+        server = metrics.start_server(0)
+        try:
+            monkeypatch.setattr(homework, 'METRICS_PORT', server.server_port)
+            assert homework.start_metrics() is None, (
+                'Второй процесс на том же узле должен работать без '
+                'сервера метрик'
+            )
+        finally:
+            server.shutdown()
+            server.server_close()
+        monkeypatch.setattr(homework, 'METRICS_PORT', 0)
+        assert homework.start_metrics() is None
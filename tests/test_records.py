@@ -0,0 +1,65 @@
+import pytest
+
+from exceptions import UnknownHomeworkStatus
+from homework_index import HomeworkIndex
+from records import Homework, StatusTable, intern_status, status_name
+
+STATUSES = {
+    'approved': 'Работа проверена!',
+    'rejected': 'Есть замечания.',
+}
+
+
+class TestRecords:
+
+    def test_intern_status_is_stable(self):
+        code = intern_status('approved')
+        assert intern_status('approved') == code, (
+            'Повторный вызов intern_status должен вернуть тот же код'
+        )
+        assert status_name(code) == 'approved', (
+            'status_name должен возвращать исходную строку статуса'
+        )
+
+    def test_homework_from_dict(self):
+        record = Homework.from_dict({
+            'id': 5, 'homework_name': 'hw.zip', 'status': 'rejected',
+            'date_updated': 'd1'})
+        assert (record.key, record.name, record.date_updated) == (
+            5, 'hw.zip', 'd1')
+        assert record.status == intern_status('rejected'), (
+            'Запись должна хранить код статуса, а не строку'
+        )
+        assert not hasattr(record, '__dict__'), (
+            'Запись Homework должна использовать __slots__'
+        )
+        assert Homework.from_dict({'homework_name': 'hw'}).key == 'hw', (
+            'Без id работа должна индексироваться по названию'
+        )
+
+    def test_unknown_and_missing_fields(self):
+        table = StatusTable(STATUSES)
+        intern_status('reviewing')
+        with pytest.raises(UnknownHomeworkStatus):
+            table.verify(Homework.from_dict(
+                {'homework_name': 'hw', 'status': 'reviewing'}))
+        with pytest.raises(UnknownHomeworkStatus):
+            table.verify(
+                Homework.from_dict({'homework_name': 'hw', 'status': 'x'}))
+        with pytest.raises(KeyError):
+            table.verify(Homework.from_dict({'status': 'approved'}))
+
+    def test_index_keeps_status_names_outside(self):
+        index = HomeworkIndex()
+        homework = Homework.from_dict(
+            {'id': 1, 'status': 'reviewing', 'date_updated': 'd1'})
+        index.mark(homework)
+        assert index.reviewing == 1
+        assert index.get(1) == ('reviewing', 'd1'), (
+            'Индекс должен отдавать строку статуса, а не её код'
+        )
+        assert index.drain_dirty() == {1: ('reviewing', 'd1')}
+        assert not index.diff([homework])
+        index.restore(1, ['approved', 'd2'])
+        assert index.reviewing == 0
+        assert dict(index.items()) == {1: ('approved', 'd2')}
@@ -0,0 +1,169 @@
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from circuit_breaker import ApiGuard
+from response_cache import ResponseCache
+from single_flight import SingleFlight
+from subscriptions import Subscription, SubscriptionRegistry
+from utils import RecordingBot
+
+BODY = json.dumps({'homeworks': [], 'current_date': 1000198000}).encode()
+
+
+def make_handler(requests_seen, etag):
+
+    class Handler(BaseHTTPRequestHandler):
+
+        def do_GET(self):
+            requests_seen.append(dict(self.headers))
+            if etag and self.headers.get('If-None-Match') == etag:
+                self.send_response(304)
+                self.end_headers()
+                return
+            self.send_response(200)
+            if etag:
+                self.send_header('ETag', etag)
+            self.send_header('Content-Length', str(len(BODY)))
+            self.end_headers()
+            self.wfile.write(BODY)
+
+        def log_message(self, *args):
+            pass
+
+    return Handler
+
+
+class FakeResponse:
+
+    status_code = 200
+
+    def __init__(self, data):
+        self.headers = {}
+        self.content = json.dumps(data).encode()
+
+    def json(self):
+        return json.loads(self.content)
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    import homework
+
+    answers = []
+    monkeypatch.setattr(
+        homework, 'request_api',
+        lambda *args, **kwargs: FakeResponse(answers.pop(0)))
+    monkeypatch.setattr(homework, 'RESPONSE_CACHE', ResponseCache())
+    monkeypatch.setattr(homework, 'SINGLE_FLIGHT', SingleFlight())
+    monkeypatch.setattr(homework, 'API_GUARD', ApiGuard())
+    return answers
+
+
+@pytest.fixture
+def serve(monkeypatch):
+    servers = []
+
+    def start(etag):
+        import homework
+
+        seen = []
+        server = ThreadingHTTPServer(
+            ('127.0.0.1', 0), make_handler(seen, etag))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        monkeypatch.setattr(
+            homework, 'ENDPOINT', f'http://127.0.0.1:{server.server_port}/')
+        return seen
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+class TestResponseCache:
+
+    def test_etag_not_modified(self, serve):
+        import homework
+
+        seen = serve('"v1"')
+        cache = ResponseCache()
+        first = homework.fetch_api_answer('token', 100, cache)
+        assert first['current_date'] == 1000198000
+        assert homework.fetch_api_answer('token', 100, cache) is None, (
+            'Ответ 304 должен означать, что данные не изменились'
+        )
+        assert seen[1]['If-None-Match'] == '"v1"'
+
+    def test_body_hash_without_validators(self, serve):
+        import homework
+
+        serve(None)
+        cache = ResponseCache()
+        assert homework.fetch_api_answer('token', 100, cache) is not None
+        assert homework.fetch_api_answer('token', 100, cache) is None, (
+            'Одинаковое тело ответа не должно разбираться повторно'
+        )
+        assert homework.fetch_api_answer(
+            'token', 200, cache, ('token', '2')) is not None, (
+            'Ответ, запомненный для одной подписки, не должен '
+            'пропускаться для другой'
+        )
+
+    def test_current_date_is_ignored(self):
+        cache = ResponseCache()
+        body = {'homeworks': [{'id': 1, 'status': 'reviewing'}]}
+        assert not cache.update(
+            'key', {}, json.dumps({**body, 'current_date': 1}).encode())
+        assert cache.update(
+            'key', {}, json.dumps({**body, 'current_date': 2}).encode()), (
+            'Ответ, в котором изменилось только current_date, '
+            'должен считаться неизменившимся'
+        )
+        body['homeworks'][0]['status'] = 'approved'
+        assert not cache.update(
+            'key', {}, json.dumps({**body, 'current_date': 3}).encode())
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(maxsize=2)
+        for key in range(3):
+            cache.update(key, {}, b'body')
+        assert len(cache) == 2
+        assert not cache.update(0, {}, b'body'), (
+            'Вытесненный ключ не должен считаться закэшированным'
+        )
+
+    def test_chats_of_one_token_are_cached_separately(self, fake_api):
+        import homework
+
+        body = {'homeworks': [{'id': 1, 'homework_name': 'hw',
+                               'status': 'approved'}],
+                'current_date': 200}
+        fake_api.extend([body, body])
+        registry = SubscriptionRegistry()
+        bot = RecordingBot()
+        for chat_id in ('A', 'B'):
+            homework.poll_subscription(
+                bot, registry.add('tok', chat_id, from_date=100))
+        assert [chat_id for chat_id, _ in bot.sent] == ['A', 'B'], (
+            'Ответ, обработанный для одного чата, должен обрабатываться '
+            'и для другого чата того же токена'
+        )
+
+    def test_advancing_cursor_reuses_entry(self, fake_api):
+        import homework
+
+        fake_api.extend(
+            {'homeworks': [], 'current_date': 1000 + number}
+            for number in range(5))
+        subscription = Subscription('tok', 1, from_date=100)
+        for _ in range(5):
+            homework.poll_subscription(RecordingBot(), subscription)
+        cache = homework.RESPONSE_CACHE
+        assert len(cache) == 1, (
+            'Сдвиг курсора не должен оставлять в кэше лишних записей'
+        )
+        assert (cache.hits, cache.misses) == (4, 1)
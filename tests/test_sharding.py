@@ -0,0 +1,164 @@
+from records import Homework
+from scheduler import PollScheduler
+from sharding import HashRing, ShardCoordinator
+from storage import SQLiteStateStore
+from subscriptions import SubscriptionRegistry
+from utils import FakeClock, InlinePool
+
+
+def make_source(count):
+    registry = SubscriptionRegistry()
+    for number in range(count):
+        registry.add(f'token-{number}', number, 0)
+    return registry
+
+
+def owned_keys(coordinator):
+    return {subscription.key for subscription in coordinator.owned}
+
+
+class TestSharding:
+
+    def test_ring_moves_few_keys(self):
+        keys = [f'token-{number}' for number in range(1000)]
+        before = HashRing(['a', 'b', 'c'])
+        after = HashRing(['a', 'b', 'c', 'd'])
+        moved = [key for key in keys if before.owner(key) != after.owner(key)]
+        assert all(after.owner(key) == 'd' for key in moved), (
+            'При добавлении процесса подписки должны переезжать только к нему'
+        )
+        assert 100 < len(moved) < 400
+        assert HashRing([]).owner('token') is None
+
+    def test_rebalance_without_double_ownership(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        clock = FakeClock(1000.0)
+        source = make_source(40)
+        first_store = SQLiteStateStore(path)
+        second_store = SQLiteStateStore(path)
+        first = ShardCoordinator(first_store, source, 'a', clock=clock)
+        second = ShardCoordinator(second_store, source, 'b', clock=clock)
+
+        first.refresh()
+        assert len(first.owned) == 40
+        ring = HashRing(['a', 'b'])
+        subscription = next(
+            subscription for subscription in first.owned
+            if ring.owner(subscription.token) == 'b')
+        subscription.index.mark(
+            Homework.from_dict({'id': 1, 'status': 'approved'}))
+        first_store.save(subscription)
+
+        second.refresh()
+        assert not second.owned, (
+            'Процесс не должен брать подписки, пока их аренда у другого'
+        )
+        first.refresh()
+        second.refresh()
+        first_keys, second_keys = owned_keys(first), owned_keys(second)
+        assert first_keys and second_keys
+        assert not first_keys & second_keys, (
+            'Подписка не должна принадлежать двум процессам сразу'
+        )
+        assert len(first_keys | second_keys) == 40
+        moved = second.owned.get(*subscription.key)
+        assert moved.index.get(1) == ('approved', None), (
+            'Новый владелец должен загрузить состояние подписки'
+        )
+
+        second.close()
+        clock.now += 1
+        first.refresh()
+        assert len(first.owned) == 40, (
+            'Подписки ушедшего процесса должны вернуться к оставшимся'
+        )
+        first_store.close()
+        second_store.close()
+
+    def test_release_waits_for_active_poll(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        clock = FakeClock(1000.0)
+        source = make_source(20)
+        first_store = SQLiteStateStore(path)
+        second_store = SQLiteStateStore(path)
+        first = ShardCoordinator(first_store, source, 'a', clock=clock)
+        second = ShardCoordinator(second_store, source, 'b', clock=clock)
+        first.refresh()
+        second.refresh()
+        ring = HashRing(['a', 'b'])
+        moving = next(
+            subscription for subscription in first.owned
+            if ring.owner(subscription.token) == 'b')
+        states = []
+
+        def poll(subscription):
+            first.refresh()
+            second.refresh()
+            states.append(subscription.key in owned_keys(second))
+            return 0
+
+        assert first.wrap(poll)(moving) == 0
+        assert states == [False], (
+            'Аренда не должна передаваться во время опроса подписки'
+        )
+        assert not first.owns(moving)
+        assert first.wrap(poll)(moving) == 0 and len(states) == 1, (
+            'Опрос подписки без аренды должен пропускаться'
+        )
+        first.refresh()
+        second.refresh()
+        assert moving.key in owned_keys(second)
+        first_store.close()
+        second_store.close()
+
+    def test_regained_subscriptions_are_polled(self, tmp_path):
+        path = str(tmp_path / 'state.sqlite3')
+        clock = FakeClock(1000.0)
+        source = make_source(20)
+        first_store = SQLiteStateStore(path)
+        second_store = SQLiteStateStore(path)
+        first = ShardCoordinator(first_store, source, 'a', clock=clock)
+        second = ShardCoordinator(second_store, source, 'b', clock=clock)
+        polled = []
+        timer = FakeClock(1000.0)
+        scheduler = PollScheduler(
+            first.owned, first.wrap(lambda sub: polled.append(sub.key)),
+            interval=600, clock=timer, sleep=timer.sleep)
+        pool = InlinePool()
+
+        def poll_window():
+            polled.clear()
+            end = timer.now + 600
+            while timer.now < end:
+                scheduler.step(pool)
+            return set(polled)
+
+        first.refresh()
+        assert poll_window() == owned_keys(first)
+        second.refresh()
+        first.refresh()
+        second.refresh()
+        moved = {
+            subscription.key for subscription in source} - owned_keys(first)
+        assert moved, 'Часть подписок должна перейти ко второму процессу'
+        second.close()
+        clock.now += 1
+        first.refresh()
+        assert len(first.owned) == 20
+        assert moved <= poll_window(), (
+            'Вернувшиеся подписки должны снова опрашиваться'
+        )
+        first_store.close()
+        second_store.close()
+
+    def test_sharding_requires_sqlite(self, monkeypatch):
+        import homework
+        import http_session
+
+        monkeypatch.setattr(homework, 'SHARDING', True)
+        monkeypatch.setattr(homework, 'STATE_BACKEND', 'file')
+        monkeypatch.setattr(http_session, '_session', None)
+        assert homework.run_bot() is None
+        assert http_session.current() is None, (
+            'Бот не должен запускаться с хранилищем без поддержки шардов'
+        )
@@ -0,0 +1,108 @@
+import asyncio
+import threading
+
+import pytest
+
+from single_flight import AsyncSingleFlight, SingleFlight
+from utils import FakeClock, RecordingBot
+
+
+class TestSingleFlight:
+
+    def test_concurrent_calls_share_one_request(self):
+        flights = SingleFlight()
+        calls = []
+        release = threading.Event()
+
+        def fetch(token):
+            calls.append(token)
+            release.wait(5)
+            return {'homeworks': []}
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    flights.do(('token', 0), fetch, 'token')))
+            for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        while not calls:
+            pass
+        release.set()
+        for thread in threads:
+            thread.join()
+        assert calls == ['token'], (
+            'Одновременные опросы токена должны выполнять один запрос'
+        )
+        assert len(results) == 5 and all(
+            result is results[0] for result in results)
+        flights.do(('token', 0), fetch, 'token')
+        assert len(calls) == 2, 'Без linger результат не должен храниться'
+
+    def test_linger_and_errors(self):
+        clock = FakeClock()
+        flights = SingleFlight(linger=5, clock=clock)
+        calls = []
+
+        def fetch(value):
+            calls.append(value)
+            if value == 'error':
+                raise ConnectionError(value)
+            return value
+
+        assert flights.do('key', fetch, 'first') == 'first'
+        clock.now = 4
+        assert flights.do('key', fetch, 'second') == 'first', (
+            'Опрос сразу после запроса должен получать его результат'
+        )
+        clock.now = 6
+        assert flights.do('key', fetch, 'third') == 'third'
+        with pytest.raises(ConnectionError):
+            flights.do('other', fetch, 'error')
+        assert flights.do('other', fetch, 'ok') == 'ok', (
+            'Ошибка не должна сохраняться для следующих опросов'
+        )
+
+    def test_async_calls_share_one_request(self):
+        flights = AsyncSingleFlight()
+        calls = []
+
+        async def fetch(token):
+            calls.append(token)
+            await asyncio.sleep(0.01)
+            return token
+
+        async def main():
+            return await asyncio.gather(*(
+                flights.do(('token', 0), fetch, 'token') for _ in range(5)))
+
+        assert asyncio.run(main()) == ['token'] * 5
+        assert calls == ['token']
+
+    def test_token_subscribers_are_notified_from_one_request(
+            self, monkeypatch):
+        import homework
+        from circuit_breaker import ApiGuard
+        from subscriptions import SubscriptionRegistry
+
+        requests = []
+
+        def fetch(token, from_date, cache=None, cache_key=None):
+            requests.append((token, from_date))
+            return {'homeworks': [
+                {'id': 1, 'homework_name': 'hw.zip', 'status': 'approved'}],
+                'current_date': 200}
+
+        monkeypatch.setattr(homework, 'fetch_api_answer', fetch)
+        monkeypatch.setattr(homework, 'SINGLE_FLIGHT', SingleFlight(5))
+        monkeypatch.setattr(homework, 'API_GUARD', ApiGuard())
+        registry = SubscriptionRegistry()
+        bot = RecordingBot()
+        for chat_id in (1, 2, 3):
+            subscription = registry.add('shared', chat_id, from_date=100)
+            assert homework.poll_subscription(bot, subscription) == 1
+        assert requests == [('shared', 100)], (
+            'Подписки одного токена должны получать ответ одного запроса'
+        )
+        assert [chat_id for chat_id, _ in bot.sent] == [1, 2, 3]
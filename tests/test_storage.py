@@ -0,0 +1,87 @@
+import pytest
+
+from records import Homework
+from storage import DEFAULT_PATHS, FileStateStore, SQLiteStateStore
+from subscriptions import Subscription
+
+
+def make_store(backend, tmp_path):
+    if backend == 'sqlite':
+        return SQLiteStateStore(str(tmp_path / 'state.sqlite3'))
+    return FileStateStore(str(tmp_path / 'state.jsonl'))
+
+
+@pytest.mark.parametrize('backend', ['sqlite', 'file'])
+class TestStorage:
+
+    def test_state_survives_restart(self, backend, tmp_path):
+        store = make_store(backend, tmp_path)
+        subscription = Subscription('token', 1, from_date=100)
+        subscription.synced_at = 50.0
+        subscription.index.mark(Homework.from_dict(
+            {'id': 7, 'status': 'approved', 'date_updated': 'd1'}))
+        subscription.error_keys = (('abc', 123.0),)
+        store.save(subscription)
+        assert store.flush() == 1
+        store.close()
+
+        store = make_store(backend, tmp_path)
+        restored = Subscription('token', 1)
+        assert store.load(restored), (
+            'Состояние подписки должно восстанавливаться после перезапуска'
+        )
+        assert restored.from_date == 100
+        assert restored.index.get(7) == ('approved', 'd1')
+        assert restored.error_keys == (('abc', 123.0),)
+        assert not store.load(Subscription('token', 2))
+        store.close()
+
+    def test_unchanged_state_is_not_written(self, backend, tmp_path):
+        store = make_store(backend, tmp_path)
+        subscription = Subscription('token', 1, from_date=100)
+        store.save(subscription)
+        assert store.flush() == 1
+        store.save(subscription)
+        assert store.flush() == 0, (
+            'Неизменившееся состояние не должно записываться повторно'
+        )
+        store.close()
+
+    def test_readded_subscription_gets_latest_state(self, backend, tmp_path):
+        store = make_store(backend, tmp_path)
+        subscription = Subscription('token', 1, from_date=100)
+        subscription.index.mark(
+            Homework.from_dict({'id': 7, 'status': 'reviewing'}))
+        store.save(subscription)
+        store.flush()
+        store.close()
+
+        store = make_store(backend, tmp_path)
+        first = Subscription('token', 1)
+        assert store.load(first)
+        first.index.mark(Homework.from_dict({'id': 7, 'status': 'approved'}))
+        first.index.mark(Homework.from_dict({'id': 8, 'status': 'reviewing'}))
+        store.save(first)
+        store.flush()
+        readded = Subscription('token', 1)
+        assert store.load(readded), (
+            'Снова добавленная подписка должна найти своё состояние'
+        )
+        assert readded.index.get(7) == ('approved', None)
+        assert readded.index.get(8) == ('reviewing', None), (
+            'Состояние должно включать записи после запуска'
+        )
+        store.close()
+
+    def test_default_path_depends_on_backend(self, backend, monkeypatch):
+        import homework
+        monkeypatch.setattr(homework, 'STATE_BACKEND', homework.STATE_BACKEND)
+        monkeypatch.setattr(homework, 'STATE_PATH', homework.STATE_PATH)
+        monkeypatch.setenv('STATE_BACKEND', backend)
+        monkeypatch.delenv('STATE_PATH', raising=False)
+        homework.read_settings()
+        assert homework.STATE_PATH == DEFAULT_PATHS[backend]
+        assert homework.STATE_PATH.endswith(
+            {'sqlite': '.sqlite3', 'file': '.state'}[backend]), (
+            'Путь к состоянию по умолчанию должен соответствовать бэкенду'
+        )
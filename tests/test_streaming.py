@@ -0,0 +1,88 @@
+import json
+
+import pytest
+
+from exceptions import ResponseHasNoHomeworks
+from streaming import HomeworkStream
+
+
+def chunked(data, size):
+    text = json.dumps(data, ensure_ascii=False)
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+HOMEWORKS = [
+    {'id': number, 'homework_name': f'hw{number}', 'status': 'approved',
+     'reviewer_comment': 'Всё нравится, "отлично" {}[]'}
+    for number in range(20)
+]
+
+
+class TestStreaming:
+
+    @pytest.mark.parametrize('size', [1, 7, 4096])
+    def test_records_are_streamed(self, size):
+        data = {'current_date': 1000198000, 'homeworks': HOMEWORKS}
+        stream = HomeworkStream(chunked(data, size))
+        assert list(stream) == HOMEWORKS, (
+            'Поток должен отдавать записи homeworks без изменений'
+        )
+        assert stream.get('current_date') == 1000198000
+
+    def test_drain_after_limit(self):
+        import homework
+
+        data = {'homeworks': HOMEWORKS, 'current_date': 1000198000}
+        stream = HomeworkStream(chunked(data, 5))
+        newest = list(homework.check_response_stream(stream, limit=3))
+        assert [hw['id'] for hw in newest] == [0, 1, 2]
+        assert stream.get('current_date') is None
+        stream.drain()
+        assert stream.get('current_date') == 1000198000, (
+            'drain() должен дочитывать ответ до конца'
+        )
+
+    def test_limit_applies_to_full_resync_only(self, monkeypatch):
+        import homework
+        from subscriptions import Subscription
+        from utils import RecordingBot
+
+        monkeypatch.setattr(homework, 'STREAM_LIMIT', 3)
+        data = {'homeworks': HOMEWORKS[:5], 'current_date': 1000198000}
+        subscription = Subscription('token', 1, from_date=100)
+        subscription.synced_at = 0
+        bot = RecordingBot()
+        homework.process_response(
+            bot, subscription, HomeworkStream(chunked(data, 5)), 100)
+        assert len(bot.sent) == 5, (
+            'Ответ с курсора должен читаться целиком, иначе курсор '
+            'перескочит непрочитанные работы'
+        )
+        assert subscription.from_date == 1000198000
+
+        subscription = Subscription('token', 2)
+        homework.process_response(
+            bot, subscription, HomeworkStream(chunked(data, 5)), 50)
+        assert len(subscription.index) == 3, (
+            'Запрос всей истории должен ограничиваться STREAM_LIMIT'
+        )
+
+    def test_check_response_stream_errors(self):
+        import homework
+
+        stream = HomeworkStream(chunked({'current_date': 1}, 3))
+        with pytest.raises(ResponseHasNoHomeworks):
+            list(homework.check_response_stream(stream))
+        stream = HomeworkStream(chunked({'homeworks': {'a': 1}}, 3))
+        with pytest.raises(TypeError):
+            list(homework.check_response_stream(stream))
+        stream = HomeworkStream(chunked({'homeworks': [1, 2]}, 3))
+        with pytest.raises(TypeError):
+            list(homework.check_response_stream(stream))
+        with pytest.raises(TypeError):
+            list(homework.check_response_stream({'homeworks': []}))
+
+    def test_truncated_response(self):
+        text = json.dumps({'homeworks': HOMEWORKS})[:-10]
+        with pytest.raises(json.JSONDecodeError):
+            list(HomeworkStream([text]))
@@ -0,0 +1,162 @@
+import json
+import os
+import signal
+import threading
+import time
+
+from records import Homework
+from scheduler import AdaptiveInterval, PollScheduler
+from subscriptions import SubscriptionRegistry, load_subscriptions
+from utils import FakeClock, InlinePool
+
+
+class TestSubscriptions:
+
+    def test_registry_add_is_idempotent(self):
+        registry = SubscriptionRegistry()
+        first = registry.add('token', 123)
+        second = registry.add('token', '123')
+        assert first is second, (
+            'Повторное добавление подписки должно возвращать существующую'
+        )
+        assert len(registry) == 1
+        registry.remove('token', 123)
+        assert len(registry) == 0
+        assert first not in registry
+
+    def test_load_subscriptions(self, tmp_path):
+        path = tmp_path / 'subscriptions.json'
+        path.write_text(json.dumps([
+            {'token': 'a', 'chat_id': 1},
+            {'token': 'a', 'chat_id': 2},
+            {'token': 'b', 'chat_id': 1},
+        ]))
+        registry = SubscriptionRegistry()
+        assert load_subscriptions(path, registry, from_date=10) == 3
+        assert registry.get('a', 2).from_date == 10
+
+    def test_scheduler_spreads_polls_over_window(self):
+        registry = SubscriptionRegistry()
+        for chat_id in range(50):
+            registry.add(f'token-{chat_id}', chat_id)
+        clock = FakeClock()
+        polled = []
+        scheduler = PollScheduler(
+            registry, lambda sub: polled.append((clock.now, sub.chat_id)),
+            interval=600, workers=4, clock=clock, sleep=clock.sleep)
+        pool = InlinePool()
+        while len(polled) < 100:
+            scheduler.step(pool)
+        first_cycle = [chat_id for _, chat_id in polled[:50]]
+        assert sorted(first_cycle) == list(range(50)), (
+            'За одно окно каждая подписка должна быть опрошена ровно один раз'
+        )
+        moments = {moment for moment, _ in polled[:50]}
+        assert len(moments) > 10, (
+            'Опросы должны быть распределены внутри окна RETRY_TIME'
+        )
+        assert max(moments) < 600
+
+    def test_scheduler_polls_token_subscribers_together(self):
+        registry = SubscriptionRegistry()
+        for chat_id in range(3):
+            registry.add('shared', chat_id)
+        registry.add('other', 10)
+        clock = FakeClock()
+        polled = []
+        policy = AdaptiveInterval(
+            base=600, fast=60, max_interval=3600, recent_time=3600,
+            clock=clock)
+        scheduler = PollScheduler(
+            registry, lambda sub: polled.append((clock.now, sub.token)),
+            interval=600, policy=policy, clock=clock, sleep=clock.sleep)
+        pool = InlinePool()
+        while len(polled) < 12:
+            scheduler.step(pool)
+        moments = {}
+        for moment, token in polled:
+            moments.setdefault(token, set()).add(moment)
+        assert len(moments['shared']) == 3, (
+            'Подписки одного токена должны опрашиваться одновременно'
+        )
+        assert not moments['shared'] & moments['other']
+
+    def test_scheduler_drops_removed_subscription(self):
+        registry = SubscriptionRegistry()
+        registry.add('token', 1)
+        registry.add('token', 2)
+        clock = FakeClock()
+        polled = []
+        scheduler = PollScheduler(
+            registry, lambda sub: polled.append(sub.chat_id),
+            interval=600, clock=clock, sleep=clock.sleep)
+        pool = InlinePool()
+        while len(polled) < 2:
+            scheduler.step(pool)
+        registry.remove('token', 1)
+        for _ in range(10):
+            scheduler.step(pool)
+        assert set(polled[2:]) == {2}, (
+            'Удалённая подписка не должна больше опрашиваться'
+        )
+
+    def test_scheduler_stops_and_drains(self):
+        registry = SubscriptionRegistry()
+        registry.add('token', 1)
+        started = threading.Event()
+        release = threading.Event()
+
+        def poll(subscription):
+            started.set()
+            release.wait(5)
+
+        scheduler = PollScheduler(registry, poll, interval=0.01, workers=2)
+        thread = threading.Thread(target=scheduler.run)
+        thread.start()
+        assert started.wait(5)
+        begin = time.monotonic()
+        scheduler.stop()
+        thread.join(5)
+        assert not thread.is_alive() and time.monotonic() - begin < 1, (
+            'stop() должен сразу прерывать ожидание цикла опроса'
+        )
+        assert scheduler.drain(0.05) == 1, (
+            'drain() должен ограничивать ожидание опроса таймаутом'
+        )
+        release.set()
+        assert scheduler.drain(5) == 0
+
+    def test_sigterm_stops_bot(self):
+        import homework
+
+        stopped = threading.Event()
+        previous = homework.handle_signals(stopped.set)
+        try:
+            os.kill(os.getpid(), signal.SIGTERM)
+            assert stopped.wait(5), 'SIGTERM должен останавливать бота'
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def test_adaptive_interval(self):
+        clock = FakeClock()
+        policy = AdaptiveInterval(
+            base=600, fast=60, max_interval=3600, recent_time=3600,
+            jitter=0, clock=clock)
+        subscription = SubscriptionRegistry().add('token', 1)
+        intervals = []
+        for _ in range(5):
+            policy.observe(subscription, 0)
+            intervals.append(policy.next_interval(subscription))
+        assert intervals == [600, 1200, 2400, 3600, 3600], (
+            'Без изменений интервал должен расти экспоненциально до предела'
+        )
+        policy.observe(subscription, 1)
+        assert policy.next_interval(subscription) == 60
+        clock.now = 7200
+        subscription.index.mark(
+            Homework.from_dict({'id': 1, 'status': 'reviewing'}))
+        policy.observe(subscription, 0)
+        assert policy.next_interval(subscription) == 60, (
+            'Пока работа на проверке, опрос должен быть частым'
+        )
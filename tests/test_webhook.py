@@ -0,0 +1,100 @@
+import json
+import urllib.error
+import urllib.request
+
+import pytest
+
+from records import Homework
+from storage import subscription_id
+from subscriptions import SubscriptionRegistry
+from utils import RecordingBot
+from webhook import SECRET_HEADER, WebhookServer
+
+
+@pytest.fixture
+def webhook():
+    import homework
+
+    bot = RecordingBot()
+    registry = SubscriptionRegistry()
+    subscription = registry.add('token', 5)
+    subscription.index.mark(Homework.from_dict(
+        {'id': 1, 'homework_name': 'hw.zip', 'status': 'reviewing'}))
+    server = WebhookServer(
+        registry,
+        lambda sub, response: homework.push_update(bot, sub, response),
+        secret='secret').start()
+    yield server, bot, subscription
+    server.close()
+
+
+def post(server, path, payload, secret='secret'):
+    request = urllib.request.Request(
+        f'http://127.0.0.1:{server.port}{path}',
+        data=json.dumps(payload).encode(), method='POST',
+        headers={SECRET_HEADER: secret, 'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(request) as response:
+            return response.status, json.loads(response.read())
+    except urllib.error.HTTPError as error:
+        return error.code, json.loads(error.read())
+
+
+class TestWebhook:
+
+    def test_event_is_delivered_once(self, webhook):
+        server, bot, subscription = webhook
+        path = f'/events/{subscription_id(subscription)}'
+        event = {'homeworks': [
+            {'id': 1, 'homework_name': 'hw.zip', 'status': 'approved'}]}
+        assert post(server, path, event) == (200, {'changes': 1})
+        assert bot.sent == [(5, (
+            'Изменился статус проверки работы "hw.zip". '
+            'Работа проверена: ревьюеру всё понравилось. Ура!'))], (
+            'Событие должно пройти через check_response, parse_status '
+            'и send_message'
+        )
+        assert post(server, path, event) == (200, {'changes': 0}), (
+            'Повторное событие не должно присылать уведомление снова'
+        )
+        assert subscription.from_date is None, (
+            'Событие не должно сдвигать курсор опроса'
+        )
+
+    def test_rejected_events(self, webhook):
+        server, bot, subscription = webhook
+        path = f'/events/{subscription_id(subscription)}'
+        event = {'homeworks': []}
+        assert post(server, path, event, secret='wrong')[0] == 401
+        assert post(server, '/events/unknown', event)[0] == 404
+        assert post(server, path, {'current_date': 1})[0] == 422
+        status, answer = post(server, path, {'homeworks': [
+            {'id': 2, 'homework_name': 'hw', 'status': 'unknown'}]})
+        assert status == 422 and 'unknown' in answer['error']
+        assert not bot.sent
+
+    def test_push_without_date_then_poll(self, webhook):
+        import homework
+
+        server, bot, subscription = webhook
+        path = f'/events/{subscription_id(subscription)}'
+        event = {'homeworks': [
+            {'id': 1, 'homework_name': 'hw.zip', 'status': 'approved'}]}
+        assert post(server, path, event) == (200, {'changes': 1})
+        polled = dict(event['homeworks'][0], date_updated='2022-01-01')
+        assert homework.notify_changes(bot, subscription, [polled]) == 0, (
+            'Сверочный опрос не должен повторять уведомление о событии '
+            'без date_updated'
+        )
+        assert len(bot.sent) == 1
+
+    def test_secret_is_required(self, monkeypatch):
+        import homework
+
+        with pytest.raises(ValueError):
+            WebhookServer(SubscriptionRegistry(), None, secret=None)
+        monkeypatch.setattr(homework, 'WEBHOOK_SECRET', None)
+        assert homework.start_webhook(
+            SubscriptionRegistry(), RecordingBot(), None) is None, (
+            'Без WEBHOOK_SECRET приём событий не должен запускаться'
+        )
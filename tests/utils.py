@@ -30,10 +30,40 @@ def check_default_var_exists(scope: ModuleType, var_name: str) -> None:
     :return: None. It's an assert
     """
     assert hasattr(scope, var_name), (
-        f'Не найдена переменная `{var_name}`. Не удаляйте и не переименовывайте ее.'
+        f'Не найдена переменная `{var_name}`. '
+        'Не удаляйте и не переименовывайте ее.'
     )
     var = getattr(scope, var_name)
     assert not callable(var), (
         f'{var_name} должна быть переменной, а не функцией.'
     )
 
+
+class FakeClock:
+    """Clock for tests: time only moves when the test moves it."""
+
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+    def sleep(self, seconds):
+        self.now += seconds
+
+
+class InlinePool:
+    """Executor stand-in that runs submitted calls immediately."""
+
+    def submit(self, func, *args):
+        func(*args)
+
+
+class RecordingBot:
+    """Telegram bot stand-in that records (chat_id, text) of each message."""
+
+    def __init__(self):
+        self.sent = []
+
+    def send_message(self, chat_id=None, text=None, **kwargs):
+        self.sent.append((chat_id, text))
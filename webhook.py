@@ -0,0 +1,78 @@
+"""Приём событий об изменении статусов по HTTP (push-режим).
+
+Внешний источник (прокси к API или уведомитель) отправляет
+POST /events/<id подписки> с телом в формате ответа API:
+{"homeworks": [...]}. Идентификатор подписки — storage.subscription_id,
+поэтому токен Практикума в запросе не передаётся. Запрос должен
+содержать секрет в заголовке X-Webhook-Secret.
+"""
+
+
+import json
+import logging
+import re
+import threading
+from http import HTTPStatus
+
+import metrics
+from exceptions import ResponseHasNoHomeworks, UnknownHomeworkStatus
+from json_server import JsonServer
+from storage import subscription_id
+
+logger = logging.getLogger(__name__)
+
+SECRET_HEADER = 'X-Webhook-Secret'
+EVENTS_PATH = re.compile(r'^/events/(?P<subscription>[^/?]+)$')
+BAD_EVENT_ERRORS = (
+    ValueError, KeyError, TypeError, ResponseHasNoHomeworks,
+    UnknownHomeworkStatus)
+
+
+class WebhookServer(JsonServer):
+    """HTTP-сервер, передающий события в handle(subscription, response).
+
+    Подписки ищутся в registry, поэтому события для подписок,
+    которых нет в реестре процесса, отклоняются с кодом 404.
+    """
+
+    secret_header = SECRET_HEADER
+    name = 'webhook'
+    title = 'Приём событий'
+
+    def __init__(self, registry, handle, secret, address='127.0.0.1',
+                 port=0):
+        self.registry = registry
+        self.handle = handle
+        self._index = {}
+        self._index_version = None
+        self._lock = threading.Lock()
+        super().__init__(secret, address, port)
+
+    def resolve(self, sub_id):
+        """Подписка по идентификатору из хранилища или None."""
+        with self._lock:
+            if self._index_version != self.registry.version:
+                self._index_version = self.registry.version
+                self._index = {
+                    subscription_id(subscription): subscription
+                    for subscription in self.registry
+                }
+            return self._index.get(sub_id)
+
+    def receive(self, method, path, headers, body):
+        """Обрабатывает событие. Возвращает код ответа и тело ответа."""
+        match = EVENTS_PATH.match(path)
+        if match is None:
+            return HTTPStatus.NOT_FOUND, {'error': 'Неизвестный адрес'}
+        if not self.authorized(headers):
+            return HTTPStatus.UNAUTHORIZED, {'error': 'Неверный секрет'}
+        subscription = self.resolve(match.group('subscription'))
+        if subscription is None:
+            return HTTPStatus.NOT_FOUND, {'error': 'Подписка не найдена'}
+        try:
+            changes = self.handle(subscription, json.loads(body))
+        except BAD_EVENT_ERRORS as error:
+            metrics.count_error(error)
+            logger.warning('Отклонено событие webhook: %s', error)
+            return HTTPStatus.UNPROCESSABLE_ENTITY, {'error': str(error)}
+        return HTTPStatus.OK, {'changes': changes}